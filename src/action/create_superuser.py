@@ -8,6 +8,8 @@ from sqlalchemy.exc import IntegrityError
 from core.database import db_helper
 from utilities.security import hash_password
 from core.database.models import User
+from core.services.user_stats import change_user_stats, record_signup_event
+from utilities.clock import get_clock
 
 
 async def create_superuser(
@@ -31,8 +33,14 @@ async def create_superuser(
     try:
         async with db_helper.session_factory() as session:
             session.add(superuser)
+            # created_at comes back in INSERT ... RETURNING,
+            # flushed before the stats row is locked
+            await session.flush()
+            await change_user_stats(session, total=1, active=1, verified=1)
+            await record_signup_event(
+                session, get_clock().now(), signups=1, verifications=1
+            )
             await session.commit()
-            await session.refresh(superuser)
             print(f"Admin created: {email}")
             return superuser
     except IntegrityError:
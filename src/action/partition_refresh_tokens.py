@@ -0,0 +1,82 @@
+import sys
+import os
+import asyncio
+import logging
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from core.database import db_helper
+from core.services.token_reaper import refresh_token_reaper
+from utilities.clock import get_clock
+
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+# refresh_tokens rebuilt as a table partitioned by month of expires_at.
+# The primary key has to include the partition key, so token_hash
+# gets a plain index: SHA-256 digests don't collide in practice.
+STATEMENTS = (
+    # fail instead of queueing every request behind the lock
+    "SET LOCAL lock_timeout = '5s'",
+    # writers wait until the swap commits, so no token issued
+    # meanwhile is left behind in the legacy table
+    "LOCK TABLE refresh_tokens IN ACCESS EXCLUSIVE MODE",
+    "ALTER TABLE refresh_tokens RENAME TO refresh_tokens_legacy",
+    "ALTER TABLE refresh_tokens_legacy "
+    "RENAME CONSTRAINT refresh_tokens_pkey TO refresh_tokens_legacy_pkey",
+    "ALTER SEQUENCE refresh_tokens_id_seq OWNED BY NONE",
+    """
+    CREATE TABLE refresh_tokens (
+        id INTEGER NOT NULL DEFAULT nextval('refresh_tokens_id_seq'),
+        user_id INTEGER NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+        token_hash BYTEA NOT NULL,
+        is_revoked BOOLEAN NOT NULL,
+        expires_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+        created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+        PRIMARY KEY (id, expires_at)
+    ) PARTITION BY RANGE (expires_at)
+    """,
+    "ALTER SEQUENCE refresh_tokens_id_seq OWNED BY refresh_tokens.id",
+    "CREATE INDEX ix_refresh_tokens_p_token_hash ON refresh_tokens (token_hash)",
+    "CREATE INDEX ix_refresh_tokens_p_user_id ON refresh_tokens (user_id)",
+)
+
+
+async def partition_refresh_tokens() -> None:
+    """
+    Convert refresh_tokens into a partitioned table.
+    Only live tokens are copied over, in the same transaction
+    as the swap: the app can keep running, its token writes
+    wait for the commit.
+    Set APP_CONFIG__REAPER__PARTITIONED=true afterwards.
+    """
+    async with db_helper.session_factory() as session:
+        for statement in STATEMENTS:
+            await session.execute(text(statement))
+
+        # partitions for the live tokens
+        await refresh_token_reaper.create_partitions(session, get_clock().now())
+
+        result = await session.execute(text(
+            "INSERT INTO refresh_tokens "
+            "SELECT id, user_id, token_hash, is_revoked, expires_at, created_at "
+            "FROM refresh_tokens_legacy "
+            "WHERE NOT is_revoked AND expires_at > now() AT TIME ZONE 'utc'"
+        ))
+        await session.execute(text("DROP TABLE refresh_tokens_legacy"))
+        await session.commit()
+
+    logger.info(
+        """
+        refresh_tokens partitioned, %r live tokens copied
+        """, result.rowcount
+    )
+
+    await db_helper.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(partition_refresh_tokens())
@@ -1,23 +1,42 @@
-from fastapi import APIRouter, Depends
-from typing import Annotated
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import Response, StreamingResponse
+from typing import Annotated, Literal
 
 from core.config import settings
-from core.database.models import User
+from core.database.schemas.user import UserAdminResponse, UserAdminPage
+from core.database.schemas.admin import BulkUserAction, BulkUserActionResult
 from core.services.admin import AdminService
 from core.dependency.admin import get_current_superuser
+from core.dependency.user import Principal
 from core.dependency.services import get_admin_service
+from utilities.security import hashing_pool
+from utilities.jwt_token import verified_tokens
+from core.mailing.outbox import email_outbox_worker
+from core.services.rate_limit import rate_limiter
+from core.cache import user_filter
 
 router = APIRouter(
     prefix=settings.api.admin,
     tags=["Admin"]
 )
 
+
+def page_response(page: dict) -> Response:
+    """ 
+    Serialize a listing page straight to JSON bytes 
+    with the compiled pydantic schema
+    """
+    return Response(
+        content=UserAdminPage.model_validate(page).model_dump_json(),
+        media_type="application/json",
+    )
+
 # ------------------------ Users data and statistics --------------------
 
 @router.get("/statistic/users")
 async def statistics(
     user: Annotated[
-        User,
+        Principal,
         Depends(get_current_superuser)
     ],
     admin_service: Annotated[
@@ -28,57 +47,196 @@ async def statistics(
     return await admin_service.get_user_stats()
 
 
-@router.get("/statistic/users/new/{days}")
+@router.get("/statistic/users/histogram")
+async def signup_histogram(
+    user: Annotated[
+        Principal,
+        Depends(get_current_superuser)
+    ],
+    admin_service: Annotated[
+        AdminService,
+        Depends(get_admin_service)
+    ],
+    granularity: Literal["day", "hour"] = "day",
+    days: int = Query(30, ge=1, le=366),
+):
+    """ 
+    Signup and verification counts per day or hour
+    """
+    return await admin_service.get_signup_histogram(
+        granularity=granularity, 
+        days=days,
+    )
+
+
+@router.get("/statistic/users/new/{days}", response_model=UserAdminPage)
 async def statistic_of_new_users(
     days: int,
     user: Annotated[
-        User,
+        Principal,
         Depends(get_current_superuser)
     ],
     admin_service: Annotated[
         AdminService,
         Depends(get_admin_service)
     ],
+    limit: int = Query(100, ge=1, le=1000),
+    after: str | None = None,
 ):
-    return await admin_service.get_new_users(days=days)
+    page = await admin_service.get_new_users(
+        days=days, 
+        limit=limit, 
+        after=after,
+    )
+    return page_response(page)
 
 
-@router.get("/statistic/users/all/unverified/{days}")
+@router.get("/statistic/users/all/unverified/{days}", response_model=UserAdminPage)
 async def unverified_statistic(
     days: int,
     user: Annotated[
-        User,
+        Principal,
         Depends(get_current_superuser)
     ],
     admin_service: Annotated[
         AdminService,
         Depends(get_admin_service)
     ],   
+    limit: int = Query(100, ge=1, le=1000),
+    after: str | None = None,
 ):
-    return await admin_service.get_unverified_old_users(days=days)
+    page = await admin_service.get_unverified_old_users(
+        days=days, 
+        limit=limit, 
+        after=after,
+    )
+    return page_response(page)
 
     
-@router.get("/statistic/users/all/good")
+@router.get("/statistic/users/all/good", response_model=UserAdminPage)
 async def all_good_users(
     user: Annotated[
-        User,
+        Principal,
         Depends(get_current_superuser)
     ],
     admin_service: Annotated[
         AdminService,
         Depends(get_admin_service)
     ],   
+    limit: int = Query(100, ge=1, le=1000),
+    after: str | None = None,
+):
+    page = await admin_service.get_all_active_and_verified_users(
+        limit=limit, 
+        after=after,
+    )
+    return page_response(page)
+
+
+@router.get("/statistic/users/export/{kind}")
+async def export_users(
+    kind: Literal["good", "new", "unverified"],
+    user: Annotated[
+        Principal,
+        Depends(get_current_superuser)
+    ],
+    admin_service: Annotated[
+        AdminService,
+        Depends(get_admin_service)
+    ],
+    days: int = 7,
+):
+    """ 
+    Whole listing as NDJSON, one user per line,
+    streamed from the DB in chunks
+    """
+    stmt, descending = admin_service.users_query(kind, days=days)
+    
+    async def lines():
+        async for rows in admin_service.stream_users(stmt, descending):
+            yield "".join(
+                UserAdminResponse.model_validate(row).model_dump_json() + "\n" 
+                for row in rows
+            )
+    
+    return StreamingResponse(
+        lines(),
+        media_type="application/x-ndjson",
+    )
+
+
+@router.get("/statistic/hashing")
+async def hashing_statistic(
+    user: Annotated[
+        Principal,
+        Depends(get_current_superuser)
+    ],
+):
+    """ 
+    Password hashing pool metrics for this worker
+    """
+    return hashing_pool.stats()
+
+
+@router.get("/statistic/mailing")
+async def mailing_statistic(
+    user: Annotated[
+        Principal,
+        Depends(get_current_superuser)
+    ],
+):
+    """ 
+    Email outbox worker metrics for this worker
+    """
+    return email_outbox_worker.stats()
+
+
+@router.get("/statistic/tokens")
+async def token_cache_statistic(
+    user: Annotated[
+        Principal,
+        Depends(get_current_superuser)
+    ],
+):
+    """ 
+    Verified token cache metrics for this worker
+    """
+    return verified_tokens.stats()
+
+
+@router.get("/statistic/rate-limit")
+async def rate_limit_statistic(
+    user: Annotated[
+        Principal,
+        Depends(get_current_superuser)
+    ],
 ):
-    return await admin_service.get_all_active_and_verified_users()
+    """ 
+    Rate limiter decisions of this worker
+    """
+    return rate_limiter.stats()
+
+
+@router.get("/statistic/user-filter")
+async def user_filter_statistic(
+    user: Annotated[
+        Principal,
+        Depends(get_current_superuser)
+    ],
+):
+    """ 
+    Username and email filter of this worker
+    """
+    return user_filter.stats()
 
 
 # ------------------------- Action --------------------------------------
 
-@router.patch("/deactivate/{user_id}")
+@router.patch("/deactivate/{user_id}", response_model=UserAdminResponse)
 async def deactivate(
     user_id: int,
     user: Annotated[
-        User,
+        Principal,
         Depends(get_current_superuser)
     ],
     admin_service: Annotated[
@@ -88,11 +246,11 @@ async def deactivate(
 ):
     return await admin_service.deactivate_user(user_id=user_id)
 
-@router.patch("/reactivate/{user_id}")
+@router.patch("/reactivate/{user_id}", response_model=UserAdminResponse)
 async def reactivate(
     user_id: int,
     user: Annotated[
-        User,
+        Principal,
         Depends(get_current_superuser)
     ],
     admin_service: Annotated[
@@ -106,7 +264,22 @@ async def reactivate(
 async def delete(
     user_id: int,
     user: Annotated[
-        User,
+        Principal,
+        Depends(get_current_superuser)
+    ],
+    admin_service: Annotated[
+        AdminService,
+        Depends(get_admin_service)
+    ],
+):
+    return await admin_service.delete_user(user_id=user_id)
+
+
+@router.post("/bulk", response_model=BulkUserActionResult)
+async def bulk_action(
+    request: BulkUserAction,
+    user: Annotated[
+        Principal,
         Depends(get_current_superuser)
     ],
     admin_service: Annotated[
@@ -114,4 +287,13 @@ async def delete(
         Depends(get_admin_service)
     ],
 ):
-    return await admin_service.delete_user(user_id=user_id)
\ No newline at end of file
+    """ 
+    Deactivate, reactivate or delete many users at once:
+    by ids or by listing, e.g. unverified older than N days
+    """
+    return await admin_service.bulk_user_action(
+        action=request.action,
+        ids=request.ids,
+        kind=request.filter,
+        days=request.days,
+    )
\ No newline at end of file
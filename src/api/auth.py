@@ -1,5 +1,5 @@
 
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, Query, Request, Response
 from fastapi.responses import RedirectResponse
 from typing import Annotated
 
@@ -12,17 +12,18 @@ from core.database.schemas.auth import (
     RefreshTokenRequest
     )
 
-from core.database.models import User
 
 from core.services.user import UserService
 from core.services.oauth import OauthService
 from core.dependency.services import get_user_service
-from core.dependency.user import get_current_user
+from core.dependency.user import Principal, get_current_principal
 from core.dependency.services import get_oauth_service
-
-from core.oauth.github import github_auth_url
-
-from utilities.jwt_token import create_jwt_token
+from core.dependency.rate_limit import (
+    throttle_login,
+    throttle_register,
+    throttle_reset_password,
+    throttle_availability,
+    )
 
 from core.config import settings
 
@@ -31,7 +32,7 @@ router = APIRouter(
     tags=["Auth"],
 )
 
-@router.post("/register")
+@router.post("/register", dependencies=[Depends(throttle_register)])
 async def register(
     user_data: UserCreate,
     user_service: Annotated[
@@ -47,7 +48,23 @@ async def register(
     return user 
 
 
-@router.post("/login")
+@router.get("/availability", dependencies=[Depends(throttle_availability)])
+async def availability(
+    user_service: Annotated[
+        UserService,
+        Depends(get_user_service)
+    ],
+    email: str | None = Query(None),
+    username: str | None = Query(None),
+):
+    """
+    Check whether email and username are free to register.
+    """
+    
+    return await user_service.check_availability(email=email, username=username)
+
+
+@router.post("/login", dependencies=[Depends(throttle_login)])
 async def login(
     login_data: UserLogin,
     user_service: Annotated[
@@ -55,15 +72,11 @@ async def login(
         Depends(get_user_service)
     ],
 ):
-    user = await user_service.authenticate(login_data.login, login_data.password)
-    
-    access_token = create_jwt_token(data={
-        "sub": user.id,
-        "type": "access_token",
-        "username": user.username,
-        })
+    user, refresh_token = await user_service.login(
+        login_data.login, login_data.password
+    )
     
-    refresh_token = await user_service.create_refresh_token(user.id)
+    access_token = user_service.create_access_token(user)
     
     return {
         "message": "Login successful 🙂‍↕️🤌",
@@ -92,8 +105,8 @@ async def verify_email(
 @router.post("/logout")
 async def logout(
     user: Annotated[
-        User,
-        Depends(get_current_user)
+        Principal,
+        Depends(get_current_principal)
     ],
     user_service: Annotated[
         UserService,
@@ -125,7 +138,7 @@ async def forgot_password(
         "message": "Email for reset password was sent!"
     }
 
-@router.post("/reset-password")
+@router.post("/reset-password", dependencies=[Depends(throttle_reset_password)])
 async def reset_password(
     request: ResetPasswordRequest,
     user_service: Annotated[
@@ -151,22 +164,13 @@ async def refresh(
     Issues new access and refresh tokens using a valid refresh token
     """
     
-    # found olf refresh token in DB and validate it 
-    token = await user_service.validate_refresh_token(request.refresh_token)
-    
-    token.is_revoked = True
-    await user_service.session.commit()
-    
-    # create new access token
-    access_token = create_jwt_token(
-        {
-            "sub": token.user_id,
-            "type": "access_token",
-        }
+    # revoke old refresh token and create new one
+    user, refresh_token = await user_service.rotate_refresh_token(
+        request.refresh_token
     )
     
-    # create new refresh token 
-    refresh_token = await user_service.create_refresh_token(token.user_id)
+    # create new access token
+    access_token = user_service.create_access_token(user)
     
     return {
         "message": "Update access ando refresh tokens 🥳",
@@ -175,33 +179,140 @@ async def refresh(
         "token_type": "bearer",
     }
 
+def nonce_cookie_name(provider: str) -> str:
+    return f"oauth_nonce_{provider}"
+
+
+def set_nonce_cookie(response: Response, provider: str, nonce: str) -> None:
+    """ 
+    Bind the authorization request to this browser, 
+    the callback only accepts a state with the same nonce
+    """
+    response.set_cookie(
+        key=nonce_cookie_name(provider),
+        value=nonce,
+        max_age=settings.providers.state_expire,
+        path=f"{settings.api.prefix}{settings.api.auth}",
+        secure=settings.providers.cookie_secure,
+        httponly=True,
+        # sent on the top-level redirect back from the provider
+        samesite="lax",
+    )
+
+
+async def finish_oauth_login(
+    oauth_service: OauthService,
+    provider: str,
+    code: str,
+    state: str,
+    request: Request,
+    response: Response,
+) -> dict:
+    result = await oauth_service.authenticate(
+        provider, 
+        code, 
+        state, 
+        browser_nonce=request.cookies.get(nonce_cookie_name(provider)),
+    )
+    response.delete_cookie(
+        key=nonce_cookie_name(provider),
+        path=f"{settings.api.prefix}{settings.api.auth}",
+    )
+    return result
+
+
 @router.get("/github", include_in_schema=False)
-async def login_with_github():
-    return RedirectResponse(github_auth_url)
+async def login_with_github(
+    oauth_service: Annotated[
+        OauthService, 
+        Depends(get_oauth_service)
+    ],
+):
+    url, nonce = await oauth_service.authorization_url("github")
+    response = RedirectResponse(url)
+    set_nonce_cookie(response, "github", nonce)
+    return response
 
 
 @router.get("/github/docs")
-async def login_with_github():
+async def github_login_url(
+    response: Response,
+    oauth_service: Annotated[
+        OauthService, 
+        Depends(get_oauth_service)
+    ],
+):
     """ 
-    Get GitHub OAuth URL
+    Get GitHub OAuth URL, 
+    open it in the browser that made this request
     """
     
+    url, nonce = await oauth_service.authorization_url("github")
+    set_nonce_cookie(response, "github", nonce)
     return {
             "message": "Visit the URL to login with GitHub",
-            "url": github_auth_url
+            "url": url
         }
     
 
 @router.get("/github/callback")
 async def github_callback(
+    request: Request,
+    response: Response,
     oauth_service: Annotated[
         OauthService, 
         Depends(get_oauth_service)
     ],
     code: str = Query(...),
+    state: str = Query(...),
 ):
     """ 
     Handle GitHub OAuth callback
     """
     
-    return await oauth_service.authenticate(code)
\ No newline at end of file
+    return await finish_oauth_login(
+        oauth_service, "github", code, state, request, response
+    )
+
+
+@router.get("/oauth/{provider}/docs")
+async def provider_login_url(
+    provider: str,
+    response: Response,
+    oauth_service: Annotated[
+        OauthService, 
+        Depends(get_oauth_service)
+    ],
+):
+    """ 
+    Get login URL of any configured provider, 
+    open it in the browser that made this request
+    """
+    
+    url, nonce = await oauth_service.authorization_url(provider)
+    set_nonce_cookie(response, provider, nonce)
+    return {
+            "message": f"Visit the URL to login with {provider}",
+            "url": url
+        }
+
+
+@router.get("/oauth/{provider}/callback")
+async def provider_callback(
+    provider: str,
+    request: Request,
+    response: Response,
+    oauth_service: Annotated[
+        OauthService, 
+        Depends(get_oauth_service)
+    ],
+    code: str = Query(...),
+    state: str = Query(...),
+):
+    """ 
+    Handle OAuth callback of any configured provider
+    """
+    
+    return await finish_oauth_login(
+        oauth_service, provider, code, state, request, response
+    )
\ No newline at end of file
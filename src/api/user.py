@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends
 from typing import Annotated
-from core.database.models import User
+from core.cache import UserSnapshot
 from core.dependency.user import get_current_user
 from core.config import settings
 
@@ -12,7 +12,7 @@ router = APIRouter(
 @router.get("/me")
 async def profile(
     user: Annotated[
-        User,
+        UserSnapshot,
         Depends(get_current_user)
     ]
 ):
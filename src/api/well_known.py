@@ -0,0 +1,28 @@
+from fastapi import APIRouter, Request, Response
+from utilities.key_ring import key_ring
+
+router = APIRouter(
+    prefix="/.well-known",
+    tags=["Well-known"],
+)
+
+
+@router.get("/jwks.json")
+async def jwks(request: Request):
+    """ 
+    Public keys that verify our tokens,
+    for resource servers to check them locally
+    """
+    headers = {
+        "ETag": key_ring.jwks_etag,
+        # a new key is published long before it signs
+        "Cache-Control": "public, max-age=300",
+    }
+    if request.headers.get("if-none-match") == key_ring.jwks_etag:
+        return Response(status_code=304, headers=headers)
+    
+    return Response(
+        content=key_ring.jwks_payload,
+        media_type="application/json",
+        headers=headers,
+    )
@@ -1,3 +0,0 @@
-from datetime import datetime, timezone
-
-NOW = datetime.now(timezone.utc).replace(tzinfo=None)
\ No newline at end of file
@@ -0,0 +1,8 @@
+__all__ = (
+    "UserSnapshot",
+    "user_cache",
+    "user_filter",
+)
+
+from .user_cache import UserSnapshot, user_cache
+from .user_filter import user_filter
\ No newline at end of file
@@ -0,0 +1,94 @@
+from dataclasses import dataclass
+
+from core.config import settings
+from core.database.models import User
+from utilities.cache import TTLCache
+from utilities.jwt_token import verified_tokens
+
+
+@dataclass(frozen=True, slots=True)
+class UserSnapshot:
+    """
+    Compact copy of the user fields that
+    authenticated routes actually read.
+    """
+    id: int
+    email: str
+    username: str
+    is_active: bool
+    is_verified: bool
+    is_superuser: bool
+    token_version: int
+
+    @classmethod
+    def from_user(cls, user: User) -> "UserSnapshot":
+        return cls(
+            id=user.id,
+            email=user.email,
+            username=user.username,
+            is_active=user.is_active,
+            is_verified=user.is_verified,
+            is_superuser=user.is_superuser,
+            token_version=user.token_version,
+        )
+
+
+class UserCache(TTLCache):
+    """
+    Per-worker cache of user snapshots keyed by user id.
+    Write paths must call invalidate() after changing a user.
+    """
+    def __init__(self, enabled: bool = True, **kwargs):
+        super().__init__(**kwargs)
+        self.enabled = enabled
+        # user id -> lowest token version still accepted,
+        # kept as long as an access token can live; never evicted
+        # by size, a dropped entry would accept revoked tokens again
+        self.token_versions = TTLCache(
+            max_size=None,
+            ttl=settings.access.expire_at * 60,
+        )
+
+    def get_user(self, user_id: int) -> UserSnapshot | None:
+        if not self.enabled:
+            return None
+        return self.get(user_id)
+
+    def put_user(self, user: User) -> UserSnapshot:
+        snapshot = UserSnapshot.from_user(user)
+        if self.enabled:
+            self.set(user.id, snapshot)
+        return snapshot
+
+    def invalidate(self, user_id: int) -> None:
+        self.delete(user_id)
+
+    def revoke_tokens(self, user_id: int, token_version: int) -> None:
+        """ Reject access tokens older than token_version on this worker """
+        self.invalidate(user_id)
+        self.token_versions.set(user_id, token_version)
+
+    def is_token_revoked(self, user_id: int, token_version: int) -> bool:
+        min_version = self.token_versions.get(user_id)
+        return min_version is not None and token_version < min_version
+
+
+user_cache = UserCache(
+    enabled=settings.user_cache.enabled,
+    max_size=settings.user_cache.max_size,
+    ttl=settings.user_cache.ttl,
+)
+
+
+
+def is_access_token_revoked(payload: dict) -> bool:
+    if payload.get("type") != "access_token":
+        return False
+    try:
+        user_id = int(payload["sub"])
+    except (KeyError, ValueError):
+        return False
+    return user_cache.is_token_revoked(user_id, payload.get("ver", 0))
+
+
+verified_tokens.add_revocation_check(is_access_token_revoked)
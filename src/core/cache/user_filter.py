@@ -0,0 +1,111 @@
+from datetime import datetime
+
+from core.config import settings
+from utilities.bloom import BloomFilter
+
+
+def normalize(value: str) -> str:
+    # any exact match in the DB normalizes the same way,
+    # so a miss here is a miss there
+    return value.strip().lower()
+
+
+class UserFilter:
+    """
+    Per-worker Bloom filter over usernames and emails.
+    A miss only means this worker hasn't seen the user yet:
+    users created on other workers show up a refresh later.
+    So a miss may only skip work whose answer the DB checks
+    again anyway, like the availability hint or the signup
+    pre-check in front of the unique insert; login and
+    existence checks always query. A hit means it may exist.
+    Until the first build every lookup is a hit.
+    Write paths must call add_user() and forget_users().
+    """
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.bloom: BloomFilter | None = None
+        # newest users.created_at loaded from the table
+        self.loaded_until: datetime | None = None
+        self.users = 0
+        # deleted users stay in the filter as false positives
+        self.deleted = 0
+        # users added while a rebuild streams the table
+        self._pending: list[tuple[str, str]] | None = None
+        self.metrics = {
+            "negatives": 0,
+            "positives": 0,
+        }
+
+    @property
+    def ready(self) -> bool:
+        return self.enabled and self.bloom is not None
+
+    def _contains(self, key: str) -> bool:
+        if not self.ready:
+            return True
+        found = key in self.bloom
+        self.metrics["positives" if found else "negatives"] += 1
+        return found
+
+    def has_email(self, email: str) -> bool:
+        return self._contains("email:" + normalize(email))
+
+    def has_username(self, username: str) -> bool:
+        return self._contains("username:" + normalize(username))
+
+    def add_user(self, email: str, username: str) -> None:
+        if self._pending is not None:
+            self._pending.append((email, username))
+        if self.bloom is not None and self.add_entries(self.bloom, email, username):
+            self.users += 1
+
+    def forget_users(self, count: int) -> None:
+        self.deleted += count
+
+    @staticmethod
+    def add_entries(bloom: BloomFilter, email: str, username: str) -> bool:
+        """ False if the user was (probably) there already """
+        added = bloom.add("email:" + normalize(email))
+        return bloom.add("username:" + normalize(username)) or added
+
+    def begin_rebuild(self) -> None:
+        self._pending = []
+
+    def abort_rebuild(self) -> None:
+        self._pending = None
+
+    def replace(
+        self,
+        bloom: BloomFilter,
+        users: int,
+        loaded_until: datetime | None,
+    ) -> None:
+        """ Swap in a filter built from the table """
+        for email, username in self._pending or ():
+            users += self.add_entries(bloom, email, username)
+        self._pending = None
+        self.bloom = bloom
+        self.users = users
+        self.deleted = 0
+        self.loaded_until = loaded_until
+
+    def needs_rebuild(self, deleted_ratio: float) -> bool:
+        if self.bloom is None:
+            return True
+        # 2 entries per user, past capacity the error rate climbs
+        overfull = self.bloom.count > self.bloom.capacity
+        return overfull or self.deleted > self.users * deleted_ratio
+
+    def stats(self) -> dict:
+        stats = dict(self.metrics)
+        stats.update(
+            ready=self.ready,
+            users=self.users,
+            deleted=self.deleted,
+            filter=self.bloom.stats() if self.bloom is not None else None,
+        )
+        return stats
+
+
+user_filter = UserFilter(enabled=settings.user_filter.enabled)
@@ -1,4 +1,5 @@
 from pathlib import Path
+from typing import Literal
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import BaseModel, PostgresDsn
 from dotenv import load_dotenv
@@ -9,8 +10,31 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 
 class AccessToken(BaseModel):
     secret_key: str
-    algorithm: str = "HS256"
+    # HS256 signs with secret_key, EdDSA and ES256 with the key ring
+    algorithm: Literal["HS256", "EdDSA", "ES256"] = "HS256"
     expire_at: int = 3600
+    # authenticate from token claims without loading the user
+    stateless: bool = False
+    # minutes an access token lives in stateless mode: a logout,
+    # password reset or deactivation on one worker is only seen
+    # by the others once the token expires, so this is how long
+    # a revoked token can still be used there
+    stateless_expire_at: int = 15
+    # still accept HS256 tokens without kid after moving to the key ring
+    accept_hs256: bool = True
+
+
+class SigningKeys(BaseModel):
+    # seconds between new signing keys
+    rotate_every: int = 7 * 24 * 3600
+    # seconds a new key is in the JWKS before it signs,
+    # so resource servers with a cached JWKS know it already
+    publish_ahead: int = 3600
+    # seconds a key stays after it stopped signing:
+    # longer than the longest token (refresh, 30 days)
+    retain: int = 31 * 24 * 3600
+    # seconds between key ring reloads in every worker
+    reload_interval: int = 300
 
 
 class DatabaseConfig(BaseModel):
@@ -27,7 +51,161 @@ class GithubOauth(BaseModel):
     github_url: str = "https://github.com/login/oauth/access_token"
     github_email_url: str = "https://api.github.com/user/emails"
     github_user_url: str = "https://api.github.com/user"
-    
+    github_authorize_url: str = "https://github.com/login/oauth/authorize"
+    scope: str = "user:email"
+
+
+class OIDCProviderConfig(BaseModel):
+    client_id: str
+    client_secret: str
+    redirect_uri: str
+    # required for the generic provider, google has its own
+    discovery_url: str | None = None
+    scope: str = "openid email profile"
+
+
+class OauthProviders(BaseModel):
+    google: OIDCProviderConfig | None = None
+    oidc: OIDCProviderConfig | None = None
+    # seconds discovery documents and JWKS are used without revalidation
+    metadata_ttl: int = 3600
+    # seconds the signed state of an authorization request is valid
+    state_expire: int = 600
+    # the state is bound to the browser by a cookie with its nonce
+    cookie_secure: bool = True
+
+
+class HTTPClientConfig(BaseModel):
+    # connections in the shared pool, total and per host
+    limit: int = 100
+    limit_per_host: int = 20
+    # seconds a resolved address is reused
+    dns_cache_ttl: int = 300
+    # seconds an idle keep-alive connection is kept
+    keepalive_timeout: float = 30
+    connect_timeout: float = 3
+    total_timeout: float = 10
+
+
+class PasswordHashing(BaseModel):
+    # scheme used for new hashes, older ones are rehashed on login
+    scheme: Literal["bcrypt", "argon2id", "scrypt"] = "bcrypt"
+    bcrypt_rounds: int = 12
+    argon2_time_cost: int = 3
+    argon2_memory_cost: int = 65536
+    argon2_parallelism: int = 4
+    scrypt_n_log2: int = 14
+    scrypt_r: int = 8
+    scrypt_p: int = 1
+    executor: Literal["thread", "process"] = "thread"
+    # None -> number of CPU cores
+    max_workers: int | None = None
+    # hash jobs allowed to wait for a free worker
+    max_queue_depth: int = 64
+
+
+class UserCache(BaseModel):
+    enabled: bool = True
+    # seconds a snapshot lives, bounds staleness across workers
+    ttl: int = 30
+    max_size: int = 10000
+
+
+class UserFilterConfig(BaseModel):
+    # bloom filter over usernames and emails, per worker
+    enabled: bool = True
+    # sized for twice the larger of this and the users table
+    capacity: int = 100000
+    error_rate: float = 0.01
+    # seconds between loads of users created by other workers
+    refresh_interval: int = 10
+    # rebuild once this share of the loaded users was deleted
+    rebuild_deleted_ratio: float = 0.2
+
+
+class TokenCache(BaseModel):
+    # decoded payloads of verified tokens, kept until their exp
+    enabled: bool = True
+    max_size: int = 10000
+
+
+class RateLimitRule(BaseModel):
+    # token bucket: `requests` at once, refilled over `seconds`
+    requests: int
+    seconds: float
+
+
+class RateLimitConfig(BaseModel):
+    enabled: bool = True
+    # "postgres" shares the buckets between nodes
+    backend: Literal["memory", "postgres"] = "memory"
+    # proxies in front of the app that append to X-Forwarded-For,
+    # 0 uses the peer address; entries left of them are client-made
+    trusted_proxies: int = 0
+    login_ip: RateLimitRule = RateLimitRule(requests=30, seconds=60)
+    login_identifier: RateLimitRule = RateLimitRule(requests=10, seconds=300)
+    register_ip: RateLimitRule = RateLimitRule(requests=10, seconds=3600)
+    reset_password_ip: RateLimitRule = RateLimitRule(requests=10, seconds=600)
+    availability_ip: RateLimitRule = RateLimitRule(requests=60, seconds=60)
+    # buckets kept in memory per worker
+    max_keys: int = 100000
+    # seconds between purges of refilled postgres buckets
+    cleanup_interval: int = 600
+
+
+class TokenReaper(BaseModel):
+    enabled: bool = True
+    # seconds between runs
+    interval: int = 3600
+    batch_size: int = 1000
+    # refresh_tokens converted by action/partition_refresh_tokens.py
+    partitioned: bool = False
+    # monthly partitions created ahead of time
+    partitions_ahead: int = 2
+
+
+class UserStatsConfig(BaseModel):
+    # seconds between recounts of the user_stats counters
+    reconcile_interval: int = 3600
+
+
+class MailingConfig(BaseModel):
+    hostname: str = "127.0.0.1"
+    port: int = 1025
+    sender: str = "admin@site.com"
+    username: str | None = None
+    password: str | None = None
+    use_tls: bool = False
+    start_tls: bool = False
+    timeout: float = 10
+    # persistent SMTP connections per worker
+    pool_size: int = 4
+    # connections unused for longer are reopened
+    idle_timeout: float = 60
+    # connections unused for longer get a NOOP before reuse
+    health_check_after: float = 15
+    # optional dir for compiled mail template bytecode
+    template_cache_dir: str | None = None
+
+
+class EmailOutboxConfig(BaseModel):
+    enabled: bool = True
+    # worker coroutines per process
+    concurrency: int = 2
+    batch_size: int = 50
+    # seconds to wait when the outbox is empty
+    poll_interval: float = 1.0
+    max_attempts: int = 5
+    # retry after backoff_base * 2 ** (attempts - 1) seconds
+    backoff_base: float = 5
+    # claimed rows become visible again if the worker dies,
+    # renewed every lease / 3 seconds while a batch is sending
+    lease: int = 120
+    # seconds failed rows are kept for inspection, without their links
+    failed_retention: int = 7 * 24 * 3600
+    # seconds between purges of expired failed rows
+    purge_interval: int = 3600
+
 
 class ApiPrefix(BaseModel):
     prefix: str = "/api"
@@ -47,8 +225,20 @@ class Settings(BaseSettings):
     
     api: ApiPrefix = ApiPrefix()
     access: AccessToken
+    signing_keys: SigningKeys = SigningKeys()
     oauth: GithubOauth
+    providers: OauthProviders = OauthProviders()
+    http: HTTPClientConfig = HTTPClientConfig()
     db: DatabaseConfig
+    hashing: PasswordHashing = PasswordHashing()
+    user_cache: UserCache = UserCache()
+    token_cache: TokenCache = TokenCache()
+    user_filter: UserFilterConfig = UserFilterConfig()
+    rate_limit: RateLimitConfig = RateLimitConfig()
+    reaper: TokenReaper = TokenReaper()
+    stats: UserStatsConfig = UserStatsConfig()
+    mailing: MailingConfig = MailingConfig()
+    outbox: EmailOutboxConfig = EmailOutboxConfig()
     
 
 settings = Settings()
\ No newline at end of file
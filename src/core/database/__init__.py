@@ -1,9 +1,11 @@
 __all__ = (
     "Base",
     "db_helper",
+    "UnitOfWork",
     "lifespan",
 )
 
 from .base import Base
 from .db_helper import db_helper
+from .unit_of_work import UnitOfWork
 from .context_manager import lifespan
\ No newline at end of file
@@ -4,4 +4,7 @@ from sqlalchemy.orm import DeclarativeBase
 class Base(DeclarativeBase):
     __abstract__ = True
     
-    metadata = MetaData()
\ No newline at end of file
+    metadata = MetaData()
+    # fetch server defaults (id, created_at) with INSERT ... RETURNING
+    # instead of a SELECT when they are read after the flush
+    __mapper_args__ = {"eager_defaults": True}
\ No newline at end of file
@@ -1,11 +1,49 @@
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from core.database import db_helper, Base
+from core.config import settings
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    # imported here: these modules import core.database themselves
+    from core.services.token_reaper import refresh_token_reaper
+    from core.services.user_stats import user_stats_reconciler
+    from core.mailing.smtp_pool import smtp_pool
+    from core.mailing.outbox import email_outbox_worker
+    from core.mailing.templates import mail_templates
+    from core.oauth.http_client import http_client
+    from core.services.signing_keys import signing_key_rotator
+    from core.services.rate_limit import rate_limit_janitor
+    from core.services.user_filter import user_filter_loader
+    from utilities.security import hashing_pool
+
     # startup
+    if settings.access.algorithm != "HS256":
+        # tokens can't be signed before the ring is loaded
+        await signing_key_rotator.run_once()
+        signing_key_rotator.start()
+    mail_templates.load_all()
+    await http_client.start()
+    if settings.reaper.enabled:
+        refresh_token_reaper.start()
+    user_stats_reconciler.start()
+    if settings.user_filter.enabled:
+        # built in the background, lookups hit the DB until then
+        user_filter_loader.start()
+    if settings.outbox.enabled:
+        email_outbox_worker.start()
+    if settings.rate_limit.backend == "postgres":
+        rate_limit_janitor.start()
     yield
     # shutdown
-    await db_helper.dispose()
\ No newline at end of file
+    await rate_limit_janitor.stop()
+    await user_filter_loader.stop()
+    await email_outbox_worker.stop()
+    await user_stats_reconciler.stop()
+    await refresh_token_reaper.stop()
+    await signing_key_rotator.stop()
+    await smtp_pool.close()
+    await http_client.close()
+    await db_helper.dispose()
+    hashing_pool.shutdown()
@@ -1,7 +1,19 @@
 __all__ = (
     "User",
-    "RefreshToken"
+    "RefreshToken",
+    "UserStats",
+    "SignupRollup",
+    "EmailOutbox",
+    "OauthAccount",
+    "SigningKey",
+    "RateLimitBucket",
 )
 
 from .user import User
-from .refresh_token import RefreshToken
\ No newline at end of file
+from .refresh_token import RefreshToken
+from .user_stats import UserStats
+from .signup_rollup import SignupRollup
+from .email_outbox import EmailOutbox
+from .oauth_account import OauthAccount
+from .signing_key import SigningKey
+from .rate_limit_bucket import RateLimitBucket
\ No newline at end of file
@@ -0,0 +1,32 @@
+from datetime import datetime
+from sqlalchemy import String, Integer, DateTime, Text, JSON, func
+from sqlalchemy.orm import Mapped, mapped_column
+from core.database import Base
+
+
+class EmailOutbox(Base):
+    """
+    Outgoing email written in the same transaction as the
+    user change, sent later by the outbox worker.
+    Rows are deleted once sent. Token links are built at send
+    time from the user id in the context, so retries stay valid.
+    Failed rows lose their context and are purged after a retention.
+    """
+    __tablename__ = "email_outbox"
+    
+    id: Mapped[int] = mapped_column(primary_key=True)
+    # key of the sender in core.mailing.outbox.SENDERS
+    kind: Mapped[str] = mapped_column(String(50))
+    recipient: Mapped[str] = mapped_column(String(100))
+    username: Mapped[str] = mapped_column(String(30))
+    context: Mapped[dict] = mapped_column(JSON, default=dict)
+    # pending or failed
+    status: Mapped[str] = mapped_column(String(20), default="pending")
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    last_error: Mapped[str | None] = mapped_column(Text, nullable=True)
+    # failed rows: when they failed
+    next_attempt_at: Mapped[datetime] = mapped_column(DateTime, index=True)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime, 
+        server_default=func.now(),
+        )
@@ -0,0 +1,33 @@
+from datetime import datetime
+from sqlalchemy import String, ForeignKey, DateTime, UniqueConstraint, func
+from sqlalchemy.orm import Mapped, mapped_column
+from core.database import Base
+
+
+class OauthAccount(Base):
+    """
+    Link between a user and an account at an OAuth provider.
+    """
+    __tablename__ = "oauth_accounts"
+    __table_args__ = (
+        UniqueConstraint("provider", "subject"),
+    )
+    
+    id: Mapped[int] = mapped_column(primary_key=True)
+    # name in core.oauth.providers
+    provider: Mapped[str] = mapped_column(String(30))
+    # user id at the provider: `sub` claim or GitHub id
+    subject: Mapped[str] = mapped_column(String(255))
+    
+    user_id: Mapped[int] = mapped_column(
+        ForeignKey(
+            "users.id", 
+            ondelete="CASCADE"
+            ),
+        index=True,
+        )
+    
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime, 
+        server_default=func.now(),
+        )
@@ -0,0 +1,25 @@
+from datetime import datetime
+from sqlalchemy import String, Float, DateTime, func
+from sqlalchemy.orm import Mapped, mapped_column
+from core.database import Base
+
+
+class RateLimitBucket(Base):
+    """
+    Token bucket of the postgres rate limiter.
+    UNLOGGED: no WAL on every login attempt, the buckets
+    are simply empty again after a crash.
+    """
+    __tablename__ = "rate_limit_buckets"
+    __table_args__ = {"prefixes": ["UNLOGGED"]}
+    
+    # e.g. "login:ip:10.0.0.1", identifiers are hashed
+    key: Mapped[str] = mapped_column(String(128), primary_key=True)
+    tokens: Mapped[float] = mapped_column(Float)
+    # tokens per second and bucket size of the rule
+    rate: Mapped[float] = mapped_column(Float)
+    burst: Mapped[float] = mapped_column(Float)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime, 
+        server_default=func.now(),
+        )
@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import String, Boolean, ForeignKey, DateTime, func
+from sqlalchemy import LargeBinary, Boolean, ForeignKey, DateTime, func
 from sqlalchemy.orm import Mapped, mapped_column
 from core.database import Base
 
@@ -8,14 +8,17 @@ class RefreshToken(Base):
     
     id: Mapped[int] = mapped_column(primary_key=True)
     
+    # indexed: revocation and ON DELETE CASCADE look tokens up by user
     user_id: Mapped[int] = mapped_column(
         ForeignKey(
             "users.id", 
             ondelete="CASCADE"
-            )
+            ),
+        index=True,
         )
     
-    token: Mapped[str] = mapped_column(String(500), unique=True, index=True)
+    # sha256 of the issued token, the token itself is never stored
+    token_hash: Mapped[bytes] = mapped_column(LargeBinary(32), unique=True, index=True)
     
     is_revoked: Mapped[bool] = mapped_column(Boolean, default=False)
     
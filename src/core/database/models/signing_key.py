@@ -0,0 +1,25 @@
+from datetime import datetime
+from sqlalchemy import String, Text, DateTime, JSON, func
+from sqlalchemy.orm import Mapped, mapped_column
+from core.database import Base
+
+
+class SigningKey(Base):
+    """
+    Asymmetric JWT signing key shared by all workers.
+    """
+    __tablename__ = "signing_keys"
+    
+    kid: Mapped[str] = mapped_column(String(64), primary_key=True)
+    algorithm: Mapped[str] = mapped_column(String(10))
+    # PKCS8 PEM encrypted with settings.access.secret_key
+    private_key: Mapped[str] = mapped_column(Text)
+    public_jwk: Mapped[dict] = mapped_column(JSON)
+    # signs from this moment, published in the JWKS before
+    active_from: Mapped[datetime] = mapped_column(DateTime)
+    # removed from the ring after this moment
+    expires_at: Mapped[datetime] = mapped_column(DateTime, index=True)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime, 
+        server_default=func.now(),
+        )
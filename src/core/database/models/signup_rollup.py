@@ -0,0 +1,17 @@
+from datetime import datetime
+from sqlalchemy import BigInteger, DateTime
+from sqlalchemy.orm import Mapped, mapped_column
+from core.database import Base
+
+
+class SignupRollup(Base):
+    """
+    Signups and verifications per hour,
+    incremented as the events happen.
+    """
+    __tablename__ = "signup_rollup"
+    
+    # start of the hour, UTC
+    bucket: Mapped[datetime] = mapped_column(DateTime, primary_key=True)
+    signups: Mapped[int] = mapped_column(BigInteger, default=0, server_default="0")
+    verifications: Mapped[int] = mapped_column(BigInteger, default=0, server_default="0")
@@ -24,5 +24,8 @@ class User(Base):
     is_active: Mapped[bool] = mapped_column(Boolean, default=True)
     is_verified: Mapped[bool] = mapped_column(Boolean, default=False)
     is_superuser: Mapped[bool] = mapped_column(Boolean, default=False)
-    created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now(), nullable=False)
-    github_id: Mapped[int] = mapped_column(Integer, unique=True, nullable=True)
\ No newline at end of file
+    created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now(), nullable=False, index=True)
+    # superseded by oauth_accounts, kept for existing rows
+    github_id: Mapped[int] = mapped_column(Integer, unique=True, nullable=True)
+    # bumped to invalidate already issued access tokens
+    token_version: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
\ No newline at end of file
@@ -0,0 +1,21 @@
+from datetime import datetime
+from sqlalchemy import BigInteger, DateTime, func
+from sqlalchemy.orm import Mapped, mapped_column
+from core.database import Base
+
+
+class UserStats(Base):
+    """
+    Single row of user counters, kept up to date
+    by the write paths in the same transaction.
+    """
+    __tablename__ = "user_stats"
+    
+    id: Mapped[int] = mapped_column(primary_key=True)
+    total_users: Mapped[int] = mapped_column(BigInteger, default=0, server_default="0")
+    active_users: Mapped[int] = mapped_column(BigInteger, default=0, server_default="0")
+    verified_users: Mapped[int] = mapped_column(BigInteger, default=0, server_default="0")
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime, 
+        server_default=func.now(),
+        )
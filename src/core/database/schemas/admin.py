@@ -0,0 +1,25 @@
+from typing import Literal
+from pydantic import BaseModel, Field, model_validator
+
+
+class BulkUserAction(BaseModel):
+    action: Literal["deactivate", "reactivate", "delete"]
+    # either explicit ids...
+    ids: list[int] | None = Field(default=None, max_length=100_000)
+    # ...or one of the admin listings, e.g. unverified older than N days
+    filter: Literal["good", "new", "unverified"] | None = None
+    days: int = Field(default=7, ge=0)
+    
+    @model_validator(mode="after")
+    def one_target(self) -> "BulkUserAction":
+        if (self.ids is None) == (self.filter is None):
+            raise ValueError("pass either ids or filter")
+        return self
+
+
+class BulkUserActionResult(BaseModel):
+    action: str
+    affected: int
+    ids: list[int]
+    # revoked for deactivate, deleted with the users for delete
+    refresh_tokens: int
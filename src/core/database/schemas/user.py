@@ -1,3 +1,4 @@
+from datetime import datetime
 from pydantic import BaseModel, EmailStr, ConfigDict
 
 class UserBase(BaseModel):
@@ -27,4 +28,11 @@ class UserResponse(UserBase):
     
     
 class UserAdminResponse(UserResponse):
-    pass
\ No newline at end of file
+    created_at: datetime
+
+
+class UserAdminPage(BaseModel):
+    items: list[UserAdminResponse]
+    next: str | None = None
+    
+    model_config = ConfigDict(from_attributes=True,)
\ No newline at end of file
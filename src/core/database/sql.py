@@ -0,0 +1,18 @@
+from typing import Any, Sequence
+
+from sqlalchemy import Integer, any_, bindparam
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.sql.elements import ColumnElement
+
+
+def in_array(
+    column: ColumnElement,
+    values: Sequence[Any],
+    item_type=Integer,
+) -> ColumnElement[bool]:
+    """
+    `column = ANY(:values)` with the whole list bound as one
+    array parameter, so the statement text (and its prepared plan)
+    is the same for any number of values, unlike an expanding IN.
+    """
+    return column == any_(bindparam(None, list(values), type_=ARRAY(item_type)))
@@ -0,0 +1,56 @@
+from typing import Callable
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+class UnitOfWork:
+    """
+    One transaction per use case.
+    Service methods end their writes with `await uow.commit()`.
+    Inside an `async with uow:` block that is deferred to the end
+    of the block, so a method reused by another use case
+    (e.g. revoking refresh tokens on password reset) joins the
+    caller's transaction instead of committing early.
+    Pending ORM objects go out in one flush at commit.
+    """
+    def __init__(self, session: AsyncSession):
+        self.session = session
+        self._depth = 0
+        self._after_commit: list[Callable[[], None]] = []
+
+    async def __aenter__(self) -> AsyncSession:
+        self._depth += 1
+        return self.session
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        self._depth -= 1
+        if self._depth:
+            return
+        if exc_type is None:
+            await self._commit()
+        else:
+            await self.rollback()
+
+    def after_commit(self, callback: Callable[[], None]) -> None:
+        """
+        Run callback once the transaction commits,
+        e.g. to drop cache entries of changed rows.
+        Dropped on rollback.
+        """
+        self._after_commit.append(callback)
+
+    async def commit(self) -> None:
+        """ Commit now, or at the end of the enclosing block """
+        if self._depth:
+            return
+        await self._commit()
+
+    async def _commit(self) -> None:
+        await self.session.commit()
+        callbacks, self._after_commit = self._after_commit, []
+        for callback in callbacks:
+            callback()
+
+    async def rollback(self) -> None:
+        self._after_commit.clear()
+        await self.session.rollback()
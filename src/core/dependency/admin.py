@@ -1,17 +1,16 @@
 from typing import Annotated
 from fastapi import Depends
 
-from core.database.models import User
 from exceptions.auth import AccessDenied
-from .user import get_current_user
+from .user import Principal, get_current_principal
 
 
 async def get_current_superuser(
     user: Annotated[
-        User,
-        Depends(get_current_user)
+        Principal,
+        Depends(get_current_principal)
     ]
-) -> User:
+) -> Principal:
     if not user.is_superuser:
         raise AccessDenied
     return user
\ No newline at end of file
@@ -0,0 +1,79 @@
+from fastapi import Request
+
+from core.config import settings
+from core.services.rate_limit import Limit, identifier_key, rate_limiter
+from utilities.security import hashing_pool
+
+
+def client_ip(request: Request, trusted_proxies: int | None = None) -> str:
+    """
+    Address the nearest of the trusted proxies saw the request from.
+    Each proxy appends the peer it got the request from, so only the
+    rightmost `trusted_proxies` entries can be believed: anything to
+    the left was sent by the client and changes at will.
+    """
+    if trusted_proxies is None:
+        trusted_proxies = settings.rate_limit.trusted_proxies
+    if trusted_proxies > 0:
+        forwarded = [
+            entry.strip()
+            for entry in request.headers.get("x-forwarded-for", "").split(",")
+            if entry.strip()
+        ]
+        if forwarded:
+            return forwarded[max(0, len(forwarded) - trusted_proxies)]
+    return request.client.host if request.client else "unknown"
+
+
+class Throttle:
+    """
+    Route dependency run before the handler, so a shed or
+    rate limited request never reaches the database or bcrypt.
+    Limits by client IP and, when `identifier_field` is set,
+    by that field of the JSON body, e.g. the login.
+    With `admission` the request is first shed if the hashing
+    pool is full, for routes that hash passwords.
+    """
+    def __init__(
+        self,
+        action: str,
+        identifier_field: str | None = None,
+        admission: bool = True,
+    ):
+        self.action = action
+        self.identifier_field = identifier_field
+        self.admission = admission
+        self.ip_rule = getattr(settings.rate_limit, f"{action}_ip")
+        self.identifier_rule = getattr(settings.rate_limit, f"{action}_identifier", None)
+
+    async def identifier(self, request: Request) -> str | None:
+        if self.identifier_field is None:
+            return None
+        try:
+            # the body is already read and cached for the handler
+            body = await request.json()
+        except ValueError:
+            return None
+        value = body.get(self.identifier_field) if isinstance(body, dict) else None
+        return value if isinstance(value, str) and value.strip() else None
+
+    async def __call__(self, request: Request) -> None:
+        if self.admission:
+            hashing_pool.admit()
+
+        limits = [Limit.from_rule(f"{self.action}:ip:{client_ip(request)}", self.ip_rule)]
+        identifier = await self.identifier(request)
+        if identifier is not None and self.identifier_rule is not None:
+            limits.append(
+                Limit.from_rule(
+                    f"{self.action}:id:{identifier_key(identifier)}",
+                    self.identifier_rule,
+                )
+            )
+        await rate_limiter.check(*limits)
+
+
+throttle_login = Throttle("login", identifier_field="login")
+throttle_register = Throttle("register")
+throttle_reset_password = Throttle("reset_password")
+throttle_availability = Throttle("availability", admission=False)
@@ -1,22 +1,19 @@
-from fastapi import BackgroundTasks, Depends
+from fastapi import Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Annotated
 from core.database import db_helper
 from core.services.user import UserService
 from core.services.admin import AdminService
 from core.services.oauth import OauthService
+from core.oauth.http_client import http_client
 
 async def get_user_service(
-    background_task: BackgroundTasks,
     session: Annotated[
         AsyncSession,
         Depends(db_helper.session_getter)
         ]
 ) -> UserService:
-    return UserService(
-        session=session,
-        background_task=background_task
-        )
+    return UserService(session=session)
     
     
 async def get_admin_service(
@@ -34,4 +31,4 @@ async def get_oauth_service(
         Depends(db_helper.session_getter)
     ],   
 ) -> OauthService:
-    return OauthService(session=session)
\ No newline at end of file
+    return OauthService(session=session, http=http_client.session)
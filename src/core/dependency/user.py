@@ -1,45 +1,130 @@
+from dataclasses import dataclass
+from datetime import timezone
 from typing import Annotated
 from fastapi import Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from core.database.models import User
+from core.config import settings
 from core.database import db_helper
+from core.cache import UserSnapshot, user_cache
+from utilities.clock import get_clock
 from utilities.jwt_token import verify_token
 from core.services.user import UserService
 from .transport import security
 
-async def get_current_user(
+
+@dataclass(frozen=True, slots=True)
+class TokenPrincipal:
+    """
+    User built only from verified access token claims.
+    """
+    id: int
+    username: str
+    is_active: bool
+    is_superuser: bool
+    token_version: int
+
+
+Principal = UserSnapshot | TokenPrincipal
+
+
+credentials_exception = HTTPException(
+    status_code=status.HTTP_401_UNAUTHORIZED,
+    detail="Could not validate credentials",
+)
+
+
+def get_access_payload(
     token: Annotated[
         str,
         Depends(security)
-    ], 
-    session: Annotated[
-        AsyncSession,
-        Depends(db_helper.session_getter)
-    ]
-) -> User:
-    
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-    )
-    
+    ],
+) -> dict:
+    """
+    Verify access token and return its payload
+    with `sub` converted to int.
+    """
     payload = verify_token(token.credentials, expected_type="access_token")
     if not payload:
         raise credentials_exception
-    
+
     user_id_str: str = payload.get("sub")
     if not user_id_str:
         raise credentials_exception
-    
+
     try:
-        user_id = int(user_id_str)
+        payload["sub"] = int(user_id_str)
     except ValueError:
         raise credentials_exception
-    
-    user_service = UserService(session) 
-    user = await user_service.get_user_by_id(user_id=user_id)
-    if not user:
+
+    # revoked tokens are already refused by verify_token,
+    # see is_access_token_revoked in core.cache.user_cache
+    return payload
+
+
+def _check_token_version(payload: dict, token_version: int) -> None:
+    if payload.get("ver", 0) < token_version:
         raise credentials_exception
-    
-    return user 
+
+
+async def get_current_user(
+    payload: Annotated[
+        dict,
+        Depends(get_access_payload)
+    ],
+    session: Annotated[
+        AsyncSession,
+        Depends(db_helper.session_getter)
+    ]
+) -> UserSnapshot:
+
+    user_id = payload["sub"]
+
+    # hot path: served from the per-worker cache without touching the DB
+    snapshot = user_cache.get_user(user_id)
+    if not snapshot:
+        user_service = UserService(session)
+        user = await user_service.get_user_by_id(user_id=user_id)
+        if not user:
+            raise credentials_exception
+        snapshot = user_cache.put_user(user)
+
+    _check_token_version(payload, snapshot.token_version)
+    return snapshot
+
+
+async def get_current_principal(
+    payload: Annotated[
+        dict,
+        Depends(get_access_payload)
+    ],
+    session: Annotated[
+        AsyncSession,
+        Depends(db_helper.session_getter)
+    ]
+) -> Principal:
+    """
+    With `access.stateless` enabled the user is built from
+    token claims: no queries and no pool checkouts.
+    Otherwise falls back to get_current_user.
+    """
+    if not settings.access.stateless or "ver" not in payload:
+        return await get_current_user(payload=payload, session=session)
+
+    # a token issued with the long lifetime, e.g. before stateless
+    # mode was enabled, would outlive its revocation on other workers
+    now = get_clock().coarse_now().replace(tzinfo=timezone.utc).timestamp()
+    expires = payload.get("exp")
+    if expires is None or expires - now > settings.access.stateless_expire_at * 60:
+        return await get_current_user(payload=payload, session=session)
+
+    if not payload.get("is_active", False):
+        raise credentials_exception
+
+    return TokenPrincipal(
+        id=payload["sub"],
+        username=payload.get("username", ""),
+        is_active=payload["is_active"],
+        is_superuser=payload.get("is_superuser", False),
+        token_version=payload["ver"],
+    )
@@ -1,14 +1,24 @@
-import aiosmtplib
+from dataclasses import dataclass
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 
+from core.config import settings
+from .smtp_pool import smtp_pool
+
+@dataclass(frozen=True, slots=True)
+class MailRecipient:
+    """ What the mail templates need to know about the user """
+    email: str
+    username: str
+
+
 async def send_email(
     recipient: str,
     subject: str,
     plain_content: str,
     html_content: str = ""
 ):
-    admin_email = "admin@site.com"
+    admin_email = settings.mailing.sender
     
     message = MIMEMultipart("alternative")
     message["From"] = admin_email
@@ -32,8 +42,4 @@ async def send_email(
         )
         message.attach(html_message)
         
-    await aiosmtplib.send(
-        message,
-        hostname="127.0.0.1",
-        port=1025,
-    )
\ No newline at end of file
+    await smtp_pool.send(message)
\ No newline at end of file
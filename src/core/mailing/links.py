@@ -0,0 +1,46 @@
+from datetime import timedelta
+
+from utilities.jwt_token import create_jwt_token
+
+
+VERIFICATION_URL = "http://localhost:8000/verification-proccess?token={token}"
+RESET_URL = "http://localhost:8000/reset-proccess?token={token}"
+# an outbox email is retried for longer than this,
+# so its token is minted when it is sent, not when queued
+LINK_EXPIRE = timedelta(minutes=5)
+
+
+def verification_link(user_id: int) -> str:
+    token = create_jwt_token(
+        {"sub": str(user_id), "type": "email_verification"},
+        expires_delta=LINK_EXPIRE,
+    )
+    return VERIFICATION_URL.format(token=token)
+
+
+def reset_link(user_id: int) -> str:
+    token = create_jwt_token(
+        {"sub": str(user_id), "type": "password_reset"},
+        expires_delta=LINK_EXPIRE,
+    )
+    return RESET_URL.format(token=token)
+
+
+# email kind -> context key of its link and how to build it
+LINKS = {
+    "verification": ("verification_link", verification_link),
+    "password_reset": ("reset_link", reset_link),
+}
+
+
+def with_link(kind: str, context: dict) -> dict:
+    """
+    Sender context with the link for the queued `user_id`
+    built now, so every attempt mails a live token.
+    """
+    if kind not in LINKS or "user_id" not in context:
+        return context
+    name, build = LINKS[kind]
+    context = dict(context)
+    context[name] = build(context.pop("user_id"))
+    return context
@@ -0,0 +1,288 @@
+import time
+import asyncio
+import logging
+from datetime import timedelta
+
+from sqlalchemy import select, update, delete
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from core.config import settings
+from core.database import db_helper
+from core.database.models import EmailOutbox
+from utilities.clock import get_clock
+
+from .base_send_email import MailRecipient
+from .links import with_link
+from .send_email_to_verify import send_verification_email
+from .send_email_after_verify import send_answer_after_verify
+from .send_email_to_forgot_password import send_pasword_reset_email
+from .send_email_to_reset_password import send_answer_after_reset_password
+
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+SENDERS = {
+    "verification": send_verification_email,
+    "after_verify": send_answer_after_verify,
+    "password_reset": send_pasword_reset_email,
+    "after_reset_password": send_answer_after_reset_password,
+}
+
+
+def enqueue_email(
+    session: AsyncSession,
+    kind: str,
+    user: MailRecipient,
+    **context,
+) -> EmailOutbox:
+    """
+    Add email to the outbox.
+    Does not commit: it is sent only if the caller's
+    transaction commits.
+    Emails with a token link get `user_id` in the context,
+    the link is built when the email is sent.
+    """
+    if kind not in SENDERS:
+        raise ValueError(f"unknown email kind {kind!r}")
+
+    email = EmailOutbox(
+        kind=kind,
+        recipient=user.email,
+        username=user.username,
+        context=context,
+        status="pending",
+        attempts=0,
+        next_attempt_at=get_clock().now(),
+    )
+    session.add(email)
+    return email
+
+
+class EmailOutboxWorker:
+    """
+    Drains email_outbox with `concurrency` coroutines.
+    Each claims a batch with FOR UPDATE SKIP LOCKED, sends it
+    over the pooled SMTP connections and retries failures
+    with exponential backoff.
+    The lease of a claimed batch is renewed while it is being
+    sent, so a slow batch is not claimed and sent twice.
+    Failed rows are purged after `failed_retention` seconds.
+    """
+    def __init__(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        concurrency: int = 2,
+        batch_size: int = 50,
+        poll_interval: float = 1.0,
+        max_attempts: int = 5,
+        backoff_base: float = 5,
+        lease: int = 120,
+        failed_retention: int = 7 * 24 * 3600,
+        purge_interval: int = 3600,
+    ):
+        self.session_factory = session_factory
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.lease = lease
+        self.failed_retention = failed_retention
+        self.purge_interval = purge_interval
+        self._next_purge = 0.0
+        self.metrics = {
+            "sent": 0,
+            "failed": 0,
+            "retried": 0,
+            "purged": 0,
+            "batches": 0,
+            "last_batch_size": 0,
+            "last_batch_per_second": 0.0,
+        }
+        self._tasks: list[asyncio.Task] = []
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        self._tasks = [
+            asyncio.create_task(self._run(), name=f"email-outbox-{number}")
+            for number in range(self.concurrency)
+        ]
+
+    async def stop(self) -> None:
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                if time.monotonic() >= self._next_purge:
+                    self._next_purge = time.monotonic() + self.purge_interval
+                    await self.purge_failed()
+                processed = await self.process_batch()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Email outbox worker failed")
+                processed = 0
+
+            # full batch: more is probably waiting
+            if processed < self.batch_size:
+                await asyncio.sleep(self.poll_interval)
+
+    async def claim_batch(self) -> list[EmailOutbox]:
+        """
+        Lease due emails to this worker by pushing their
+        next_attempt_at forward, so other workers skip them.
+        """
+        now = get_clock().now()
+        due_ids = (
+            select(EmailOutbox.id)
+            .where(
+                EmailOutbox.status == "pending",
+                EmailOutbox.next_attempt_at <= now,
+            )
+            .order_by(EmailOutbox.next_attempt_at)
+            .limit(self.batch_size)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        stmt = (
+            update(EmailOutbox)
+            .where(EmailOutbox.id.in_(due_ids))
+            .values(
+                attempts=EmailOutbox.attempts + 1,
+                next_attempt_at=now + timedelta(seconds=self.lease),
+            )
+            .returning(EmailOutbox)
+        )
+        async with self.session_factory() as session:
+            result = await session.execute(stmt)
+            emails = list(result.scalars())
+            await session.commit()
+            return emails
+
+    async def renew_lease(self, ids: list[int]) -> None:
+        """ Keep the batch leased to this worker until cancelled """
+        while True:
+            await asyncio.sleep(self.lease / 3)
+            try:
+                async with self.session_factory() as session:
+                    await session.execute(
+                        update(EmailOutbox)
+                        .where(
+                            EmailOutbox.id.in_(ids),
+                            EmailOutbox.status == "pending",
+                        )
+                        .values(
+                            next_attempt_at=get_clock().now() + timedelta(seconds=self.lease)
+                        )
+                    )
+                    await session.commit()
+            except Exception:
+                logger.exception("Email outbox lease renewal failed")
+
+    async def send(self, email: EmailOutbox) -> None:
+        sender = SENDERS[email.kind]
+        await sender(
+            user=MailRecipient(email=email.recipient, username=email.username),
+            **with_link(email.kind, email.context),
+        )
+
+    async def process_batch(self) -> int:
+        emails = await self.claim_batch()
+        if not emails:
+            return 0
+
+        started = time.perf_counter()
+        renewal = asyncio.create_task(
+            self.renew_lease([email.id for email in emails])
+        )
+        try:
+            results = await asyncio.gather(
+                *(self.send(email) for email in emails),
+                return_exceptions=True,
+            )
+        finally:
+            renewal.cancel()
+            await asyncio.gather(renewal, return_exceptions=True)
+
+        sent_ids = []
+        now = get_clock().now()
+        async with self.session_factory() as session:
+            for email, error in zip(emails, results):
+                if error is None:
+                    sent_ids.append(email.id)
+                    continue
+
+                if email.attempts >= self.max_attempts:
+                    # the context holds live token links, not needed
+                    # to tell why the email failed
+                    values = {
+                        "status": "failed",
+                        "context": {},
+                        "next_attempt_at": now,
+                    }
+                    self.metrics["failed"] += 1
+                    logger.error(
+                        "Email %r to %r failed for good: %r",
+                        email.kind, email.recipient, error
+                    )
+                else:
+                    delay = self.backoff_base * 2 ** (email.attempts - 1)
+                    values = {"next_attempt_at": now + timedelta(seconds=delay)}
+                    self.metrics["retried"] += 1
+
+                await session.execute(
+                    update(EmailOutbox)
+                    .where(EmailOutbox.id == email.id)
+                    .values(last_error=repr(error)[:1000], **values)
+                )
+
+            if sent_ids:
+                await session.execute(
+                    delete(EmailOutbox).where(EmailOutbox.id.in_(sent_ids))
+                )
+            await session.commit()
+
+        elapsed = time.perf_counter() - started
+        self.metrics["sent"] += len(sent_ids)
+        self.metrics["batches"] += 1
+        self.metrics["last_batch_size"] = len(emails)
+        self.metrics["last_batch_per_second"] = len(emails) / elapsed if elapsed else 0.0
+        return len(emails)
+
+    async def purge_failed(self) -> int:
+        """ Delete failed rows older than the retention """
+        cutoff = get_clock().now() - timedelta(seconds=self.failed_retention)
+        async with self.session_factory() as session:
+            result = await session.execute(
+                delete(EmailOutbox).where(
+                    EmailOutbox.status == "failed",
+                    EmailOutbox.next_attempt_at < cutoff,
+                )
+            )
+            await session.commit()
+
+        self.metrics["purged"] += result.rowcount
+        return result.rowcount
+
+    def stats(self) -> dict:
+        return dict(self.metrics)
+
+
+email_outbox_worker = EmailOutboxWorker(
+    session_factory=db_helper.session_factory,
+    concurrency=settings.outbox.concurrency,
+    batch_size=settings.outbox.batch_size,
+    poll_interval=settings.outbox.poll_interval,
+    max_attempts=settings.outbox.max_attempts,
+    backoff_base=settings.outbox.backoff_base,
+    lease=settings.outbox.lease,
+    failed_retention=settings.outbox.failed_retention,
+    purge_interval=settings.outbox.purge_interval,
+)
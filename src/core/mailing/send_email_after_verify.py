@@ -1,40 +1,20 @@
-from textwrap import dedent
-from core.database.models import User
-from .base_send_email import send_email
-from core.jinja.jinja_templates import templates
+from .base_send_email import MailRecipient, send_email
+from .templates import mail_templates
+
 
 async def send_answer_after_verify(
-    user: User,
+    user: MailRecipient,
 ):
-    recipient = user.email
-    subject = "Email confirmed"
-    
-    plain_content = dedent(
-        f"""\
-        Dear {recipient},
-        
-        Email was successfully confirmed!
-        
-        Your site admin,
-        ©️ 2025.
-        """
-    )
-    
-    
-    template = templates.get_template(
-        "mailing/email-verifying/after_verify.html"
+    html_content, plain_content = mail_templates.render(
+        "mailing/email-verifying/after_verify.html",
+        {
+            "user": user,
+        },
     )
-    
-    context = {
-        "user": user,
-    }
-    
-    html_content = template.render(context)
-    
+
     await send_email(
-        recipient=recipient,
-        subject=subject,
+        recipient=user.email,
+        subject="Email confirmed",
         plain_content=plain_content,
-        html_content=html_content
+        html_content=html_content,
     )
-    
\ No newline at end of file
@@ -1,42 +1,22 @@
-from textwrap import dedent
-from core.database.models import User
-from .base_send_email import send_email
-from core.jinja.jinja_templates import templates
+from .base_send_email import MailRecipient, send_email
+from .templates import mail_templates
 
 
 async def send_pasword_reset_email(
-    user: User,
+    user: MailRecipient,
     reset_link: str,
 ):
-    recipient = user.email
-    subject = "Forgot password for site.com"
-    
-    plain_content = dedent(
-        f"""\
-        Dear {recipient},
-        
-        Please follow the link to reset your old password:
-        {reset_link}
-        
-        Your site admin,
-        ©️ 2025.
-        """
+    html_content, plain_content = mail_templates.render(
+        "mailing/password/forgot_password.html",
+        {
+            "user": user,
+            "reset_link": reset_link,
+        },
     )
-    
-    template = templates.get_template(
-        "mailing/password/forgot_password.html"
-    )
-    
-    context = {
-        "user": user,
-        "reset_link": reset_link,
-    }
-    
-    html_content = template.render(context)
-    
+
     await send_email(
-        recipient=recipient,
-        subject=subject,
+        recipient=user.email,
+        subject="Forgot password for site.com",
         plain_content=plain_content,
         html_content=html_content,
-    )
\ No newline at end of file
+    )
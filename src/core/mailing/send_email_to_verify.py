@@ -1,42 +1,22 @@
-from textwrap import dedent
-from core.database.models import User
-from .base_send_email import send_email
-from core.jinja.jinja_templates import templates
+from .base_send_email import MailRecipient, send_email
+from .templates import mail_templates
+
 
 async def send_verification_email(
-    user: User,
+    user: MailRecipient,
     verification_link: str,
 ):
-    recipient = user.email
-    subject = "Confirm your email for site.com"
-    
-    plain_content = dedent(
-        f"""\
-        Dear {recipient},
-        
-        Please follow the link to verify your email:
-        {verification_link}
-        
-        Your site admin,
-        ©️ 2025.
-        """
-    )
-    
-    template = templates.get_template(
-        "mailing/email-verifying/before_verify.html"
+    html_content, plain_content = mail_templates.render(
+        "mailing/email-verifying/before_verify.html",
+        {
+            "user": user,
+            "verification_link": verification_link,
+        },
     )
-    
-    context = {
-        "user": user,
-        "verification_link": verification_link,
-    }
-    
-    html_content = template.render(context)
-    
+
     await send_email(
-        recipient=recipient,
-        subject=subject,
+        recipient=user.email,
+        subject="Confirm your email for site.com",
         plain_content=plain_content,
-        html_content=html_content
+        html_content=html_content,
     )
-    
\ No newline at end of file
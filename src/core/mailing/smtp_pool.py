@@ -0,0 +1,123 @@
+import time
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from email.message import Message
+from typing import AsyncIterator
+
+import aiosmtplib
+
+from core.config import settings
+
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class SMTPPool:
+    """
+    Long-lived SMTP connections shared by all senders,
+    so a message doesn't pay for TCP, EHLO and TLS every time.
+    """
+    def __init__(
+        self,
+        hostname: str,
+        port: int,
+        size: int = 4,
+        idle_timeout: float = 60,
+        health_check_after: float = 15,
+        **smtp_options,
+    ):
+        self.hostname = hostname
+        self.port = port
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self.health_check_after = health_check_after
+        self.smtp_options = smtp_options
+        # most recently used last: (client, last used at)
+        self._idle: list[tuple[aiosmtplib.SMTP, float]] = []
+        self._slots: asyncio.Semaphore | None = None
+
+    async def _connect(self) -> aiosmtplib.SMTP:
+        client = aiosmtplib.SMTP(
+            hostname=self.hostname,
+            port=self.port,
+            **self.smtp_options,
+        )
+        await client.connect()
+        return client
+
+    async def _discard(self, client: aiosmtplib.SMTP) -> None:
+        try:
+            if client.is_connected:
+                await client.quit()
+        except aiosmtplib.SMTPException:
+            client.close()
+
+    async def _checkout(self) -> aiosmtplib.SMTP:
+        while self._idle:
+            client, last_used = self._idle.pop()
+            idle_for = time.monotonic() - last_used
+
+            if not client.is_connected or idle_for > self.idle_timeout:
+                await self._discard(client)
+                continue
+
+            if idle_for > self.health_check_after:
+                try:
+                    await client.noop()
+                except aiosmtplib.SMTPException:
+                    client.close()
+                    continue
+
+            return client
+
+        return await self._connect()
+
+    @asynccontextmanager
+    async def connection(self) -> AsyncIterator[aiosmtplib.SMTP]:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.size)
+
+        async with self._slots:
+            client = await self._checkout()
+            try:
+                yield client
+            except BaseException:
+                # state unknown, don't hand it out again
+                client.close()
+                raise
+            else:
+                self._idle.append((client, time.monotonic()))
+
+    async def send(self, message: Message) -> None:
+        """
+        Send message over a pooled connection.
+        A dropped connection is replaced and the send retried once.
+        """
+        try:
+            async with self.connection() as client:
+                await client.send_message(message)
+        except aiosmtplib.SMTPServerDisconnected:
+            logger.warning("SMTP connection dropped, reconnecting")
+            async with self.connection() as client:
+                await client.send_message(message)
+
+    async def close(self) -> None:
+        idle, self._idle = self._idle, []
+        for client, _ in idle:
+            await self._discard(client)
+
+
+smtp_pool = SMTPPool(
+    hostname=settings.mailing.hostname,
+    port=settings.mailing.port,
+    size=settings.mailing.pool_size,
+    idle_timeout=settings.mailing.idle_timeout,
+    health_check_after=settings.mailing.health_check_after,
+    username=settings.mailing.username,
+    password=settings.mailing.password,
+    use_tls=settings.mailing.use_tls,
+    start_tls=settings.mailing.start_tls,
+    timeout=settings.mailing.timeout,
+)
@@ -0,0 +1,68 @@
+from pathlib import Path
+
+from jinja2 import (
+    Environment,
+    FileSystemBytecodeCache,
+    FileSystemLoader,
+    Template,
+    select_autoescape,
+)
+
+from core.config import BASE_DIR, settings
+
+
+class MailTemplates:
+    """
+    Registry of compiled mail templates.
+    Every template has an html layout and a `text` block,
+    both parts are rendered from the same compiled template.
+    """
+    def __init__(
+        self,
+        directory: Path,
+        bytecode_cache_dir: str | None = None,
+    ):
+        bytecode_cache = None
+        if bytecode_cache_dir:
+            Path(bytecode_cache_dir).mkdir(parents=True, exist_ok=True)
+            bytecode_cache = FileSystemBytecodeCache(bytecode_cache_dir)
+
+        self.env = Environment(
+            loader=FileSystemLoader(directory),
+            autoescape=select_autoescape(["html"]),
+            bytecode_cache=bytecode_cache,
+            # templates don't change while running
+            auto_reload=False,
+            trim_blocks=True,
+            lstrip_blocks=True,
+        )
+        self._compiled: dict[str, Template] = {}
+
+    def load_all(self) -> int:
+        """ Compile every mailing template, return how many """
+        for name in self.env.list_templates(
+            filter_func=lambda name: name.startswith("mailing/") and name.endswith(".html")
+        ):
+            self._compiled[name] = self.env.get_template(name)
+        return len(self._compiled)
+
+    def get(self, name: str) -> Template:
+        template = self._compiled.get(name)
+        if template is None:
+            template = self._compiled[name] = self.env.get_template(name)
+        return template
+
+    def render(self, name: str, context: dict) -> tuple[str, str]:
+        """ Return (html, plain text) """
+        template = self.get(name)
+        html = template.render(context)
+        text = "".join(
+            template.blocks["text"](template.new_context(context))
+        )
+        return html, text.strip() + "\n"
+
+
+mail_templates = MailTemplates(
+    directory=BASE_DIR / "core" / "templates",
+    bytecode_cache_dir=settings.mailing.template_cache_dir,
+)
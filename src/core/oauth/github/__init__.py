@@ -1,6 +0,0 @@
-__all__ = (
-    "github_auth_url"
-)
-
-from .url import github_auth_url
-
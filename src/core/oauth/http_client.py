@@ -0,0 +1,66 @@
+import aiohttp
+
+from core.config import settings
+
+
+class HTTPClient:
+    """
+    One aiohttp session for the whole app, so calls to the
+    OAuth providers reuse keep-alive connections and cached DNS
+    instead of a new handshake every time.
+    Opened and closed by the app lifespan.
+    """
+    def __init__(
+        self,
+        limit: int = 100,
+        limit_per_host: int = 20,
+        dns_cache_ttl: int = 300,
+        keepalive_timeout: float = 30,
+        connect_timeout: float = 3,
+        total_timeout: float = 10,
+    ):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.dns_cache_ttl = dns_cache_ttl
+        self.keepalive_timeout = keepalive_timeout
+        self.timeout = aiohttp.ClientTimeout(
+            total=total_timeout,
+            connect=connect_timeout,
+        )
+        self._session: aiohttp.ClientSession | None = None
+
+    async def start(self) -> None:
+        # the connector binds to the running loop, so not in __init__
+        if self._session is not None and not self._session.closed:
+            return
+        connector = aiohttp.TCPConnector(
+            limit=self.limit,
+            limit_per_host=self.limit_per_host,
+            ttl_dns_cache=self.dns_cache_ttl,
+            keepalive_timeout=self.keepalive_timeout,
+        )
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=self.timeout,
+        )
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            raise RuntimeError("HTTP client is not started")
+        return self._session
+
+    async def close(self) -> None:
+        session, self._session = self._session, None
+        if session is not None:
+            await session.close()
+
+
+http_client = HTTPClient(
+    limit=settings.http.limit,
+    limit_per_host=settings.http.limit_per_host,
+    dns_cache_ttl=settings.http.dns_cache_ttl,
+    keepalive_timeout=settings.http.keepalive_timeout,
+    connect_timeout=settings.http.connect_timeout,
+    total_timeout=settings.http.total_timeout,
+)
@@ -0,0 +1,129 @@
+import re
+import time
+import asyncio
+import logging
+from dataclasses import dataclass
+
+import aiohttp
+
+from exceptions import auth
+
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+MAX_AGE = re.compile(r"max-age=(\d+)")
+
+
+@dataclass(slots=True)
+class CachedDocument:
+    body: dict
+    etag: str | None
+    expires_at: float
+
+
+class MetadataCache:
+    """
+    In-memory cache of provider JSON documents
+    (discovery documents and JWKS) keyed by URL.
+    Fresh for `ttl` seconds or the server's max-age, then
+    revalidated with If-None-Match. If the provider is down
+    a stale copy is served rather than failing the login.
+    """
+    def __init__(self, ttl: float = 3600):
+        self.ttl = ttl
+        self._documents: dict[str, CachedDocument] = {}
+        # one fetch per URL at a time
+        self._locks: dict[str, asyncio.Lock] = {}
+        self.hits = 0
+        self.fetches = 0
+        self.revalidated = 0
+
+    def _lifetime(self, response: aiohttp.ClientResponse) -> float:
+        match = MAX_AGE.search(response.headers.get("Cache-Control", ""))
+        return int(match.group(1)) if match else self.ttl
+
+    async def get(
+        self,
+        http: aiohttp.ClientSession,
+        url: str,
+        refresh: bool = False,
+    ) -> dict:
+        """
+        Return the document, `refresh` forces a revalidation,
+        e.g. when a JWKS misses a key id after rotation.
+        """
+        cached = self._documents.get(url)
+        if cached and not refresh and cached.expires_at > time.monotonic():
+            self.hits += 1
+            return cached.body
+
+        lock = self._locks.setdefault(url, asyncio.Lock())
+        async with lock:
+            # somebody else may have fetched it while we waited
+            cached = self._documents.get(url)
+            if cached and not refresh and cached.expires_at > time.monotonic():
+                self.hits += 1
+                return cached.body
+            return await self._fetch(http, url, cached)
+
+    async def _fetch(
+        self,
+        http: aiohttp.ClientSession,
+        url: str,
+        cached: CachedDocument | None,
+    ) -> dict:
+        headers = {"Accept": "application/json"}
+        if cached and cached.etag:
+            headers["If-None-Match"] = cached.etag
+
+        self.fetches += 1
+        try:
+            async with http.get(url, headers=headers) as response:
+                if response.status == 304 and cached:
+                    self.revalidated += 1
+                    cached.expires_at = time.monotonic() + self._lifetime(response)
+                    return cached.body
+
+                if response.status != 200:
+                    raise aiohttp.ClientResponseError(
+                        response.request_info,
+                        response.history,
+                        status=response.status,
+                    )
+
+                body = await response.json(content_type=None)
+                self._documents[url] = CachedDocument(
+                    body=body,
+                    etag=response.headers.get("ETag"),
+                    expires_at=time.monotonic() + self._lifetime(response),
+                )
+                return body
+
+        except (aiohttp.ClientError, asyncio.TimeoutError) as error:
+            if cached:
+                logger.warning(
+                    """
+                    Serving stale %r, refresh failed: %r
+                    """, url, error
+                )
+                return cached.body
+            logger.error(
+                """
+                Provider metadata fetch failed %r:
+                %r
+                """, url, error
+            )
+            raise auth.OauthError("OAuth provider is unavailable")
+
+    def clear(self) -> None:
+        self._documents.clear()
+
+    def stats(self) -> dict:
+        return {
+            "documents": len(self._documents),
+            "hits": self.hits,
+            "fetches": self.fetches,
+            "revalidated": self.revalidated,
+        }
@@ -0,0 +1,422 @@
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from urllib.parse import urlencode
+
+import aiohttp
+import jwt
+from jwt.algorithms import has_crypto
+
+from core.config import settings, OIDCProviderConfig
+from exceptions import auth
+from .metadata import MetadataCache
+
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+GOOGLE_DISCOVERY_URL = "https://accounts.google.com/.well-known/openid-configuration"
+
+# asymmetric only: HS* would let anyone with the client secret sign
+ID_TOKEN_ALGORITHMS = ("RS256", "RS384", "RS512", "PS256", "ES256", "ES384", "EdDSA")
+
+
+@dataclass(frozen=True, slots=True)
+class OauthIdentity:
+    """ Who the provider says the user is """
+    provider: str
+    subject: str
+    email: str | None
+    email_verified: bool
+    username: str | None
+
+
+class OauthProvider(ABC):
+    """
+    Authorization code flow of one provider.
+    All outbound calls go through the shared aiohttp session.
+    """
+    name: str
+    # whether the callback must carry a nonce bound to the id token
+    uses_nonce = False
+
+    def __init__(
+        self,
+        client_id: str,
+        client_secret: str,
+        redirect_uri: str,
+        scope: str,
+    ):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.redirect_uri = redirect_uri
+        self.scope = scope
+
+    @abstractmethod
+    async def authorize_url(
+        self,
+        http: aiohttp.ClientSession,
+        state: str,
+        nonce: str,
+    ) -> str:
+        ...
+
+    @abstractmethod
+    async def exchange_code(
+        self,
+        http: aiohttp.ClientSession,
+        code: str,
+    ) -> dict:
+        ...
+
+    @abstractmethod
+    async def get_identity(
+        self,
+        http: aiohttp.ClientSession,
+        tokens: dict,
+        nonce: str | None = None,
+    ) -> OauthIdentity:
+        ...
+
+
+class GithubProvider(OauthProvider):
+    """
+    GitHub has no OpenID Connect for OAuth apps,
+    so the identity comes from its REST API.
+    """
+    name = "github"
+
+    def __init__(
+        self,
+        client_id: str,
+        client_secret: str,
+        redirect_uri: str,
+        scope: str = "user:email",
+        authorize_endpoint: str = "https://github.com/login/oauth/authorize",
+        token_endpoint: str = "https://github.com/login/oauth/access_token",
+        user_url: str = "https://api.github.com/user",
+        email_url: str = "https://api.github.com/user/emails",
+    ):
+        super().__init__(client_id, client_secret, redirect_uri, scope)
+        self.authorize_endpoint = authorize_endpoint
+        self.token_endpoint = token_endpoint
+        self.user_url = user_url
+        self.email_url = email_url
+
+    async def authorize_url(self, http, state, nonce) -> str:
+        params = {
+            "client_id": self.client_id,
+            "redirect_uri": self.redirect_uri,
+            "scope": self.scope,
+            "state": state,
+        }
+        return f"{self.authorize_endpoint}?{urlencode(params)}"
+
+    async def exchange_code(self, http, code) -> dict:
+        """
+        Exchange GitHub code for access token
+        """
+        data = {
+            "client_id": self.client_id,
+            "client_secret": self.client_secret,
+            "code": code,
+            "redirect_uri": self.redirect_uri,
+        }
+        headers = {
+            "Accept": "application/json",
+            "Content-Type": "application/json",
+        }
+
+        async with http.post(
+            url=self.token_endpoint,
+            json=data,
+            headers=headers
+        ) as response:
+            result = await response.json(content_type=None)
+            # GitHub reports a bad code with 200 and an error field
+            if response.status != 200 or "access_token" not in result:
+                logger.error(
+                    """
+                    GitHub token exchange failed:
+                    %r
+                    """, result
+                )
+                raise auth.OauthError("Failed to get access token")
+
+            return result
+
+    async def get_identity(self, http, tokens, nonce=None) -> OauthIdentity:
+        """
+        Profile and emails are fetched at the same time:
+        the user:email scope is always requested.
+        """
+        headers = {
+            "Authorization": f"Bearer {tokens['access_token']}",
+            "Accept": "application/json",
+        }
+
+        try:
+            # a failed profile fetch cancels the emails one
+            async with asyncio.TaskGroup() as group:
+                profile = group.create_task(self.get_profile(http, headers))
+                emails = group.create_task(self.get_primary_email(http, headers))
+        except* (aiohttp.ClientError, asyncio.TimeoutError) as errors:
+            logger.error(
+                """
+                GitHub user info failed:
+                %r
+                """, errors.exceptions
+            )
+            raise auth.OauthError("Failed to get user info")
+        except* auth.OauthError as errors:
+            raise errors.exceptions[0]
+
+        user_data = profile.result()
+        primary_email = emails.result()
+        if primary_email:
+            email, verified = primary_email["email"], primary_email["verified"]
+        else:
+            # only verified addresses can be made public
+            email, verified = user_data.get("email"), True
+
+        return OauthIdentity(
+            provider=self.name,
+            subject=str(user_data["id"]),
+            email=email,
+            email_verified=bool(email) and verified,
+            username=user_data.get("login"),
+        )
+
+    async def get_profile(self, http, headers: dict) -> dict:
+        async with http.get(
+            url=self.user_url,
+            headers=headers,
+        ) as response:
+            if response.status != 200:
+                error = await response.text()
+                logger.error(
+                    """
+                    GitHub user info failed:
+                    %r
+                    """, error
+                )
+                raise auth.OauthError("Failed to get user info")
+
+            return await response.json()
+
+    async def get_primary_email(self, http, headers: dict) -> dict | None:
+        """
+        Primary email, None if GitHub doesn't give it
+        """
+        async with http.get(
+            url=self.email_url,
+            headers=headers,
+        ) as response:
+            if response.status != 200:
+                return None
+
+            emails = await response.json()
+            return next(
+                (email for email in emails if email["primary"]),
+                None
+            )
+
+
+class OIDCProvider(OauthProvider):
+    """
+    Any OpenID Connect provider.
+    Endpoints come from its discovery document and the id token
+    is verified locally against the cached JWKS, so a login
+    needs no userinfo call.
+    """
+    uses_nonce = True
+
+    def __init__(
+        self,
+        name: str,
+        discovery_url: str,
+        client_id: str,
+        client_secret: str,
+        redirect_uri: str,
+        metadata: MetadataCache,
+        scope: str = "openid email profile",
+    ):
+        if not has_crypto:
+            raise RuntimeError("OIDC providers require the cryptography package")
+        super().__init__(client_id, client_secret, redirect_uri, scope)
+        self.name = name
+        self.discovery_url = discovery_url
+        self.metadata = metadata
+
+    async def discovery(self, http: aiohttp.ClientSession) -> dict:
+        return await self.metadata.get(http, self.discovery_url)
+
+    async def authorize_url(self, http, state, nonce) -> str:
+        document = await self.discovery(http)
+        params = {
+            "response_type": "code",
+            "client_id": self.client_id,
+            "redirect_uri": self.redirect_uri,
+            "scope": self.scope,
+            "state": state,
+            "nonce": nonce,
+        }
+        return f"{document['authorization_endpoint']}?{urlencode(params)}"
+
+    async def exchange_code(self, http, code) -> dict:
+        document = await self.discovery(http)
+        data = {
+            "grant_type": "authorization_code",
+            "code": code,
+            "redirect_uri": self.redirect_uri,
+            "client_id": self.client_id,
+            "client_secret": self.client_secret,
+        }
+        async with http.post(
+            url=document["token_endpoint"],
+            data=data,
+            headers={"Accept": "application/json"},
+        ) as response:
+            result = await response.json(content_type=None)
+            if response.status != 200 or "id_token" not in result:
+                logger.error(
+                    """
+                    %s token exchange failed:
+                    %r
+                    """, self.name, result
+                )
+                raise auth.OauthError("Failed to get access token")
+
+            return result
+
+    async def signing_key(
+        self,
+        http: aiohttp.ClientSession,
+        jwks_uri: str,
+        kid: str | None,
+    ) -> jwt.PyJWK:
+        """
+        Key `kid` from the cached JWKS.
+        An unknown kid means the provider rotated its keys,
+        so the set is revalidated once before giving up.
+        """
+        for refresh in (False, True):
+            jwks = await self.metadata.get(http, jwks_uri, refresh=refresh)
+            keys = [
+                key for key in jwks.get("keys", [])
+                if key.get("use", "sig") == "sig"
+            ]
+            for key in keys:
+                # a single key may come without kid
+                if key.get("kid") == kid or (kid is None and len(keys) == 1):
+                    return jwt.PyJWK(key)
+
+        raise auth.OauthError("Unknown id token signing key")
+
+    async def get_identity(self, http, tokens, nonce=None) -> OauthIdentity:
+        document = await self.discovery(http)
+        id_token = tokens["id_token"]
+
+        try:
+            header = jwt.get_unverified_header(id_token)
+            algorithms = [
+                algorithm
+                for algorithm in document.get(
+                    "id_token_signing_alg_values_supported", ["RS256"]
+                )
+                if algorithm in ID_TOKEN_ALGORITHMS
+            ]
+            if header.get("alg") not in algorithms:
+                raise auth.OauthError("Unexpected id token algorithm")
+
+            key = await self.signing_key(http, document["jwks_uri"], header.get("kid"))
+            claims = jwt.decode(
+                id_token,
+                key=key,
+                algorithms=algorithms,
+                audience=self.client_id,
+                issuer=document["issuer"],
+                options={"require": ["exp", "iat", "sub"]},
+            )
+        except jwt.PyJWTError as error:
+            logger.error(
+                """
+                %s id token rejected:
+                %r
+                """, self.name, error
+            )
+            raise auth.OauthError("Invalid id token")
+
+        if nonce is not None and claims.get("nonce") != nonce:
+            raise auth.OauthError("Invalid id token")
+
+        email_verified = claims.get("email_verified", False)
+        if isinstance(email_verified, str):
+            email_verified = email_verified.lower() == "true"
+
+        return OauthIdentity(
+            provider=self.name,
+            subject=claims["sub"],
+            email=claims.get("email"),
+            email_verified=bool(email_verified),
+            username=claims.get("preferred_username") or claims.get("nickname"),
+        )
+
+
+def build_oidc_provider(
+    name: str,
+    config: OIDCProviderConfig,
+    metadata: MetadataCache,
+    discovery_url: str | None = None,
+) -> OIDCProvider:
+    discovery_url = config.discovery_url or discovery_url
+    if not discovery_url:
+        raise ValueError(f"OAuth provider {name!r} needs a discovery_url")
+
+    return OIDCProvider(
+        name=name,
+        discovery_url=discovery_url,
+        client_id=config.client_id,
+        client_secret=config.client_secret,
+        redirect_uri=config.redirect_uri,
+        metadata=metadata,
+        scope=config.scope,
+    )
+
+
+def build_providers(metadata: MetadataCache) -> dict[str, OauthProvider]:
+    """ Every provider enabled in the settings by name """
+    providers: list[OauthProvider] = [
+        GithubProvider(
+            client_id=settings.oauth.client_id,
+            client_secret=settings.oauth.client_secret,
+            redirect_uri=settings.oauth.redirect_uri,
+            scope=settings.oauth.scope,
+            authorize_endpoint=settings.oauth.github_authorize_url,
+            token_endpoint=settings.oauth.github_url,
+            user_url=settings.oauth.github_user_url,
+            email_url=settings.oauth.github_email_url,
+        ),
+    ]
+    config = settings.providers
+    if config.google:
+        providers.append(
+            build_oidc_provider("google", config.google, metadata, GOOGLE_DISCOVERY_URL)
+        )
+    if config.oidc:
+        providers.append(build_oidc_provider("oidc", config.oidc, metadata))
+
+    return {provider.name: provider for provider in providers}
+
+
+metadata_cache = MetadataCache(ttl=settings.providers.metadata_ttl)
+PROVIDERS = build_providers(metadata_cache)
+
+
+def get_provider(name: str) -> OauthProvider:
+    provider = PROVIDERS.get(name)
+    if provider is None:
+        raise auth.UnknownProvider
+    return provider
@@ -1,16 +1,53 @@
 import logging
-from datetime import timedelta
-from sqlalchemy import select, func
+import base64
+from typing import AsyncIterator, Optional, Sequence
+from datetime import datetime, timedelta
+from sqlalchemy import Row, Select, select, update, delete, func, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
 from core.services.user import UserService
-from core.database.models import User
-from core.CONST import NOW
+from core.services import user_stats
+from core.database.models import User, RefreshToken
+from core.database.sql import in_array
+from core.cache import user_cache, user_filter
+from exceptions import auth
+from utilities.clock import Clock, get_clock
 
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+# columns of UserAdminResponse, listings never load full entities
+ADMIN_USER_COLUMNS = (
+    User.id,
+    User.email,
+    User.username,
+    User.is_active,
+    User.is_verified,
+    User.is_superuser,
+    User.created_at,
+)
+
+
+# users changed per statement and transaction by bulk actions
+BULK_CHUNK_SIZE = 1000
+
+
+def encode_cursor(created_at: datetime, user_id: int) -> str:
+    """ Opaque keyset cursor """
+    raw = f"{created_at.isoformat()}|{user_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        created_at, user_id = raw.split("|")
+        return datetime.fromisoformat(created_at), int(user_id)
+    except ValueError:
+        raise auth.InvalidCursor
+
+
 class AdminService:
     """ 
     Service for the admin and all 
@@ -20,9 +57,13 @@ class AdminService:
     def __init__(
         self, 
         session: AsyncSession,
+        clock: Optional[Clock] = None,
     ):
         self.session = session
-        self.user_service = UserService(session)
+        self.clock = clock or get_clock()
+        self.user_service = UserService(session, clock=self.clock)
+        # shared, so user service calls join admin transactions
+        self.uow = self.user_service.uow
         
     # ------------------- USER ACTION ------------------
 
@@ -31,66 +72,144 @@ class AdminService:
         Get the total number of users 
         """
         
-        stmt = select(func.count(User.id))
-        result = await self.session.execute(stmt)
-        return result.scalar()
+        stats = await self.get_user_stats()
+        return stats["total_users"]
 
-    async def get_all_active_and_verified_users(
+    def users_query(
         self,
-    ) -> dict[int, User]:
+        kind: str,
+        days: int = 7,
+    ) -> tuple[Select, bool]:
         """ 
-        Get all active and verified users 
-        Return dict where the key is the id and the value is the user
+        Column-only query for one of the admin user listings:
+        - good: active and verified users
+        - new: users registered in the last N days
+        - unverified: unverified users older than N days
+        Return query and whether it is ordered newest first
         """
         
-        stmt = select(User).where(
-            User.is_verified == True,
-            User.is_active == True
+        date = self.clock.now() - timedelta(days=days)
+        
+        if kind == "good":
+            stmt = select(*ADMIN_USER_COLUMNS).where(
+                User.is_verified == True,
+                User.is_active == True
+                )
+            return stmt, False
+        
+        if kind == "new":
+            stmt = select(*ADMIN_USER_COLUMNS).where(
+                User.created_at >= date,
             )
-        result = await self.session.execute(stmt)
+            return stmt, False
+        
+        if kind == "unverified":
+            stmt = select(*ADMIN_USER_COLUMNS).where(
+                User.is_verified == False,
+                User.created_at < date,
+            )
+            return stmt, True
+        
+        raise ValueError(f"unknown users listing {kind!r}")
+    
+    async def paginate_users(
+        self,
+        stmt: Select,
+        limit: int = 100,
+        after: str | None = None,
+        descending: bool = False,
+    ) -> dict:
+        """ 
+        Keyset pagination on (created_at, id).
+        `after` is the `next` cursor of the previous page.
+        """
+        
+        keyset = tuple_(User.created_at, User.id)
+        
+        if after:
+            cursor = decode_cursor(after)
+            stmt = stmt.where(keyset < cursor if descending else keyset > cursor)
+        
+        if descending:
+            stmt = stmt.order_by(User.created_at.desc(), User.id.desc())
+        else:
+            stmt = stmt.order_by(User.created_at, User.id)
+        
+        # one extra row tells whether there is a next page
+        result = await self.session.execute(stmt.limit(limit + 1))
+        rows = result.all()
+        
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
         
-        users = result.scalars().all()
         return {
-            user.id: user for user in users
+            "items": rows,
+            "next": next_cursor,
         }
+    
+    async def stream_users(
+        self,
+        stmt: Select,
+        descending: bool = False,
+        chunk_size: int = 1000,
+    ) -> AsyncIterator[Sequence[Row]]:
+        """ 
+        Stream user rows with a server-side cursor, 
+        one chunk of `chunk_size` rows at a time.
+        """
+        
+        if descending:
+            stmt = stmt.order_by(User.created_at.desc(), User.id.desc())
+        else:
+            stmt = stmt.order_by(User.created_at, User.id)
+        
+        result = await self.session.stream(
+            stmt.execution_options(yield_per=chunk_size)
+        )
+        async for rows in result.partitions():
+            yield rows
+
+    async def get_all_active_and_verified_users(
+        self,
+        limit: int = 100,
+        after: str | None = None,
+    ) -> dict:
+        """ 
+        Get page of active and verified users 
+        """
+        
+        stmt, descending = self.users_query("good")
+        return await self.paginate_users(stmt, limit, after, descending)
         
     
     async def get_unverified_old_users(
         self,
         days: int = 7,
-    ) -> list[User]:
+        limit: int = 100,
+        after: str | None = None,
+    ) -> dict:
         """ 
-        Get unverified users older than N days
-        days_old: some number of days
-        return list of users
+        Get page of unverified users older than N days,
+        newest first
         """
         
-        date = NOW - timedelta(days=days)
-        
-        stmt = select(User).where(
-            User.is_verified == False,
-            User.created_at < date,
-        ).order_by(User.created_at.desc())
-        
-        result = await self.session.execute(stmt)
-        return result.scalars().all()
+        stmt, descending = self.users_query("unverified", days=days)
+        return await self.paginate_users(stmt, limit, after, descending)
     
     async def get_new_users(
         self,
         days: int = 7,
-    ) -> list[User]:
+        limit: int = 100,
+        after: str | None = None,
+    ) -> dict:
         """ 
-        New users for last N days
-        days: some number of days
-        return list of users
+        Page of new users for last N days
         """
         
-        date = NOW - timedelta(days=days)
-        stmt = select(User).where(
-            User.created_at >= date,
-        )
-        result = await self.session.execute(stmt)
-        return result.scalars().all()
+        stmt, descending = self.users_query("new", days=days)
+        return await self.paginate_users(stmt, limit, after, descending)
     
     
     async def deactivate_user(
@@ -103,10 +222,19 @@ class AdminService:
         
         user = await self.user_service.get_user_by_id(user_id=user_id)
         if not user:
-            raise ValueError(f"user with id {user_id} not found")
+            raise auth.UserNotFound
         
+        was_active = user.is_active
         user.is_active = False
-        await self.session.commit()
+        user.token_version += 1
+        # user row first, stats row last, as on every other path
+        await self.session.flush()
+        if was_active:
+            await user_stats.change_user_stats(self.session, active=-1)
+        self.uow.after_commit(
+            lambda: user_cache.revoke_tokens(user_id, user.token_version)
+        )
+        await self.uow.commit()
         
         logger.info (
             """ 
@@ -126,10 +254,16 @@ class AdminService:
         
         user = await self.user_service.get_user_by_id(user_id=user_id)
         if not user:
-            raise ValueError(f"user with id {user_id} not found")
+            raise auth.UserNotFound
 
+        was_active = user.is_active
         user.is_active = True
-        await self.session.commit()
+        # user row first, stats row last, as on every other path
+        await self.session.flush()
+        if not was_active:
+            await user_stats.change_user_stats(self.session, active=1)
+        self.uow.after_commit(lambda: user_cache.invalidate(user_id))
+        await self.uow.commit()
 
         logger.info (
             """ 
@@ -148,12 +282,9 @@ class AdminService:
         Delete user 
         """
         
-        user = await self.user_service.get_user_by_id(user_id=user_id)
-        if not user:
-            raise ValueError(f"user with id {user_id} not found")
-        
-        await self.session.delete(user)
-        await self.session.commit()
+        deleted, _ = await self.delete_users([user_id], keep_superusers=False)
+        if not deleted:
+            raise auth.UserNotFound
         
         logger.info(
             """ 
@@ -162,6 +293,182 @@ class AdminService:
         )
         return True
     
+    # ------------ BULK ACTION ----------------------------
+    
+    async def bulk_user_action(
+        self,
+        action: str,
+        ids: Sequence[int] | None = None,
+        kind: str | None = None,
+        days: int = 7,
+    ) -> dict:
+        """ 
+        Apply action to the given ids or to every user of 
+        a listing, BULK_CHUNK_SIZE users per statement.
+        Each chunk is its own transaction, so a big cleanup 
+        doesn't hold row locks for its whole run.
+        Superusers are never touched.
+        """
+        
+        handlers = {
+            "deactivate": self.deactivate_users,
+            "reactivate": self.reactivate_users,
+            "delete": self.delete_users,
+        }
+        if action not in handlers:
+            raise ValueError(f"unknown bulk action {action!r}")
+        
+        if ids is None:
+            stmt, _ = self.users_query(kind, days=days)
+            stmt = stmt.with_only_columns(User.id).order_by(User.id)
+            ids = (await self.session.scalars(stmt)).all()
+        else:
+            ids = sorted(set(ids))
+        
+        affected = []
+        refresh_tokens = 0
+        for start in range(0, len(ids), BULK_CHUNK_SIZE):
+            chunk = ids[start:start + BULK_CHUNK_SIZE]
+            changed, tokens = await handlers[action](chunk)
+            affected.extend(changed)
+            refresh_tokens += tokens
+        
+        logger.info(
+            """ 
+            Bulk %s by admin: %r users, %r refresh tokens
+            """, action, len(affected), refresh_tokens
+        )
+        return {
+            "action": action,
+            "affected": len(affected),
+            "ids": affected,
+            "refresh_tokens": refresh_tokens,
+        }
+    
+    async def deactivate_users(
+        self,
+        user_ids: Sequence[int],
+    ) -> tuple[list[int], int]:
+        """ 
+        Deactivate active users, revoke their access 
+        and refresh tokens.
+        Return changed ids and number of revoked refresh tokens.
+        """
+        
+        async with self.uow:
+            stmt = (
+                update(User)
+                .where(
+                    in_array(User.id, user_ids),
+                    User.is_active == True,
+                    User.is_superuser == False,
+                )
+                .values(is_active=False, token_version=User.token_version + 1)
+                .returning(User.id, User.token_version)
+                .execution_options(synchronize_session=False)
+            )
+            rows = (await self.session.execute(stmt)).all()
+            if not rows:
+                return [], 0
+            
+            changed = [row.id for row in rows]
+            # lock order users -> refresh_tokens -> user_stats,
+            # the same on every path
+            revoked = await self.user_service.revoke_refresh_tokens(changed)
+            await user_stats.change_user_stats(self.session, active=-len(rows))
+            
+            def revoke_cached() -> None:
+                for row in rows:
+                    user_cache.revoke_tokens(row.id, row.token_version)
+            self.uow.after_commit(revoke_cached)
+            
+        return changed, revoked
+    
+    async def reactivate_users(
+        self,
+        user_ids: Sequence[int],
+    ) -> tuple[list[int], int]:
+        """ 
+        Reactivate inactive users.
+        Return changed ids and 0: no tokens are touched.
+        """
+        
+        async with self.uow:
+            stmt = (
+                update(User)
+                .where(
+                    in_array(User.id, user_ids),
+                    User.is_active == False,
+                    User.is_superuser == False,
+                )
+                .values(is_active=True)
+                .returning(User.id)
+                .execution_options(synchronize_session=False)
+            )
+            changed = list((await self.session.scalars(stmt)).all())
+            if not changed:
+                return [], 0
+            
+            await user_stats.change_user_stats(self.session, active=len(changed))
+            
+            def invalidate_cached() -> None:
+                for user_id in changed:
+                    user_cache.invalidate(user_id)
+            self.uow.after_commit(invalidate_cached)
+        
+        return changed, 0
+    
+    async def delete_users(
+        self,
+        user_ids: Sequence[int],
+        keep_superusers: bool = True,
+    ) -> tuple[list[int], int]:
+        """ 
+        Delete users without loading them.
+        Return deleted ids and number of their refresh tokens.
+        """
+        
+        targets = [in_array(User.id, user_ids)]
+        if keep_superusers:
+            targets.append(User.is_superuser == False)
+        
+        async with self.uow:
+            # counted without locks, the tokens go with the users by
+            # ON DELETE CASCADE: users -> refresh_tokens -> user_stats
+            tokens = await self.session.scalar(
+                select(func.count(RefreshToken.id))
+                .where(RefreshToken.user_id.in_(select(User.id).where(*targets)))
+            )
+            stmt = (
+                delete(User)
+                .where(*targets)
+                .returning(
+                    User.id, 
+                    User.is_active, 
+                    User.is_verified, 
+                    User.token_version,
+                )
+                .execution_options(synchronize_session=False)
+            )
+            rows = (await self.session.execute(stmt)).all()
+            if not rows:
+                return [], 0
+            
+            await user_stats.change_user_stats(
+                self.session,
+                total=-len(rows),
+                active=-sum(row.is_active for row in rows),
+                verified=-sum(row.is_verified for row in rows),
+            )
+            
+            def revoke_cached() -> None:
+                for row in rows:
+                    user_cache.revoke_tokens(row.id, row.token_version + 1)
+                user_filter.forget_users(len(rows))
+            self.uow.after_commit(revoke_cached)
+        
+        return [row.id for row in rows], tokens
+    
     # ------------ USER STATISTIC -------------------------
     
     async def get_user_stats(self) -> dict:
@@ -170,21 +477,33 @@ class AdminService:
         - total users, 
         - total active, 
         - total verified
+        Read from the maintained user_stats counters.
         """
-        stmt = select(
-            func.count(User.id).label("total"),
-            func.count(User.id).filter(User.is_active == True).label("active"),
-            func.count(User.id).filter(User.is_verified == True).label("verified"), 
-        )
-        
-        result = await self.session.execute(stmt)
-        stats = result.first()
+        stats = await user_stats.get_user_stats(self.session)
+        if stats is None:
+            stats = await user_stats.reconcile_user_stats(self.session)
         
         return {
-            "total_users": stats.total,
-            "active_users": stats.active,
-            "verified_users": stats.verified,
+            "total_users": stats.total_users,
+            "active_users": stats.active_users,
+            "verified_users": stats.verified_users,
         }
     
-    
-    
\ No newline at end of file
+    async def get_signup_histogram(
+        self,
+        granularity: str = "day",
+        days: int = 30,
+    ) -> list[dict]:
+        """ 
+        Signups and verifications per day or hour 
+        for the last N days, from the rollup table
+        """
+        since = self.clock.now() - timedelta(days=days)
+        if granularity == "day":
+            since = since.replace(hour=0, minute=0, second=0, microsecond=0)
+        
+        return await user_stats.get_signup_histogram(
+            self.session,
+            since=since,
+            granularity=granularity,
+        )
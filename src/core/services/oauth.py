@@ -1,12 +1,17 @@
+import hmac
+import secrets
 import logging
+from datetime import timedelta
 import aiohttp
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
-from fastapi import HTTPException, status
 
 from core.services.user import UserService
-from core.database.models import User
-from utilities.jwt_token import create_jwt_token
+from core.services import user_stats
+from core.database.models import User, OauthAccount
+from core.cache import user_filter
+from core.oauth.providers import OauthIdentity, OauthProvider, get_provider
+from utilities.jwt_token import create_jwt_token, verify_token
 from exceptions import auth
 from core.config import settings
 
@@ -16,186 +21,192 @@ logger = logging.getLogger(__name__)
 class OauthService:
     """ 
     A service for authentication using 
-    third-party services (specifically GitHub).
+    third-party services (GitHub, Google, any OpenID Connect).
     """
-    def __init__(self, session: AsyncSession):
+    def __init__(
+        self,
+        session: AsyncSession,
+        http: aiohttp.ClientSession,
+    ):
         self.session = session
+        # app-wide session, see core.oauth.http_client
+        self.http = http
         self.user_service = UserService(session)
+        self.uow = self.user_service.uow
+        
+        
+    async def authorization_url(self, provider_name: str) -> tuple[str, str]:
+        """ 
+        URL of the provider login page and its nonce.
+        The signed state carries the nonce, so the callback
+        needs no server-side storage. The caller hands the nonce
+        to the browser in a cookie, see check_state.
+        """
+        provider = get_provider(provider_name)
+        nonce = secrets.token_urlsafe(16)
+        state = create_jwt_token(
+            {
+                "type": "oauth_state",
+                "provider": provider.name,
+                "nonce": nonce,
+            },
+            timedelta(seconds=settings.providers.state_expire),
+        )
+        url = await provider.authorize_url(self.http, state=state, nonce=nonce)
+        return url, nonce
+    
+    
+    def check_state(
+        self,
+        provider: OauthProvider,
+        state: str,
+        browser_nonce: str | None,
+    ) -> str:
+        """ 
+        Return nonce of the authorization request.
+        It must match the nonce cookie of the browser that
+        started the flow, so a callback URL with someone
+        else's code and state is refused (login CSRF).
+        """
+        payload = verify_token(state, expected_type="oauth_state")
+        if not payload or payload.get("provider") != provider.name:
+            raise auth.OauthError("Invalid state")
+        
+        nonce = payload["nonce"]
+        if not browser_nonce or not hmac.compare_digest(nonce, browser_nonce):
+            raise auth.OauthError("Invalid state")
+        return nonce
         
         
     async def authenticate(
         self, 
-        code: str
+        provider_name: str,
+        code: str,
+        state: str,
+        browser_nonce: str | None,
     ) -> dict:
         """ 
-        
+        Finish the authorization code flow and issue our token
         """
-        # get access token from githab
-        access_token = await self.get_access_token(code)
+        provider = get_provider(provider_name)
+        nonce = self.check_state(provider, state, browser_nonce)
         
-        # get user data
-        user_data = await self.get_user_info(access_token)
+        tokens = await provider.exchange_code(self.http, code)
+        identity = await provider.get_identity(self.http, tokens, nonce=nonce)
         
         #find or create user
-        user = await self.find_or_create_user(user_data)
+        user = await self.find_or_create_user(identity)
         
         # generate our token jwt 
-        token = create_jwt_token(
-            data={
-            "sub": user.id,
-            "type": "access_token",
-            "username": user.username,
-        })
+        token = self.user_service.create_access_token(user)
         
         return {
             "token": token,
             "token_type": "bearer",
         }
-    
-    async def get_access_token(self, code: str) -> str:
-        """ 
-        Exchange GitHub code for access token
-        """
-        
-        url = settings.oauth.github_url
-        data = {
-            "client_id": settings.oauth.client_id,
-            "client_secret": settings.oauth.client_secret,
-            "code": code,
-            "redirect_uri": settings.oauth.redirect_uri,
-        }
-        headers = {
-            "Accept": "application/json",
-            "Content-Type": "application/json",
-        }
-        
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                url=url,
-                json=data,
-                headers=headers
-            ) as response:
-                if response.status != 200:
-                    error = await response.text()
-                    logger.error(
-                        """ 
-                        GitHub token exchange failed:
-                        %r
-                        """, error
-                    )
-                    raise auth.OauthError("Failed to get access token")
-                    
-                result = await response.json()
-                return result["access_token"]
-        
-        
-    
-    async def get_user_info(self, access_token: str) -> dict:
-        """ 
-        Get user info from Github API
-        """
-    
-        headers = {
-            "Authorization": f"Bearer {access_token}",
-            "Accept": "application/json",
-        }
-        
-        async with aiohttp.ClientSession() as session:
-            async with session.get(
-                url=settings.oauth.github_user_url,
-                headers=headers,
-            ) as response:
-                if response.status != 200:
-                    error = await response.text()
-                    logger.error(
-                        """ 
-                        GitHub user info failed: 
-                        %r
-                        """, error
-                    )
-                    raise auth.OauthError("Failed to get user info")
-                
-                user_data = await response.json()
-            
-            
-            if not user_data.get("email"):
-                async with session.get(
-                    url=settings.oauth.github_email_url,
-                    headers=headers,
-                ) as response:
-                    if response.status == 200:
-                        emails = await response.json()
-                        primary_email = next(
-                            (email for email in emails if email["primary"]),
-                            None
-                        )
-                        if primary_email:
-                            user_data["email"] = primary_email["email"]
-                            
-            return user_data
                         
                         
-    async def find_or_create_user(self, user_data: dict) -> User:
+    async def find_or_create_user(self, identity: OauthIdentity) -> User:
         """ 
-        Find existing user or create new one from GitHub data
+        Find existing user or create new one from provider data
         """
         
-        github_id = user_data["id"]
-        email = user_data["email"]
-        
+        linked_user_id = (
+            select(OauthAccount.user_id)
+            .where(
+                OauthAccount.provider == identity.provider,
+                OauthAccount.subject == identity.subject,
+            )
+            .scalar_subquery()
+        )
+        is_linked = User.id == linked_user_id
         
-        stmt = select(User).where(User.github_id == github_id)
-        result = await self.session.execute(stmt)
-        user = result.scalar_one_or_none()
+        # one round trip: the linked user wins over one that only
+        # shares the email, which is trusted only when verified
+        condition = is_linked
+        if identity.email and identity.email_verified:
+            condition = is_linked | (User.email == identity.email)
+            
+        stmt = (
+            select(User, is_linked.label("linked"))
+            .where(condition)
+            .order_by(is_linked.desc())
+            .limit(1)
+        )
+        row = (await self.session.execute(stmt)).first()
         
-        if user:
+        if row and row.linked:
             logger.info(
                 """ 
-                User found by GitHub ID:
+                User found by %s ID:
                 %r
-                """, github_id
+                """, identity.provider, identity.subject
             )
-            return user
-        
-        if email:
-            user = await self.user_service.get_user_by_email(email=email)
-            if user:
-                user.github_id = github_id
-                await self.session.commit()
-                logger.info(
-                    """ 
-                    Linked existing user with GitHub ID:
-                    %r
-                    """, github_id
+            return row.User
+        
+        if row:
+            user = row.User
+            self.session.add(
+                OauthAccount(
+                    provider=identity.provider,
+                    subject=identity.subject,
+                    user_id=user.id,
                 )
-                return user
+            )
+            await self.uow.commit()
+            logger.info(
+                """ 
+                Linked existing user with %s ID:
+                %r
+                """, identity.provider, identity.subject
+            )
+            return user
             
     
-        username = user_data.get("login")
+        fallback = f"{identity.provider}_{identity.subject}"
+        username = (identity.username or fallback)[:30]
         if await self.is_username_exist(username):
-            username = f"{username}_{github_id}"
+            username = fallback[:30]
+        
+        email = identity.email if identity.email_verified else None
         
         user = User(
-            email=email or f"github_{github_id}@example.com",
-            username=user_data.get("login", f"github_{github_id}"),
+            email=email or f"{fallback}@example.com",
+            username=username,
             is_active=True,
             hashed_password="oauth_user",
             # already verified 
             is_verified=True,
             is_superuser=False,
-            github_id=github_id,
-
         )
         
         self.session.add(user)
-        await self.session.commit()
-        await self.session.refresh(user)
+        # id and created_at come back in INSERT ... RETURNING
+        await self.session.flush()
+        user_filter.add_user(user.email, user.username)
+        self.session.add(
+            OauthAccount(
+                provider=identity.provider,
+                subject=identity.subject,
+                user_id=user.id,
+            )
+        )
+        await user_stats.change_user_stats(
+            self.session, total=1, active=1, verified=1
+        )
+        await user_stats.record_signup_event(
+            self.session, 
+            self.user_service.clock.now(), 
+            signups=1, 
+            verifications=1,
+        )
+        await self.uow.commit()
         
         logger.info(
             """ 
-            Created new user from GitHub:
+            Created new user from %s:
             %r
-            """, user.username
+            """, identity.provider, user.username
         )
         return user
     
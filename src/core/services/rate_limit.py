@@ -0,0 +1,237 @@
+import math
+import time
+import hashlib
+import logging
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+
+from sqlalchemy import String, delete, update, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from core.config import settings, RateLimitRule
+from core.database import db_helper
+from core.database.models import RateLimitBucket
+from core.database.sql import in_array
+from exceptions import auth
+from utilities.cache import TTLCache
+from utilities.periodic import PeriodicTask
+
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class Limit:
+    """ One token bucket a request takes a token from """
+    key: str
+    # tokens per second
+    rate: float
+    burst: float
+
+    @classmethod
+    def from_rule(cls, key: str, rule: RateLimitRule) -> "Limit":
+        return cls(key=key, rate=rule.requests / rule.seconds, burst=rule.requests)
+
+
+def identifier_key(identifier: str) -> str:
+    """
+    Logins and emails are hashed: the keys end up
+    in a table and in logs, and have a bounded length.
+    """
+    normalized = identifier.strip().lower().encode()
+    return hashlib.sha256(normalized).hexdigest()[:32]
+
+
+class RateLimitBackend(ABC):
+    """
+    Storage of the token buckets.
+    `hit` takes a token from every bucket only if all of them
+    have one, and returns the seconds to wait per limit,
+    all 0 when allowed. A rejected hit takes nothing, so a
+    request refused on one limit doesn't use up the others
+    and retrying while limited doesn't push the wait further.
+    """
+    @abstractmethod
+    async def hit(self, limits: list[Limit]) -> list[float]:
+        ...
+
+    async def cleanup(self) -> int:
+        return 0
+
+
+class MemoryBackend(RateLimitBackend):
+    """
+    Buckets of this worker only.
+    A bucket is forgotten once it would be full again,
+    a missing bucket is the same as a full one.
+    """
+    def __init__(self, max_keys: int = 100000):
+        self.buckets = TTLCache(max_size=max_keys)
+
+    async def hit(self, limits):
+        now = time.monotonic()
+        refilled = []
+        for limit in limits:
+            bucket = self.buckets.get(limit.key)
+            if bucket is None:
+                refilled.append(limit.burst)
+            else:
+                last_tokens, updated_at = bucket
+                refilled.append(
+                    min(limit.burst, last_tokens + (now - updated_at) * limit.rate)
+                )
+
+        allowed = all(tokens >= 1 for tokens in refilled)
+        waits = []
+        for limit, tokens in zip(limits, refilled):
+            if allowed:
+                tokens -= 1
+                waits.append(0.0)
+            else:
+                waits.append(max(0.0, (1 - tokens) / limit.rate))
+
+            self.buckets.set(
+                limit.key,
+                (tokens, now),
+                ttl=(limit.burst - tokens) / limit.rate,
+            )
+        return waits
+
+
+class PostgresBackend(RateLimitBackend):
+    """
+    Buckets shared by every node in the UNLOGGED
+    rate_limit_buckets table.
+    One INSERT ... ON CONFLICT DO UPDATE refills all buckets of
+    a request and locks them, an UPDATE takes the tokens only if
+    every bucket has one: two round trips when allowed, one
+    when refused.
+    """
+    def __init__(self, session_factory: async_sessionmaker[AsyncSession]):
+        self.session_factory = session_factory
+
+    async def hit(self, limits):
+        # rows are locked in key order, so concurrent requests
+        # sharing buckets can't deadlock
+        ordered = sorted(limits, key=lambda limit: limit.key)
+        stmt = insert(RateLimitBucket).values([
+            {
+                "key": limit.key,
+                "tokens": limit.burst,
+                "rate": limit.rate,
+                "burst": limit.burst,
+            }
+            for limit in ordered
+        ])
+        elapsed = func.extract("epoch", func.now() - RateLimitBucket.updated_at)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[RateLimitBucket.key],
+            set_={
+                "tokens": func.least(
+                    stmt.excluded.burst,
+                    RateLimitBucket.tokens + elapsed * stmt.excluded.rate,
+                ),
+                "rate": stmt.excluded.rate,
+                "burst": stmt.excluded.burst,
+                "updated_at": func.now(),
+            },
+        ).returning(RateLimitBucket.key, RateLimitBucket.tokens)
+
+        async with self.session_factory() as session:
+            result = await session.execute(stmt)
+            refilled = {row.key: row.tokens for row in result}
+            allowed = all(tokens >= 1 for tokens in refilled.values())
+            if allowed:
+                await session.execute(
+                    update(RateLimitBucket)
+                    .where(in_array(RateLimitBucket.key, list(refilled), String))
+                    .values(tokens=RateLimitBucket.tokens - 1)
+                )
+            await session.commit()
+
+        if allowed:
+            return [0.0 for _ in limits]
+        return [
+            max(0.0, (1 - refilled[limit.key]) / limit.rate)
+            for limit in limits
+        ]
+
+    async def cleanup(self) -> int:
+        """ Delete the buckets that are full again """
+        elapsed = func.extract("epoch", func.now() - RateLimitBucket.updated_at)
+        stmt = delete(RateLimitBucket).where(
+            RateLimitBucket.tokens + elapsed * RateLimitBucket.rate
+            >= RateLimitBucket.burst
+        )
+        async with self.session_factory() as session:
+            result = await session.execute(stmt)
+            await session.commit()
+            return result.rowcount
+
+
+class RateLimiter:
+    """
+    Rejects a request with 429 when any of its buckets is empty.
+    """
+    def __init__(self, backend: RateLimitBackend, enabled: bool = True):
+        self.backend = backend
+        self.enabled = enabled
+        self.metrics = {
+            "allowed": 0,
+            "rejected": 0,
+        }
+
+    async def check(self, *limits: Limit) -> None:
+        if not self.enabled or not limits:
+            return
+
+        wait = max(await self.backend.hit(list(limits)))
+        if wait > 0:
+            self.metrics["rejected"] += 1
+            raise auth.TooManyRequests(retry_after=math.ceil(wait))
+        self.metrics["allowed"] += 1
+
+    def stats(self) -> dict:
+        stats = dict(self.metrics)
+        stats["backend"] = type(self.backend).__name__
+        return stats
+
+
+class RateLimitJanitor(PeriodicTask):
+    """
+    Purges refilled buckets so the table only holds
+    clients that were seen recently.
+    """
+    name = "rate-limit-janitor"
+
+    def __init__(self, limiter: RateLimiter, interval: int = 600):
+        super().__init__(interval=interval)
+        self.limiter = limiter
+
+    async def run_once(self) -> None:
+        deleted = await self.limiter.backend.cleanup()
+        if deleted:
+            logger.info(
+                """
+                Rate limit buckets purged: %r
+                """, deleted
+            )
+
+
+def build_backend() -> RateLimitBackend:
+    if settings.rate_limit.backend == "postgres":
+        return PostgresBackend(session_factory=db_helper.session_factory)
+    return MemoryBackend(max_keys=settings.rate_limit.max_keys)
+
+
+rate_limiter = RateLimiter(
+    backend=build_backend(),
+    enabled=settings.rate_limit.enabled,
+)
+
+rate_limit_janitor = RateLimitJanitor(
+    limiter=rate_limiter,
+    interval=settings.rate_limit.cleanup_interval,
+)
@@ -0,0 +1,172 @@
+import logging
+from datetime import datetime, timedelta
+
+import jwt
+from sqlalchemy import select, update, delete, func
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from core.config import settings
+from core.database import db_helper
+from core.database.models import SigningKey as SigningKeyRow
+from utilities.clock import get_clock
+from utilities.periodic import PeriodicTask
+from utilities.key_ring import (
+    KeyRing,
+    SigningKey,
+    key_ring,
+    generate_key_pair,
+    dump_private_key,
+    load_private_key,
+    public_jwk,
+)
+
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+# pg_advisory_xact_lock key: one worker rotates at a time
+ROTATION_LOCK = 0x6A776B73
+
+
+class SigningKeyRotator(PeriodicTask):
+    """
+    Keeps the key ring of this worker in sync with signing_keys.
+    Adds a key every `rotate_every` seconds, published
+    `publish_ahead` seconds before it signs, and deletes keys
+    `retain` seconds after they stopped signing.
+    """
+    name = "signing-key-rotator"
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        ring: KeyRing,
+        algorithm: str,
+        secret: str,
+        rotate_every: int = 7 * 24 * 3600,
+        publish_ahead: int = 3600,
+        retain: int = 31 * 24 * 3600,
+        interval: int = 300,
+    ):
+        super().__init__(interval=interval)
+        self.session_factory = session_factory
+        self.ring = ring
+        self.algorithm = algorithm
+        self.secret = secret
+        self.rotate_every = timedelta(seconds=rotate_every)
+        self.publish_ahead = timedelta(seconds=publish_ahead)
+        self.retain = timedelta(seconds=retain)
+        # decrypting a private key is slow, do it once per kid
+        self._loaded: dict[str, SigningKey] = {}
+
+    async def run_once(self) -> None:
+        now = get_clock().now()
+        async with self.session_factory() as session:
+            rows = await self.load(session, now)
+            if self.needs_rotation(rows, now):
+                rows = await self.rotate(session, now)
+
+        keys = [self.to_signing_key(row) for row in rows]
+        self._loaded = {key.kid: key for key in keys}
+        self.ring.replace(keys, now)
+
+    async def load(
+        self,
+        session: AsyncSession,
+        now: datetime,
+    ) -> list[SigningKeyRow]:
+        stmt = select(SigningKeyRow).where(SigningKeyRow.expires_at > now)
+        return list((await session.scalars(stmt)).all())
+
+    def needs_rotation(self, rows: list[SigningKeyRow], now: datetime) -> bool:
+        newest = max(
+            (row.active_from for row in rows if row.algorithm == self.algorithm),
+            default=None,
+        )
+        # the next key is created early enough to be published in time
+        return newest is None or newest + self.rotate_every - self.publish_ahead <= now
+
+    async def rotate(
+        self,
+        session: AsyncSession,
+        now: datetime,
+    ) -> list[SigningKeyRow]:
+        await session.execute(select(func.pg_advisory_xact_lock(ROTATION_LOCK)))
+
+        # another worker may have rotated while we waited
+        rows = await self.load(session, now)
+        if not self.needs_rotation(rows, now):
+            await session.commit()
+            return rows
+
+        current = [row for row in rows if row.algorithm == self.algorithm]
+        # the first key has nothing to take over from, it signs right away
+        active_from = now + self.publish_ahead if current else now
+
+        kid, private_key = generate_key_pair(self.algorithm)
+        row = SigningKeyRow(
+            kid=kid,
+            algorithm=self.algorithm,
+            private_key=dump_private_key(private_key, self.secret),
+            public_jwk=public_jwk(kid, self.algorithm, private_key.public_key()),
+            active_from=active_from,
+            expires_at=active_from + self.rotate_every + self.retain,
+        )
+        session.add(row)
+
+        # keys it replaces still verify the tokens they signed
+        if current:
+            await session.execute(
+                update(SigningKeyRow)
+                .where(SigningKeyRow.kid.in_([key.kid for key in current]))
+                .values(
+                    expires_at=func.least(
+                        SigningKeyRow.expires_at, active_from + self.retain
+                    )
+                )
+                .execution_options(synchronize_session=False)
+            )
+        await session.execute(delete(SigningKeyRow).where(SigningKeyRow.expires_at <= now))
+        await session.commit()
+
+        logger.info(
+            """
+            New %s signing key %r, signs from %s
+            """, self.algorithm, kid, active_from
+        )
+        return await self.load(session, now)
+
+    def to_signing_key(self, row: SigningKeyRow) -> SigningKey:
+        loaded = self._loaded.get(row.kid)
+        if loaded is not None and loaded.active_from == row.active_from:
+            return loaded
+
+        # keys of a previous algorithm only verify
+        private_key = None
+        if row.algorithm == self.algorithm:
+            private_key = load_private_key(row.private_key, self.secret)
+        public_key = (
+            private_key.public_key() if private_key is not None
+            else jwt.PyJWK(row.public_jwk).key
+        )
+        return SigningKey(
+            kid=row.kid,
+            algorithm=row.algorithm,
+            private_key=private_key,
+            public_key=public_key,
+            public_jwk=row.public_jwk,
+            active_from=row.active_from,
+        )
+
+
+signing_key_rotator = SigningKeyRotator(
+    session_factory=db_helper.session_factory,
+    ring=key_ring,
+    algorithm=settings.access.algorithm,
+    secret=settings.access.secret_key,
+    rotate_every=settings.signing_keys.rotate_every,
+    publish_ahead=settings.signing_keys.publish_ahead,
+    retain=settings.signing_keys.retain,
+    interval=settings.signing_keys.reload_interval,
+)
@@ -0,0 +1,150 @@
+import asyncio
+import logging
+from datetime import datetime
+
+from sqlalchemy import select, delete, or_, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from core.config import settings
+from core.database import db_helper
+from core.database.models import RefreshToken
+from utilities.clock import get_clock
+from utilities.periodic import PeriodicTask
+
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+PARTITION_PREFIX = "refresh_tokens_p"
+
+
+def month_start(date: datetime, shift: int = 0) -> datetime:
+    """ First day of the month `shift` months after `date` """
+    month = date.month - 1 + shift
+    return datetime(date.year + month // 12, month % 12 + 1, 1)
+
+
+def partition_name(start: datetime) -> str:
+    return f"{PARTITION_PREFIX}{start:%Y_%m}"
+
+
+class RefreshTokenReaper(PeriodicTask):
+    """
+    Background task that deletes expired and revoked
+    refresh tokens in bounded batches.
+    With partitioned storage it also creates upcoming monthly
+    partitions and drops the ones that only hold expired tokens.
+    """
+    name = "refresh-token-reaper"
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        interval: int = 3600,
+        batch_size: int = 1000,
+        partitioned: bool = False,
+        partitions_ahead: int = 2,
+    ):
+        super().__init__(interval=interval)
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.partitioned = partitioned
+        self.partitions_ahead = partitions_ahead
+
+    async def run_once(self) -> None:
+        await self.reap_once()
+
+    async def reap_once(self) -> int:
+        """
+        One full pass.
+        Return number of deleted rows.
+        """
+        now = get_clock().now()
+
+        if self.partitioned:
+            await self.maintain_partitions(now)
+
+        deleted = 0
+        while True:
+            batch = await self.delete_batch(now)
+            deleted += batch
+            if batch < self.batch_size:
+                break
+            # let the request handlers run between batches
+            await asyncio.sleep(0)
+
+        logger.info(
+            """
+            Reaped %r expired or revoked refresh tokens
+            """, deleted
+        )
+        return deleted
+
+    async def delete_batch(self, now: datetime) -> int:
+        """
+        Delete up to batch_size dead tokens in own transaction
+        """
+        dead_ids = (
+            select(RefreshToken.id)
+            .where(
+                or_(
+                    RefreshToken.expires_at <= now,
+                    RefreshToken.is_revoked == True,
+                )
+            )
+            .limit(self.batch_size)
+            .scalar_subquery()
+        )
+        stmt = delete(RefreshToken).where(RefreshToken.id.in_(dead_ids))
+
+        async with self.session_factory() as session:
+            result = await session.execute(stmt)
+            await session.commit()
+            return result.rowcount
+
+    async def maintain_partitions(self, now: datetime) -> None:
+        """
+        Create partitions for the coming months and drop
+        every partition whose range ended before now: O(1)
+        no matter how many rows it holds.
+        """
+        async with self.session_factory() as session:
+            await self.create_partitions(session, now)
+
+            result = await session.execute(text(
+                "SELECT child.relname FROM pg_inherits "
+                "JOIN pg_class parent ON pg_inherits.inhparent = parent.oid "
+                "JOIN pg_class child ON pg_inherits.inhrelid = child.oid "
+                "WHERE parent.relname = 'refresh_tokens'"
+            ))
+            for name in result.scalars().all():
+                if not name.startswith(PARTITION_PREFIX):
+                    continue
+                start = datetime.strptime(name[len(PARTITION_PREFIX):], "%Y_%m")
+                if month_start(start, 1) <= now:
+                    await session.execute(text(f"DROP TABLE {name}"))
+                    logger.info("Dropped refresh token partition %r", name)
+
+            await session.commit()
+
+    async def create_partitions(self, session: AsyncSession, now: datetime) -> None:
+        """ Partitions from the month of now on, in the caller's transaction """
+        current = month_start(now)
+        for shift in range(self.partitions_ahead + 1):
+            start = month_start(current, shift)
+            end = month_start(current, shift + 1)
+            await session.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {partition_name(start)} "
+                f"PARTITION OF refresh_tokens "
+                f"FOR VALUES FROM ('{start:%Y-%m-%d}') TO ('{end:%Y-%m-%d}')"
+            ))
+
+
+refresh_token_reaper = RefreshTokenReaper(
+    session_factory=db_helper.session_factory,
+    interval=settings.reaper.interval,
+    batch_size=settings.reaper.batch_size,
+    partitioned=settings.reaper.partitioned,
+    partitions_ahead=settings.reaper.partitions_ahead,
+)
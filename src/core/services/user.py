@@ -1,34 +1,37 @@
 import re
+import secrets
 import jwt
 import logging
-from core.CONST import NOW
 
 
 from typing import Optional
 from datetime import timedelta, timezone, datetime
 
-from fastapi import (
-    Request, 
-    BackgroundTasks,
-    )
+from fastapi import Request
 
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, update, or_
+from sqlalchemy.dialects.postgresql import insert
 
+from core.config import settings
 from core.database.schemas.user import UserCreate
+from core.database import UnitOfWork
+from core.database.sql import in_array
 from core.database.models import User, RefreshToken
+from core.cache import user_cache, user_filter
+from core.services import user_stats
 
-from utilities.security import hash_password, verify_password
-from utilities.jwt_token import create_jwt_token, verify_token
+from utilities.security import (
+    hash_password_async, 
+    verify_password_async, 
+    needs_rehash,
+    )
+from utilities.clock import Clock, get_clock
+from utilities.jwt_token import create_jwt_token, verify_token, token_digest
 
 from exceptions import auth
 
-from core.mailing import (
-    send_answer_after_verify,
-    send_verification_email,
-    send_pasword_reset_email,
-    send_answer_after_reset_password,
-    )
+from core.mailing.outbox import enqueue_email
 
 
 logging.basicConfig(level=logging.INFO)
@@ -43,10 +46,11 @@ class UserService:
     def __init__(
         self, 
         session: AsyncSession,
-        background_task: Optional[BackgroundTasks] = None
+        clock: Optional[Clock] = None,
     ):
         self.session = session
-        self.background_task = background_task
+        self.clock = clock or get_clock()
+        self.uow = UnitOfWork(session)
         
     async def create_user(
         self,
@@ -58,44 +62,57 @@ class UserService:
         and sends a token to the email for email confirmation.
         """
         
-        # logic for unique email and username:
-        if await self.get_user_by_email(user_data.email):
-            raise auth.LoginAlreadyExist("Email already exist!")
-        if await self.get_user_by_username(user_data.username):
-            raise auth.LoginAlreadyExist("Username already exist!")
-        
         # password validation: 
         await self.validate_password(user_data.password)
         
+        # only a possible duplicate costs a lookup, and one that
+        # is caught here isn't hashed for nothing:
+        if (
+            user_filter.has_email(user_data.email) 
+            or user_filter.has_username(user_data.username)
+        ):
+            await self.raise_login_exist(user_data.email, user_data.username)
+        
         # password hashing:
-        hashed_password = hash_password(user_data.password)
-        
-        # create user:
-        user = User(
-            email=user_data.email,
-            username=user_data.username,
-            hashed_password=hashed_password,
-            is_active=True,
-            is_verified=False,
-            is_superuser=False,
+        hashed_password = await hash_password_async(user_data.password)
+        
+        # create user, the unique indexes decide about duplicates,
+        # so concurrent signups can't both pass a check:
+        stmt = (
+            insert(User)
+            .values(
+                email=user_data.email,
+                username=user_data.username,
+                hashed_password=hashed_password,
+                is_active=True,
+                is_verified=False,
+                is_superuser=False,
+            )
+            .on_conflict_do_nothing()
+            .returning(User)
         )
+        user = (await self.session.scalars(stmt)).one_or_none()
+        if user is None:
+            await self.raise_login_exist(user_data.email, user_data.username)
+            # the conflicting user was deleted in the meantime
+            raise auth.LoginAlreadyExist("Username already exist!")
         
-        self.session.add(user)
-        await self.session.commit()
-        await self.session.refresh(user)
+        # a rollback only leaves a false positive behind
+        user_filter.add_user(user.email, user.username)
         
-        # generate token:
-        verification_token = await self.generate_verification_token(user.id)
+        await user_stats.change_user_stats(self.session, total=1, active=1)
+        await user_stats.record_signup_event(self.session, self.clock.now(), signups=1)
         
-        # send verification email:
-        await self.after_request_verify(user=user, token=verification_token)
+        # queue verification email in the same transaction:
+        await self.after_request_verify(user=user)
+        
+        await self.uow.commit()
 
         logger.info(
             """
-            📧 Verification email sent to %r:
-            Token: %r
+            📧 Verification email queued for %r
             """, 
-            user.email, verification_token
+            user.email
         )
         return user
     
@@ -123,11 +140,127 @@ class UserService:
             raise auth.EmailNotVerified
         
         # verifying password
-        if not verify_password(password, user.hashed_password):
+        if not await verify_password_async(password, user.hashed_password):
             raise auth.InvalidPassword
         
+        # upgrade hash made with an old scheme or cost
+        if needs_rehash(user.hashed_password):
+            user.hashed_password = await hash_password_async(password)
+            await self.uow.commit()
+            
+            logger.info(
+                """
+                Password rehashed for user.id: %r
+                """, user.id
+            )
+        
         return user
     
+    async def login(
+        self,
+        login: str,
+        password: str,
+    ) -> tuple[User, str]:
+        """
+        Authenticate and issue a refresh token,
+        a rehash on login lands in the same commit.
+        """
+        async with self.uow:
+            user = await self.authenticate(login, password)
+            refresh_token = await self.create_refresh_token(user.id)
+        
+        return user, refresh_token
+    
+    async def rotate_refresh_token(
+        self,
+        token: str,
+    ) -> tuple[User, str]:
+        """
+        Revoke the used refresh token and issue a new one
+        in a single transaction.
+        """
+        async with self.uow:
+            stored_token = await self.validate_refresh_token(token)
+            stored_token.is_revoked = True
+            
+            user = await self.get_user_by_id(stored_token.user_id)
+            if not user:
+                raise auth.UserNotFound
+            
+            refresh_token = await self.create_refresh_token(user.id)
+        
+        return user, refresh_token
+    
+    def create_access_token(
+        self,
+        user: User,
+    ) -> str:
+        """
+        Access token with the claims needed to 
+        authenticate without loading the user.
+        """
+        expires_delta = None
+        if settings.access.stateless:
+            # bounds how long a revocation takes to reach other workers
+            expires_delta = timedelta(minutes=settings.access.stateless_expire_at)
+        
+        return create_jwt_token(
+            data={
+                "sub": user.id,
+                "type": "access_token",
+                "username": user.username,
+                "is_active": user.is_active,
+                "is_superuser": user.is_superuser,
+                "ver": user.token_version,
+            },
+            expires_delta=expires_delta,
+        )
+    
+    async def raise_login_exist(self, email: str, username: str) -> None:
+        """
+        Tell which of email and username is taken,
+        returns if neither is.
+        """
+        stmt = select(User.email == email).where(
+            or_(User.email == email, User.username == username)
+        )
+        result = await self.session.execute(stmt)
+        taken = list(result.scalars())
+        if any(taken):
+            raise auth.LoginAlreadyExist("Email already exist!")
+        if taken:
+            raise auth.LoginAlreadyExist("Username already exist!")
+    
+    async def check_availability(
+        self,
+        email: str | None = None,
+        username: str | None = None,
+    ) -> dict[str, bool]:
+        """
+        Whether email and username are free to register.
+        Misses of the user filter need no query: a user created
+        on another worker may read as free until the next refresh,
+        the signup itself is decided by the unique indexes.
+        """
+        conditions = []
+        if email is not None and user_filter.has_email(email):
+            conditions.append(User.email == email)
+        if username is not None and user_filter.has_username(username):
+            conditions.append(User.username == username)
+        
+        taken = set()
+        if conditions:
+            stmt = select(User.email, User.username).where(or_(*conditions))
+            for row in await self.session.execute(stmt):
+                taken.update({("email", row.email), ("username", row.username)})
+        
+        availability = {}
+        if email is not None:
+            availability["email"] = ("email", email) not in taken
+        if username is not None:
+            availability["username"] = ("username", username) not in taken
+        return availability
+    
     async def get_user_by_email(
         self,
         email: str,
@@ -167,50 +300,30 @@ class UserService:
         return result.scalar_one_or_none()
     
     
-    async def generate_verification_token(
-        self,
-        user_id: int,
-    ) -> str:
-        """Generate verification token"""
-        
-        token_data = {
-            "sub": str(user_id),
-            "type": "email_verification"
-        }
-        
-        return create_jwt_token(
-            token_data,
-            expires_delta=timedelta(minutes=5)
-        )
-        
-    
     async def after_request_verify(
         self,
         user: User,
-        token: str,
         request: Optional[Request] = None,
     ):
     
         """ 
-        Generates a verification link and 
-        sends an email to the user as a background task.
+        Queues a verification email to the user in the outbox,
+        its link is made when the email is sent.
+        The caller commits.
         """
 
-        verification_link = f"http://localhost:8000/verification-proccess?token={token}"
-
-        self.background_task.add_task(
-            send_verification_email,
+        enqueue_email(
+            self.session,
+            "verification",
             user=user,
-            verification_link=verification_link
+            user_id=user.id,
         )
 
         logger.info(
             """
-            🫴 Email was send with link:
-            %r
-            to user: %r
+            🫴 Verification email queued for user: %r
             """, 
-            verification_link, user.username
+            user.username
         )
     
     
@@ -236,14 +349,25 @@ class UserService:
             if not user:
                 raise auth.UserNotFound
 
+            was_verified = user.is_verified
             user.is_verified = True
-            await self.session.commit()
-        
-            # sending confirm email about verification:
-            self.background_task.add_task(
-                send_answer_after_verify,
+            # user row first, stats row last, as on every other path
+            await self.session.flush()
+            if not was_verified:
+                await user_stats.change_user_stats(self.session, verified=1)
+                await user_stats.record_signup_event(
+                    self.session, self.clock.now(), verifications=1
+                )
+            
+            # confirm email about verification:
+            enqueue_email(
+                self.session,
+                "after_verify",
                 user=user,
             )
+            
+            self.uow.after_commit(lambda: user_cache.invalidate(user_id))
+            await self.uow.commit()
         
             return user
         
@@ -286,8 +410,8 @@ class UserService:
         request: Optional[Request] = None,
     ):
         """ 
-        Generates a token and sends the user an email 
-        with a link containing the token's query parameter.
+        Queues an email to the user with a link containing
+        a reset token, minted when the email is sent.
         """
         user = await self.get_user_by_email(email=email)
         
@@ -300,35 +424,20 @@ class UserService:
         if not user.is_verified:
             raise auth.EmailNotVerified
         
-        reset_data = {
-            "sub": str(user.id),
-            "type": "password_reset",
-        }
-        
-        # create token 
-        reset_token =  create_jwt_token(
-            reset_data,
-            expires_delta=timedelta(minutes=5)
-        )
-        
-        reset_link = f"http://localhost:8000/reset-proccess?token={reset_token}"
-        
-        # sent email
-        self.background_task.add_task(
-            send_pasword_reset_email,
+        # sent email, the reset link is made when it is sent
+        enqueue_email(
+            self.session,
+            "password_reset",
             user=user,
-            reset_link=reset_link,
+            user_id=user.id,
         )
+        await self.uow.commit()
         
         logger.info(
             """
-            Password reset link sent to %r:
-            Reset link: %r
-            Token: %r,
+            Password reset email queued for %r
             """,
             email,
-            reset_link,
-            reset_token,
         )
     
     async def reset_password(
@@ -362,23 +471,29 @@ class UserService:
             await self.validate_password(new_password)
             
             # check password if new pwd equal current:
-            if verify_password(new_password, user.hashed_password):
+            if await verify_password_async(new_password, user.hashed_password):
                 raise auth.ErrorPasswordValidation("New password cannot be the same as the current password")
             
-            # change password
-            user.hashed_password = hash_password(new_password)
+            # one transaction: revoking refresh tokens joins it
+            async with self.uow:
+                # change password and invalidate issued access tokens
+                user.hashed_password = await hash_password_async(new_password)
+                user.token_version += 1
             
-            # delete refresh token for user 
-            await self.revoke_refresh_token(user.id)
+                # delete refresh token for user 
+                await self.revoke_refresh_token(user.id)
             
             
-            await self.session.commit()
+                # sent email
+                enqueue_email(
+                    self.session,
+                    "after_reset_password",
+                    user=user,
+                )
             
-            # sent email
-            self.background_task.add_task(
-                send_answer_after_reset_password,
-                user=user,
-            )
+                self.uow.after_commit(
+                    lambda: user_cache.revoke_tokens(user.id, user.token_version)
+                )
             
             logger.info(
                 """
@@ -399,10 +514,12 @@ class UserService:
     ):
         token_data = {
             "sub": str(user_id),
-            "type": "refresh_token"
+            "type": "refresh_token",
+            # tokens issued within the same second must still differ
+            "jti": secrets.token_urlsafe(16),
         }
         
-        expires_at = NOW + timedelta(days=30)
+        expires_at = self.clock.now() + timedelta(days=30)
 
         token = create_jwt_token(
             token_data,
@@ -411,13 +528,13 @@ class UserService:
         
         refresh_token = RefreshToken(
             user_id=user_id,
-            token=token,
+            token_hash=token_digest(token),
             expires_at=expires_at,
             is_revoked=False,
         )
         
         self.session.add(refresh_token)
-        await self.session.commit()
+        await self.uow.commit()
         return token
     
     
@@ -446,8 +563,8 @@ class UserService:
         Return token or None
         """
         stmt = select(RefreshToken).where(
-            RefreshToken.token == token,
-            RefreshToken.expires_at > NOW,
+            RefreshToken.token_hash == token_digest(token),
+            RefreshToken.expires_at > self.clock.coarse_now(),
             RefreshToken.is_revoked == False
         )
         
@@ -464,38 +581,74 @@ class UserService:
             
             # check in DB if token is revoked
             token = await self.get_valid_refresh_token(token=token)
+            if not token:
+                raise auth.InvalidToken
             
             return token
         
         except Exception as e:
-            logger.error("Error: ", e)
+            logger.error("Error: %r", e)
             raise auth.InvalidToken
         
     async def revoke_refresh_token(
         self,
         user_id: int,
-    ):
+    ) -> int:
         """ 
         Revoked all refresh token for user
+        in a single UPDATE.
+        Return number of revoked tokens.
         """
         
-        stmt = select(RefreshToken).where(
-            RefreshToken.user_id == user_id,
-            RefreshToken.is_revoked == False
+        stmt = (
+            update(RefreshToken)
+            .where(
+                RefreshToken.user_id == user_id,
+                RefreshToken.is_revoked == False
+            )
+            .values(is_revoked=True)
         )
         
         result = await self.session.execute(stmt)
-        tokens = result.scalars().all()
+        await self.uow.commit()
+        
+        logger.info(
+            """ 
+            Revoked %r refresh tokens for user_id: %r
+            """,
+            result.rowcount, user_id
+        )
+        return result.rowcount
+    
+    async def revoke_refresh_tokens(
+        self,
+        user_ids: list[int],
+    ) -> int:
+        """ 
+        Revoked all refresh token for list of users
+        in a single UPDATE.
+        Return number of revoked tokens.
+        """
         
+        if not user_ids:
+            return 0
         
-        for token in tokens:
-            token.is_revoked = True
-            
-        await self.session.commit()
+        stmt = (
+            update(RefreshToken)
+            .where(
+                in_array(RefreshToken.user_id, user_ids),
+                RefreshToken.is_revoked == False
+            )
+            .values(is_revoked=True)
+        )
+        
+        result = await self.session.execute(stmt)
+        await self.uow.commit()
         
         logger.info(
             """ 
-            Revoked all refresh tokens for user_id: %r
+            Revoked %r refresh tokens for %r users
             """,
-            user_id
+            result.rowcount, len(user_ids)
         )
+        return result.rowcount
@@ -0,0 +1,118 @@
+import logging
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from core.config import settings
+from core.database import db_helper
+from core.database.models import User
+from core.cache.user_filter import UserFilter, user_filter
+from utilities.bloom import BloomFilter
+from utilities.periodic import PeriodicTask
+
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+# created_at is the insert's transaction start, a user committed
+# late can be older than the newest one already loaded
+LOOKBACK = timedelta(seconds=60)
+
+
+class UserFilterLoader(PeriodicTask):
+    """
+    Builds the user filter by streaming the users table,
+    then adds the users created by other workers since.
+    Rebuilds once deletes or growth made it too loose.
+    """
+    name = "user-filter-loader"
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        user_filter: UserFilter,
+        interval: int = 10,
+        capacity: int = 100000,
+        error_rate: float = 0.01,
+        rebuild_deleted_ratio: float = 0.2,
+        chunk_size: int = 5000,
+    ):
+        super().__init__(interval=interval)
+        self.session_factory = session_factory
+        self.user_filter = user_filter
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.rebuild_deleted_ratio = rebuild_deleted_ratio
+        self.chunk_size = chunk_size
+
+    async def run_once(self) -> None:
+        if self.user_filter.needs_rebuild(self.rebuild_deleted_ratio):
+            await self.build()
+        else:
+            await self.load_new()
+
+    async def build(self) -> None:
+        self.user_filter.begin_rebuild()
+        try:
+            bloom, users, loaded_until = await self.stream_users()
+        except BaseException:
+            self.user_filter.abort_rebuild()
+            raise
+
+        self.user_filter.replace(bloom, users, loaded_until)
+        logger.info(
+            """
+            User filter built: %r users, %r bytes
+            """, users, bloom.nbytes
+        )
+
+    async def stream_users(self) -> tuple[BloomFilter, int, datetime | None]:
+        async with self.session_factory() as session:
+            total = await session.scalar(select(func.count(User.id)))
+            # two entries per user, room to grow to twice the size
+            bloom = BloomFilter(
+                capacity=2 * 2 * max(total, self.capacity),
+                error_rate=self.error_rate,
+            )
+            users, loaded_until = 0, None
+            result = await session.stream(
+                select(User.email, User.username, User.created_at)
+                .execution_options(yield_per=self.chunk_size)
+            )
+            async for rows in result.partitions():
+                for row in rows:
+                    UserFilter.add_entries(bloom, row.email, row.username)
+                    if loaded_until is None or row.created_at > loaded_until:
+                        loaded_until = row.created_at
+                users += len(rows)
+
+        return bloom, users, loaded_until
+
+    async def load_new(self) -> None:
+        stmt = select(User.email, User.username, User.created_at)
+        if self.user_filter.loaded_until is not None:
+            stmt = stmt.where(
+                User.created_at >= self.user_filter.loaded_until - LOOKBACK
+            )
+        async with self.session_factory() as session:
+            rows = (await session.execute(stmt)).all()
+
+        for row in rows:
+            self.user_filter.add_user(row.email, row.username)
+        if rows:
+            self.user_filter.loaded_until = max(
+                self.user_filter.loaded_until or rows[0].created_at,
+                *(row.created_at for row in rows),
+            )
+
+
+user_filter_loader = UserFilterLoader(
+    session_factory=db_helper.session_factory,
+    user_filter=user_filter,
+    interval=settings.user_filter.refresh_interval,
+    capacity=settings.user_filter.capacity,
+    error_rate=settings.user_filter.error_rate,
+    rebuild_deleted_ratio=settings.user_filter.rebuild_deleted_ratio,
+)
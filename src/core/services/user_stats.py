@@ -0,0 +1,184 @@
+import logging
+from datetime import datetime
+
+from sqlalchemy import bindparam, select, update, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from core.config import settings
+from core.database import db_helper
+from core.database.models import User, UserStats, SignupRollup
+from utilities.periodic import PeriodicTask
+
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+STATS_ROW_ID = 1
+
+
+async def change_user_stats(
+    session: AsyncSession,
+    total: int = 0,
+    active: int = 0,
+    verified: int = 0,
+) -> None:
+    """
+    Apply deltas to the user counters.
+    Does not commit: call it before the commit of the user change
+    so both land in the same transaction.
+    Call it after the user rows are written (flushed): every path
+    locks users first and this single row last, so concurrent
+    writers can't deadlock on the opposite order.
+    """
+    stmt = (
+        update(UserStats)
+        .where(UserStats.id == STATS_ROW_ID)
+        .values(
+            total_users=UserStats.total_users + total,
+            active_users=UserStats.active_users + active,
+            verified_users=UserStats.verified_users + verified,
+            updated_at=func.now(),
+        )
+    )
+    await session.execute(stmt)
+
+
+async def record_signup_event(
+    session: AsyncSession,
+    at: datetime,
+    signups: int = 0,
+    verifications: int = 0,
+) -> None:
+    """
+    Increment the hourly rollup bucket of `at`.
+    Does not commit, same as change_user_stats.
+    """
+    bucket = at.replace(minute=0, second=0, microsecond=0)
+    stmt = (
+        insert(SignupRollup)
+        .values(bucket=bucket, signups=signups, verifications=verifications)
+        .on_conflict_do_update(
+            index_elements=[SignupRollup.bucket],
+            set_={
+                "signups": SignupRollup.signups + signups,
+                "verifications": SignupRollup.verifications + verifications,
+            },
+        )
+    )
+    await session.execute(stmt)
+
+
+async def get_signup_histogram(
+    session: AsyncSession,
+    since: datetime,
+    granularity: str = "day",
+) -> list[dict]:
+    """
+    Signups and verifications per day or hour since `since`,
+    summed from the hourly rollup.
+    """
+    if granularity not in ("day", "hour"):
+        raise ValueError(f"unknown histogram granularity {granularity!r}")
+    
+    # rendered inline so GROUP BY matches the selected expression
+    unit = bindparam("unit", granularity, literal_execute=True)
+    bucket = func.date_trunc(unit, SignupRollup.bucket).label("bucket")
+    stmt = (
+        select(
+            bucket,
+            func.sum(SignupRollup.signups).label("signups"),
+            func.sum(SignupRollup.verifications).label("verifications"),
+        )
+        .where(SignupRollup.bucket >= since)
+        .group_by(bucket)
+        .order_by(bucket)
+    )
+    result = await session.execute(stmt)
+    return [
+        {
+            "bucket": row.bucket,
+            "signups": row.signups,
+            "verifications": row.verifications,
+        }
+        for row in result
+    ]
+
+
+async def get_user_stats(session: AsyncSession) -> UserStats | None:
+    stmt = select(UserStats).where(UserStats.id == STATS_ROW_ID)
+    result = await session.execute(stmt)
+    return result.scalar_one_or_none()
+
+
+async def reconcile_user_stats(session: AsyncSession) -> UserStats:
+    """
+    Recount the counters from the users table
+    and overwrite the stored row.
+    """
+    # writers update the row before commit, so holding its lock
+    # makes the count consistent with the deltas applied after it
+    await session.execute(
+        select(UserStats.id)
+        .where(UserStats.id == STATS_ROW_ID)
+        .with_for_update()
+    )
+    counts = (
+        await session.execute(
+            select(
+                func.count(User.id).label("total"),
+                func.count(User.id).filter(User.is_active == True).label("active"),
+                func.count(User.id).filter(User.is_verified == True).label("verified"),
+            )
+        )
+    ).first()
+
+    values = {
+        "total_users": counts.total,
+        "active_users": counts.active,
+        "verified_users": counts.verified,
+        "updated_at": func.now(),
+    }
+    stmt = (
+        insert(UserStats)
+        .values(id=STATS_ROW_ID, **values)
+        .on_conflict_do_update(index_elements=[UserStats.id], set_=values)
+        .returning(UserStats)
+    )
+    result = await session.execute(stmt)
+    await session.commit()
+    return result.scalar_one()
+
+
+class UserStatsReconciler(PeriodicTask):
+    """
+    Periodically recounts user_stats to repair any drift,
+    e.g. from rows changed outside the application.
+    """
+    name = "user-stats-reconciler"
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        interval: int = 3600,
+    ):
+        super().__init__(interval=interval)
+        self.session_factory = session_factory
+
+    async def run_once(self) -> None:
+        async with self.session_factory() as session:
+            stats = await reconcile_user_stats(session)
+
+        logger.info(
+            """
+            User stats reconciled: %r total, %r active, %r verified
+            """,
+            stats.total_users, stats.active_users, stats.verified_users
+        )
+
+
+user_stats_reconciler = UserStatsReconciler(
+    session_factory=db_helper.session_factory,
+    interval=settings.stats.reconcile_interval,
+)
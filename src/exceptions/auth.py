@@ -64,4 +64,24 @@ class AccessDenied(AuthExecption):
 
 class OauthError(AuthExecption):
     def __init__(self, detail):
-        super().__init__(400, detail)
\ No newline at end of file
+        super().__init__(400, detail)
+        
+        
+class ServiceOverloaded(AuthExecption):
+    def __init__(self):
+        super().__init__(503, "Service overloaded, try again later 🥵")
+        
+        
+class TooManyRequests(AuthExecption):
+    def __init__(self, retry_after: int):
+        super().__init__(429, "Too many requests, slow down 🐌")
+        self.headers = {"Retry-After": str(retry_after)}
+
+
+class InvalidCursor(AuthExecption):
+    def __init__(self):
+        super().__init__(400, "Invalid pagination cursor 🧭")        
+        
+class UnknownProvider(AuthExecption):
+    def __init__(self):
+        super().__init__(404, "Unknown OAuth provider 🔭")
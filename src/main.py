@@ -5,6 +5,7 @@ from fastapi.middleware.cors import CORSMiddleware
 from core.database import lifespan
 from api import router as api_router
 from api.views import router as views_router
+from api.well_known import router as well_known_router
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -23,6 +24,7 @@ app.add_middleware(
 
 app.include_router(api_router)
 app.include_router(views_router)
+app.include_router(well_known_router)
 
 @app.get("/")
 async def root():
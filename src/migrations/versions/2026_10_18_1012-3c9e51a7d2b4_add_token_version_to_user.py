@@ -0,0 +1,37 @@
+"""Add token version to User
+
+Revision ID: 3c9e51a7d2b4
+Revises: 1bfb1d55251d
+Create Date: 2026-10-18 10:12:31.214630
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "3c9e51a7d2b4"
+down_revision: Union[str, Sequence[str], None] = "1bfb1d55251d"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "users",
+        sa.Column(
+            "token_version",
+            sa.Integer(),
+            server_default="0",
+            nullable=False,
+        ),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("users", "token_version")
@@ -0,0 +1,64 @@
+"""Store refresh token digest instead of token
+
+Revision ID: 8f2d6b3e7a15
+Revises: 3c9e51a7d2b4
+Create Date: 2026-10-18 11:04:12.530918
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "8f2d6b3e7a15"
+down_revision: Union[str, Sequence[str], None] = "3c9e51a7d2b4"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "refresh_tokens",
+        sa.Column("token_hash", sa.LargeBinary(length=32), nullable=True),
+    )
+    # sha256() is built into PostgreSQL 11+
+    op.execute(
+        "UPDATE refresh_tokens "
+        "SET token_hash = sha256(convert_to(token, 'UTF8'))"
+    )
+    op.alter_column("refresh_tokens", "token_hash", nullable=False)
+    op.create_index(
+        op.f("ix_refresh_tokens_token_hash"),
+        "refresh_tokens",
+        ["token_hash"],
+        unique=True,
+    )
+    op.drop_index(op.f("ix_refresh_tokens_token"), table_name="refresh_tokens")
+    op.drop_column("refresh_tokens", "token")
+
+
+def downgrade() -> None:
+    """Downgrade schema.
+
+    Digests can't be turned back into tokens,
+    so all stored refresh tokens are dropped.
+    """
+    op.execute("DELETE FROM refresh_tokens")
+    op.add_column(
+        "refresh_tokens",
+        sa.Column("token", sa.String(length=500), nullable=False),
+    )
+    op.create_index(
+        op.f("ix_refresh_tokens_token"),
+        "refresh_tokens",
+        ["token"],
+        unique=True,
+    )
+    op.drop_index(
+        op.f("ix_refresh_tokens_token_hash"), table_name="refresh_tokens"
+    )
+    op.drop_column("refresh_tokens", "token_hash")
@@ -0,0 +1,59 @@
+"""Create user stats table
+
+Revision ID: b71e0c4d9a62
+Revises: 8f2d6b3e7a15
+Create Date: 2026-10-18 13:47:05.118420
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "b71e0c4d9a62"
+down_revision: Union[str, Sequence[str], None] = "8f2d6b3e7a15"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "user_stats",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column(
+            "total_users", sa.BigInteger(), server_default="0", nullable=False
+        ),
+        sa.Column(
+            "active_users", sa.BigInteger(), server_default="0", nullable=False
+        ),
+        sa.Column(
+            "verified_users",
+            sa.BigInteger(),
+            server_default="0",
+            nullable=False,
+        ),
+        sa.Column(
+            "updated_at",
+            sa.DateTime(),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.execute(
+        "INSERT INTO user_stats "
+        "(id, total_users, active_users, verified_users) "
+        "SELECT 1, count(*), "
+        "count(*) FILTER (WHERE is_active), "
+        "count(*) FILTER (WHERE is_verified) "
+        "FROM users"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("user_stats")
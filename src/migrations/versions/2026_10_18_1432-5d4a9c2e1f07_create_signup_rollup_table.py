@@ -0,0 +1,64 @@
+"""Create signup rollup table and index users.created_at
+
+Revision ID: 5d4a9c2e1f07
+Revises: b71e0c4d9a62
+Create Date: 2026-10-18 14:32:48.905217
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "5d4a9c2e1f07"
+down_revision: Union[str, Sequence[str], None] = "b71e0c4d9a62"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # built without locking users against writes
+    with op.get_context().autocommit_block():
+        op.create_index(
+            op.f("ix_users_created_at"),
+            "users",
+            ["created_at"],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+
+    op.create_table(
+        "signup_rollup",
+        sa.Column("bucket", sa.DateTime(), nullable=False),
+        sa.Column(
+            "signups", sa.BigInteger(), server_default="0", nullable=False
+        ),
+        sa.Column(
+            "verifications",
+            sa.BigInteger(),
+            server_default="0",
+            nullable=False,
+        ),
+        sa.PrimaryKeyConstraint("bucket"),
+    )
+    # verification time isn't stored, so existing verified
+    # users are counted in the hour they signed up.
+    # created_at holds now() in the DB's local time, live events
+    # are bucketed on the UTC application clock: convert to UTC
+    op.execute(
+        "INSERT INTO signup_rollup (bucket, signups, verifications) "
+        "SELECT date_trunc('hour', created_at::timestamptz AT TIME ZONE 'UTC'), "
+        "count(*), "
+        "count(*) FILTER (WHERE is_verified) "
+        "FROM users GROUP BY 1"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("signup_rollup")
+    op.drop_index(op.f("ix_users_created_at"), table_name="users")
@@ -0,0 +1,61 @@
+"""Create oauth accounts table
+
+Revision ID: 4c8e2b7d1a93
+Revises: e93f7a1c6b28
+Create Date: 2026-10-18 16:49:05.311842
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "4c8e2b7d1a93"
+down_revision: Union[str, Sequence[str], None] = "e93f7a1c6b28"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "oauth_accounts",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("provider", sa.String(length=30), nullable=False),
+        sa.Column("subject", sa.String(length=255), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column(
+            "created_at",
+            sa.DateTime(),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.ForeignKeyConstraint(
+            ["user_id"], ["users.id"], ondelete="CASCADE"
+        ),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("provider", "subject"),
+    )
+    op.create_index(
+        op.f("ix_oauth_accounts_user_id"),
+        "oauth_accounts",
+        ["user_id"],
+        unique=False,
+    )
+    # existing GitHub links
+    op.execute(
+        "INSERT INTO oauth_accounts (provider, subject, user_id) "
+        "SELECT 'github', github_id::text, id FROM users "
+        "WHERE github_id IS NOT NULL"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(
+        op.f("ix_oauth_accounts_user_id"), table_name="oauth_accounts"
+    )
+    op.drop_table("oauth_accounts")
@@ -0,0 +1,36 @@
+"""Index refresh token user id
+
+Revision ID: a2f5c8e41d07
+Revises: 4c8e2b7d1a93
+Create Date: 2026-10-18 17:24:37.902614
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "a2f5c8e41d07"
+down_revision: Union[str, Sequence[str], None] = "4c8e2b7d1a93"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        op.f("ix_refresh_tokens_user_id"),
+        "refresh_tokens",
+        ["user_id"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(
+        op.f("ix_refresh_tokens_user_id"), table_name="refresh_tokens"
+    )
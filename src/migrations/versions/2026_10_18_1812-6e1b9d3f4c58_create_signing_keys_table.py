@@ -0,0 +1,53 @@
+"""Create signing keys table
+
+Revision ID: 6e1b9d3f4c58
+Revises: a2f5c8e41d07
+Create Date: 2026-10-18 18:12:51.117420
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "6e1b9d3f4c58"
+down_revision: Union[str, Sequence[str], None] = "a2f5c8e41d07"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "signing_keys",
+        sa.Column("kid", sa.String(length=64), nullable=False),
+        sa.Column("algorithm", sa.String(length=10), nullable=False),
+        sa.Column("private_key", sa.Text(), nullable=False),
+        sa.Column("public_jwk", sa.JSON(), nullable=False),
+        sa.Column("active_from", sa.DateTime(), nullable=False),
+        sa.Column("expires_at", sa.DateTime(), nullable=False),
+        sa.Column(
+            "created_at",
+            sa.DateTime(),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.PrimaryKeyConstraint("kid"),
+    )
+    op.create_index(
+        op.f("ix_signing_keys_expires_at"),
+        "signing_keys",
+        ["expires_at"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(
+        op.f("ix_signing_keys_expires_at"), table_name="signing_keys"
+    )
+    op.drop_table("signing_keys")
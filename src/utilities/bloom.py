@@ -0,0 +1,66 @@
+import math
+import hashlib
+
+
+class BloomFilter:
+    """
+    Set membership with false positives but no false negatives:
+    `value in bloom` is False only for values never added.
+    Sized for `capacity` values at `error_rate`, beyond that
+    the false positive rate grows. Values can't be removed.
+    """
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        if capacity < 1 or not 0 < error_rate < 1:
+            raise ValueError("bloom filter needs capacity >= 1 and 0 < error_rate < 1")
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, value: str):
+        # double hashing: k positions from one 128 bit digest
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        for number in range(self.hashes):
+            yield (first + number * second) % self.size
+
+    def add(self, value: str) -> bool:
+        """ False if the value was (probably) there already """
+        bits = self._bits
+        added = False
+        for position in self._positions(value):
+            mask = 1 << (position & 7)
+            if not bits[position >> 3] & mask:
+                bits[position >> 3] |= mask
+                added = True
+        self.count += added
+        return added
+
+    def __contains__(self, value: str) -> bool:
+        bits = self._bits
+        return all(
+            bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(value)
+        )
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def nbytes(self) -> int:
+        return len(self._bits)
+
+    def estimated_error_rate(self) -> float:
+        return (1 - math.exp(-self.hashes * self.count / self.size)) ** self.hashes
+
+    def stats(self) -> dict:
+        return {
+            "count": self.count,
+            "capacity": self.capacity,
+            "bytes": self.nbytes,
+            "hashes": self.hashes,
+            "estimated_error_rate": self.estimated_error_rate(),
+        }
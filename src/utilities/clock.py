@@ -0,0 +1,61 @@
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta, timezone
+
+
+class Clock(ABC):
+    """
+    Source of the current time.
+    Returns naive UTC datetimes, the same as stored in the DB.
+    """
+    @abstractmethod
+    def now(self) -> datetime:
+        ...
+
+    def coarse_now(self) -> datetime:
+        """ Current time with one second resolution, for hot paths """
+        return self.now()
+
+
+class SystemClock(Clock):
+    def __init__(self):
+        self._second: int | None = None
+        self._coarse: datetime | None = None
+
+    def now(self) -> datetime:
+        return datetime.now(timezone.utc).replace(tzinfo=None)
+
+    def coarse_now(self) -> datetime:
+        # time.time() is much cheaper than building a datetime
+        second = int(time.time())
+        if second != self._second:
+            self._second = second
+            self._coarse = datetime.fromtimestamp(second, timezone.utc).replace(tzinfo=None)
+        return self._coarse
+
+
+class FakeClock(Clock):
+    """ Clock for tests, moves only when told to """
+    def __init__(self, now: datetime | None = None):
+        self._now = now or datetime(2025, 1, 1)
+
+    def now(self) -> datetime:
+        return self._now
+
+    def set(self, now: datetime) -> None:
+        self._now = now
+
+    def advance(self, delta: timedelta) -> None:
+        self._now += delta
+
+
+_clock: Clock = SystemClock()
+
+
+def get_clock() -> Clock:
+    return _clock
+
+def set_clock(clock: Clock) -> None:
+    """ Replace the process clock, e.g. with FakeClock in tests """
+    global _clock
+    _clock = clock
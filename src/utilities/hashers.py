@@ -0,0 +1,191 @@
+import base64
+import hashlib
+import hmac
+import os
+from abc import ABC, abstractmethod
+import bcrypt
+
+from core.config import settings
+
+try:
+    import argon2
+except ImportError:  # argon2-cffi is optional
+    argon2 = None
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.b64encode(data).decode("ascii").rstrip("=")
+
+def _b64decode(data: str) -> bytes:
+    return base64.b64decode(data + "=" * (-len(data) % 4))
+
+
+class PasswordHasher(ABC):
+    """
+    Base class for password hashing schemes.
+    A scheme is identified by the prefixes of the hashes it produces.
+    """
+    scheme: str = ""
+    prefixes: tuple[str, ...] = ()
+
+    @abstractmethod
+    def hash(self, pwd: str) -> str:
+        ...
+
+    @abstractmethod
+    def verify(self, pwd: str, hashed_pwd: str) -> bool:
+        ...
+
+    @abstractmethod
+    def needs_rehash(self, hashed_pwd: str) -> bool:
+        """ True if hash was produced with other parameters """
+        ...
+
+
+class BcryptHasher(PasswordHasher):
+    scheme = "bcrypt"
+    prefixes = ("$2b$", "$2a$", "$2y$")
+
+    def __init__(self, rounds: int = 12):
+        self.rounds = rounds
+
+    def hash(self, pwd: str) -> str:
+        salt = bcrypt.gensalt(rounds=self.rounds)
+        hashed = bcrypt.hashpw(
+            password=pwd.encode("utf-8"),
+            salt=salt
+        )
+        return hashed.decode("utf-8")
+
+    def verify(self, pwd: str, hashed_pwd: str) -> bool:
+        try:
+            return bcrypt.checkpw(
+                password=pwd.encode("utf-8"),
+                hashed_password=hashed_pwd.encode("utf-8")
+            )
+        except ValueError:
+            # malformed hash
+            return False
+
+    def needs_rehash(self, hashed_pwd: str) -> bool:
+        # $2b$12$...
+        return int(hashed_pwd.split("$")[2]) != self.rounds
+
+
+class ScryptHasher(PasswordHasher):
+    """ $scrypt$ln=14,r=8,p=1$<salt>$<hash> """
+    scheme = "scrypt"
+    prefixes = ("$scrypt$",)
+
+    def __init__(self, n_log2: int = 14, r: int = 8, p: int = 1):
+        self.n_log2 = n_log2
+        self.r = r
+        self.p = p
+
+    def _derive(self, pwd: str, salt: bytes, n_log2: int, r: int, p: int) -> bytes:
+        return hashlib.scrypt(
+            pwd.encode("utf-8"),
+            salt=salt,
+            n=2 ** n_log2,
+            r=r,
+            p=p,
+            maxmem=2 ** (n_log2 + 8) * r,
+            dklen=32,
+        )
+
+    def _params(self) -> str:
+        return f"ln={self.n_log2},r={self.r},p={self.p}"
+
+    def hash(self, pwd: str) -> str:
+        salt = os.urandom(16)
+        key = self._derive(pwd, salt, self.n_log2, self.r, self.p)
+        return f"$scrypt${self._params()}${_b64encode(salt)}${_b64encode(key)}"
+
+    def verify(self, pwd: str, hashed_pwd: str) -> bool:
+        try:
+            _, _, params, salt, key = hashed_pwd.split("$")
+            values = dict(item.split("=") for item in params.split(","))
+            derived = self._derive(
+                pwd,
+                _b64decode(salt),
+                int(values["ln"]),
+                int(values["r"]),
+                int(values["p"]),
+            )
+            return hmac.compare_digest(derived, _b64decode(key))
+        except (ValueError, KeyError):
+            # malformed hash
+            return False
+
+    def needs_rehash(self, hashed_pwd: str) -> bool:
+        return hashed_pwd.split("$")[2] != self._params()
+
+
+class Argon2Hasher(PasswordHasher):
+    scheme = "argon2id"
+    prefixes = ("$argon2id$",)
+
+    def __init__(
+        self,
+        time_cost: int = 3,
+        memory_cost: int = 65536,
+        parallelism: int = 4,
+    ):
+        if argon2 is None:
+            raise RuntimeError("argon2id scheme requires the argon2-cffi package")
+        self.hasher = argon2.PasswordHasher(
+            time_cost=time_cost,
+            memory_cost=memory_cost,
+            parallelism=parallelism,
+            type=argon2.Type.ID,
+        )
+
+    def hash(self, pwd: str) -> str:
+        return self.hasher.hash(pwd)
+
+    def verify(self, pwd: str, hashed_pwd: str) -> bool:
+        try:
+            return self.hasher.verify(hashed_pwd, pwd)
+        except (
+            argon2.exceptions.VerificationError,
+            argon2.exceptions.InvalidHashError,
+        ):
+            # wrong password or a malformed hash
+            return False
+
+    def needs_rehash(self, hashed_pwd: str) -> bool:
+        return self.hasher.check_needs_rehash(hashed_pwd)
+
+
+def build_hashers() -> dict[str, PasswordHasher]:
+    """ Hashers available on this node keyed by scheme """
+    config = settings.hashing
+    hashers: list[PasswordHasher] = [
+        BcryptHasher(rounds=config.bcrypt_rounds),
+        ScryptHasher(
+            n_log2=config.scrypt_n_log2,
+            r=config.scrypt_r,
+            p=config.scrypt_p,
+        ),
+    ]
+    if argon2 is not None or config.scheme == "argon2id":
+        hashers.append(
+            Argon2Hasher(
+                time_cost=config.argon2_time_cost,
+                memory_cost=config.argon2_memory_cost,
+                parallelism=config.argon2_parallelism,
+            )
+        )
+    return {hasher.scheme: hasher for hasher in hashers}
+
+
+HASHERS = build_hashers()
+current_hasher = HASHERS[settings.hashing.scheme]
+
+
+def identify_hasher(hashed_pwd: str) -> PasswordHasher | None:
+    """ Find hasher by hash prefix """
+    for hasher in HASHERS.values():
+        if hashed_pwd.startswith(hasher.prefixes):
+            return hasher
+    return None
@@ -1,7 +1,64 @@
 import jwt
-from datetime import timedelta, datetime, timezone
+import time
+import hashlib
+from datetime import timedelta, timezone
+from typing import Callable
 
 from core.config import settings
+from utilities.cache import TTLCache
+from utilities.clock import get_clock
+from utilities.key_ring import key_ring
+
+
+class VerifiedTokenCache(TTLCache):
+    """
+    Per-worker LRU of already verified tokens keyed by digest,
+    each kept until its own exp.
+    A hit skips the signature check but not the revocation
+    checks, and is dropped once its signing key left the ring.
+    """
+    def __init__(self, enabled: bool = True, max_size: int = 10000):
+        super().__init__(max_size=max_size)
+        self.enabled = enabled
+        self.revocation_checks: list[Callable[[dict], bool]] = []
+        self.revoked = 0
+
+    def add_revocation_check(self, check: Callable[[dict], bool]) -> None:
+        """ check(payload) returns True for a token to reject """
+        self.revocation_checks.append(check)
+
+    def is_revoked(self, payload: dict) -> bool:
+        if any(check(payload) for check in self.revocation_checks):
+            self.revoked += 1
+            return True
+        return False
+
+    def get_payload(self, digest: bytes) -> dict | None:
+        if not self.enabled:
+            return None
+        item = self.get(digest)
+        if item is None:
+            return None
+        kid, payload = item
+        if kid is not None and key_ring.get(kid) is None:
+            self.delete(digest)
+            return None
+        return payload
+
+    def put_payload(self, digest: bytes, kid: str | None, payload: dict) -> None:
+        ttl = payload.get("exp", 0) - time.time()
+        if self.enabled and ttl > 0:
+            self.set(digest, (kid, payload), ttl=ttl)
+
+    def stats(self) -> dict:
+        return {**super().stats(), "revoked": self.revoked}
+
+
+verified_tokens = VerifiedTokenCache(
+    enabled=settings.token_cache.enabled,
+    max_size=settings.token_cache.max_size,
+)
+
 
 def create_jwt_token(
     data: dict,
@@ -13,34 +70,70 @@ def create_jwt_token(
     if 'sub' in to_encode:
         to_encode['sub'] = str(to_encode['sub'])
         
+    now = get_clock().now().replace(tzinfo=timezone.utc)
     if expires_delta:
-        expire = datetime.now(timezone.utc) + expires_delta
+        expire = now + expires_delta
     else:
-        expire = datetime.now(timezone.utc) + timedelta(
+        expire = now + timedelta(
             minutes=settings.access.expire_at
         )
     to_encode.update({"exp": expire})
+    
+    if settings.access.algorithm == "HS256":
+        return jwt.encode(
+            to_encode, 
+            settings.access.secret_key, 
+            algorithm="HS256"
+        )
+    
+    key = key_ring.current()
     encoded_jwt = jwt.encode(
         to_encode, 
-        settings.access.secret_key, 
-        algorithm=settings.access.algorithm
+        key.private_key, 
+        algorithm=key.algorithm,
+        headers={"kid": key.kid},
     )
     
     return encoded_jwt
 
+def token_digest(token: str) -> bytes:
+    """Fixed-size SHA-256 digest used to store and look up tokens"""
+    return hashlib.sha256(token.encode("utf-8")).digest()
+
+def decode_token(token: str, kid: str | None) -> dict:
+    """
+    Check the signature with the key ring key `kid` (from the header),
+    tokens without kid with the shared HS256 secret.
+    Raises jwt.PyJWTError.
+    """
+    if kid is not None:
+        key = key_ring.get(kid)
+        if key is None:
+            raise jwt.InvalidKeyError(f"unknown key {kid!r}")
+        return jwt.decode(token, key.public_key, algorithms=[key.algorithm])
+    
+    if settings.access.algorithm != "HS256" and not settings.access.accept_hs256:
+        raise jwt.InvalidTokenError("token without kid")
+    return jwt.decode(token, settings.access.secret_key, algorithms=["HS256"])
+
 def verify_token(token: str, expected_type: str = None) -> dict | None:
     """Verifies the JWT token and returns the payload"""
-    try: 
-        payload = jwt.decode(
-            token,
-            settings.access.secret_key,
-            algorithms=[settings.access.algorithm],
-        )
-        
-        if expected_type and payload.get("type") != expected_type:
-            return None 
+    digest = token_digest(token)
+    payload = verified_tokens.get_payload(digest)
+    
+    if payload is None:
+        try: 
+            kid = jwt.get_unverified_header(token).get("kid")
+            payload = decode_token(token, kid)
+        except jwt.PyJWTError:
+            return None
+        verified_tokens.put_payload(digest, kid, payload)
         
-        return payload
+    if expected_type and payload.get("type") != expected_type:
+        return None 
+    
+    if verified_tokens.is_revoked(payload):
+        return None
     
-    except jwt.PyJWTError:
-        return None
\ No newline at end of file
+    # callers may change it, the cached one stays intact
+    return dict(payload)
@@ -0,0 +1,121 @@
+import json
+import hashlib
+import secrets
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any
+
+from jwt.algorithms import has_crypto
+
+if has_crypto:
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import ec, ed25519
+    from jwt.algorithms import ECAlgorithm, OKPAlgorithm
+# cryptography is optional: only asymmetric signing needs it
+
+
+ASYMMETRIC_ALGORITHMS = ("EdDSA", "ES256")
+
+
+@dataclass(frozen=True, slots=True)
+class SigningKey:
+    kid: str
+    algorithm: str
+    # cryptography key objects, private is None for verify-only keys
+    private_key: Any | None
+    public_key: Any
+    public_jwk: dict
+    # tokens are signed with it from this moment,
+    # before that it is only published in the JWKS
+    active_from: datetime
+
+
+def require_crypto(algorithm: str) -> None:
+    if algorithm not in ASYMMETRIC_ALGORITHMS:
+        raise ValueError(f"unsupported signing algorithm {algorithm!r}")
+    if not has_crypto:
+        raise RuntimeError(f"{algorithm} signing requires the cryptography package")
+
+
+def public_jwk(kid: str, algorithm: str, public_key: Any) -> dict:
+    require_crypto(algorithm)
+    if algorithm == "EdDSA":
+        jwk = OKPAlgorithm.to_jwk(public_key, as_dict=True)
+    else:
+        jwk = ECAlgorithm.to_jwk(public_key, as_dict=True)
+    jwk.update({"kid": kid, "alg": algorithm, "use": "sig"})
+    return jwk
+
+
+def generate_key_pair(algorithm: str) -> tuple[str, Any]:
+    """ New (kid, private key) """
+    require_crypto(algorithm)
+    if algorithm == "EdDSA":
+        private_key = ed25519.Ed25519PrivateKey.generate()
+    else:
+        private_key = ec.generate_private_key(ec.SECP256R1())
+    return secrets.token_urlsafe(12), private_key
+
+
+def dump_private_key(private_key: Any, password: str) -> str:
+    """ PEM encrypted with `password`, for storage """
+    return private_key.private_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PrivateFormat.PKCS8,
+        encryption_algorithm=serialization.BestAvailableEncryption(password.encode()),
+    ).decode("ascii")
+
+
+def load_private_key(pem: str, password: str) -> Any:
+    return serialization.load_pem_private_key(pem.encode("ascii"), password.encode())
+
+
+class KeyRing:
+    """
+    Signing keys of this worker.
+    Newest active key signs, every key in the ring verifies.
+    The JWKS document is serialized once per change,
+    not once per request.
+    """
+    def __init__(self):
+        self._keys: dict[str, SigningKey] = {}
+        self._current: SigningKey | None = None
+        self.jwks_payload: bytes = b'{"keys":[]}'
+        self.jwks_etag: str = self._etag(self.jwks_payload)
+
+    @staticmethod
+    def _etag(payload: bytes) -> str:
+        return '"' + hashlib.sha256(payload).hexdigest()[:32] + '"'
+
+    def replace(self, keys: list[SigningKey], now: datetime) -> None:
+        """ Swap in the keys loaded from storage """
+        self._keys = {key.kid: key for key in keys}
+
+        signing = [
+            key for key in keys
+            if key.private_key is not None and key.active_from <= now
+        ]
+        # the very first key is used right away
+        if not signing:
+            signing = [key for key in keys if key.private_key is not None]
+        self._current = max(signing, key=lambda key: key.active_from, default=None)
+
+        # rows come in any order, every worker must serve the same ETag
+        ordered = sorted(keys, key=lambda key: (key.active_from, key.kid))
+        jwks = {"keys": [key.public_jwk for key in ordered]}
+        self.jwks_payload = json.dumps(jwks, separators=(",", ":"), sort_keys=True).encode()
+        self.jwks_etag = self._etag(self.jwks_payload)
+
+    def current(self) -> SigningKey:
+        if self._current is None:
+            raise RuntimeError("signing key ring is not loaded")
+        return self._current
+
+    def get(self, kid: str) -> SigningKey | None:
+        return self._keys.get(kid)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+
+key_ring = KeyRing()
@@ -0,0 +1,44 @@
+import asyncio
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicTask:
+    """
+    Runs `run_once` every `interval` seconds in a background
+    asyncio task until stopped. Errors are logged, not raised.
+    """
+    name: str = "periodic-task"
+
+    def __init__(self, interval: int):
+        self.interval = interval
+        self._task: asyncio.Task | None = None
+
+    async def run_once(self) -> None:
+        raise NotImplementedError
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name=self.name)
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("%s failed", self.name)
+            await asyncio.sleep(self.interval)
@@ -1,20 +1,152 @@
-import bcrypt
+import os
+import time
+import asyncio
+from dataclasses import dataclass, asdict
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+
+from core.config import settings
+from exceptions import auth
+from utilities.hashers import current_hasher, identify_hasher
+
 
 def hash_password(pwd: str) -> str:
-    """Password hashing with salt"""
-    salt = bcrypt.gensalt()
-    hashed = bcrypt.hashpw(
-        password=pwd.encode("utf-8"), 
-        salt=salt
-    )
-    return hashed.decode("utf-8")
+    """Password hashing with the current scheme"""
+    return current_hasher.hash(pwd)
 
 def verify_password(
     pwd: str,
     hashed_pwd: str,
 ) -> bool:
-    """Password checking"""
-    return bcrypt.checkpw(
-        password=pwd.encode("utf-8"),
-        hashed_password=hashed_pwd.encode("utf-8")
-    )
\ No newline at end of file
+    """Password checking with the scheme the hash was made with"""
+    hasher = identify_hasher(hashed_pwd)
+    if hasher is None:
+        # e.g. oauth users without a password
+        return False
+    return hasher.verify(pwd, hashed_pwd)
+
+def needs_rehash(hashed_pwd: str) -> bool:
+    """True if hash is not made with the current scheme and cost"""
+    hasher = identify_hasher(hashed_pwd)
+    if hasher is None:
+        return False
+    return hasher is not current_hasher or hasher.needs_rehash(hashed_pwd)
+
+
+@dataclass
+class HashingMetrics:
+    submitted: int = 0
+    completed: int = 0
+    # jobs that raised, not counted in the timings
+    failed: int = 0
+    rejected: int = 0
+    # requests turned away by `admit` before doing any work
+    shed: int = 0
+    in_flight: int = 0
+    total_seconds: float = 0.0
+
+
+class HashingPool:
+    """
+    Runs password hashing of any scheme off the event loop
+    in a thread or process pool.
+    Jobs beyond workers + max_queue_depth are rejected
+    instead of piling up behind the pool. A job holds its slot
+    until it finished in the pool, even when the awaiting
+    request was cancelled.
+    """
+    def __init__(
+        self,
+        executor: str = "thread",
+        max_workers: int | None = None,
+        max_queue_depth: int = 64,
+    ):
+        self.executor_type = executor
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_queue_depth = max_queue_depth
+        self.metrics = HashingMetrics()
+        self._executor: Executor | None = None
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            if self.executor_type == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix="hashing",
+                )
+        return self._executor
+
+    @property
+    def capacity(self) -> int:
+        return self.max_workers + self.max_queue_depth
+
+    def admit(self) -> None:
+        """
+        Turn a request away up front when its hash job
+        would be rejected anyway, before the user lookup.
+        """
+        if self.metrics.in_flight >= self.capacity:
+            self.metrics.shed += 1
+            raise auth.ServiceOverloaded
+
+    async def run(self, func, *args):
+        if self.metrics.in_flight >= self.capacity:
+            self.metrics.rejected += 1
+            raise auth.ServiceOverloaded
+
+        self.metrics.submitted += 1
+        self.metrics.in_flight += 1
+        started = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        try:
+            future = loop.run_in_executor(self.executor, func, *args)
+        except BaseException:
+            self.metrics.in_flight -= 1
+            self.metrics.failed += 1
+            raise
+        future.add_done_callback(lambda done: self._job_done(done, started))
+        # the pool keeps running a job whose caller went away,
+        # so cancelling the caller must not cancel the future
+        return await asyncio.shield(future)
+
+    def _job_done(self, future: asyncio.Future, started: float) -> None:
+        self.metrics.in_flight -= 1
+        if future.cancelled() or future.exception() is not None:
+            self.metrics.failed += 1
+            return
+        self.metrics.completed += 1
+        self.metrics.total_seconds += time.perf_counter() - started
+
+    def stats(self) -> dict:
+        stats = asdict(self.metrics)
+        stats["avg_seconds"] = (
+            stats["total_seconds"] / stats["completed"]
+            if stats["completed"] else 0.0
+        )
+        return stats
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+hashing_pool = HashingPool(
+    executor=settings.hashing.executor,
+    max_workers=settings.hashing.max_workers,
+    max_queue_depth=settings.hashing.max_queue_depth,
+)
+
+
+async def hash_password_async(pwd: str) -> str:
+    """Password hashing in the hashing pool"""
+    return await hashing_pool.run(hash_password, pwd)
+
+async def verify_password_async(
+    pwd: str,
+    hashed_pwd: str,
+) -> bool:
+    """Password checking in the hashing pool"""
+    return await hashing_pool.run(verify_password, pwd, hashed_pwd)
@@ -0,0 +1,128 @@
+import asyncio
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import func, select
+
+from conftest import add_user, create_tables, enforce_foreign_keys
+from core.cache.user_cache import UserCache
+from core.cache.user_filter import UserFilter
+from core.database.models import RefreshToken, User, UserStats
+from core.services import admin as admin_module
+from core.services import user_stats
+from core.services.admin import AdminService
+from core.services.user import UserService
+
+
+@pytest.fixture
+def admin(monkeypatch, clock, session_factory, sqlite_arrays):
+    """
+    Three users and a superuser, two refresh tokens each
+    (one of them revoked), chunks of two users.
+    Returns a runner for bulk_user_action and the user ids.
+    """
+    enforce_foreign_keys(session_factory)
+    asyncio.run(create_tables(session_factory, User, RefreshToken, UserStats))
+    monkeypatch.setattr(admin_module, "BULK_CHUNK_SIZE", 2)
+    monkeypatch.setattr(admin_module, "user_cache", UserCache(max_size=10, ttl=60))
+    monkeypatch.setattr(admin_module, "user_filter", UserFilter())
+
+    async def setup() -> dict[str, int]:
+        ids = {
+            "a": await add_user(session_factory, email="a@example.com", username="a"),
+            "b": await add_user(session_factory, email="b@example.com", username="b"),
+            "c": await add_user(
+                session_factory, email="c@example.com", username="c",
+                is_verified=False, created_at=clock.now() - timedelta(days=30),
+            ),
+            "root": await add_user(
+                session_factory, email="root@example.com", username="root",
+                is_superuser=True,
+            ),
+        }
+        async with session_factory() as session:
+            service = UserService(session)
+            for user_id in ids.values():
+                token = await service.create_refresh_token(user_id)
+                await service.rotate_refresh_token(token)
+            await user_stats.reconcile_user_stats(session)
+        return ids
+
+    ids = asyncio.run(setup())
+
+    def run(action: str, **kwargs) -> dict:
+        async def scenario():
+            async with session_factory() as session:
+                return await AdminService(session, clock=clock).bulk_user_action(
+                    action, **kwargs
+                )
+
+        return asyncio.run(scenario())
+
+    return run, ids
+
+
+def state(session_factory) -> tuple[tuple[int, int, int], int, int]:
+    """ Counters, tokens still valid, token rows """
+    async def scenario():
+        async with session_factory() as session:
+            row = await user_stats.get_user_stats(session)
+            valid = await session.scalar(
+                select(func.count(RefreshToken.id)).where(RefreshToken.is_revoked == False)
+            )
+            tokens = await session.scalar(select(func.count(RefreshToken.id)))
+            return (row.total_users, row.active_users, row.verified_users), valid, tokens
+
+    return asyncio.run(scenario())
+
+
+def test_deactivate_and_reactivate(admin, session_factory):
+    run, ids = admin
+    everyone = [ids["a"], ids["b"], ids["c"], ids["root"], ids["a"]]
+    assert state(session_factory) == ((4, 4, 3), 4, 8)
+
+    result = run("deactivate", ids=everyone)
+    assert result["ids"] == [ids["a"], ids["b"], ids["c"]]
+    assert result["affected"] == 3
+    assert result["refresh_tokens"] == 3
+    # the superuser keeps access
+    assert state(session_factory) == ((4, 1, 3), 1, 8)
+
+    cache = admin_module.user_cache
+    assert cache.is_token_revoked(ids["a"], 0)
+    assert not cache.is_token_revoked(ids["a"], 1)
+    assert not cache.is_token_revoked(ids["root"], 0)
+
+    # already inactive: nothing changes twice
+    assert run("deactivate", ids=everyone)["affected"] == 0
+    assert state(session_factory) == ((4, 1, 3), 1, 8)
+
+    result = run("reactivate", ids=everyone)
+    assert result["ids"] == [ids["a"], ids["b"], ids["c"]]
+    assert result["refresh_tokens"] == 0
+    assert state(session_factory) == ((4, 4, 3), 1, 8)
+    assert run("reactivate", ids=everyone)["affected"] == 0
+
+
+def test_delete_takes_the_tokens_along(admin, session_factory):
+    run, ids = admin
+
+    # every user of a listing
+    result = run("delete", kind="unverified")
+    assert result["ids"] == [ids["c"]]
+    assert result["refresh_tokens"] == 2
+    assert state(session_factory) == ((3, 3, 3), 3, 6)
+
+    result = run("delete", ids=list(ids.values()))
+    assert result["ids"] == [ids["a"], ids["b"]]
+    assert result["refresh_tokens"] == 4
+    assert state(session_factory) == ((1, 1, 1), 1, 2)
+
+    assert admin_module.user_filter.deleted == 3
+    assert admin_module.user_cache.is_token_revoked(ids["a"], 0)
+
+
+def test_unknown_action_is_refused(admin):
+    run, _ = admin
+    with pytest.raises(ValueError):
+        run("promote", ids=[1])
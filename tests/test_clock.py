@@ -0,0 +1,96 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, select
+
+from conftest import create_tables
+from core.database.models import User, RefreshToken
+from core.services.token_reaper import RefreshTokenReaper, month_start, partition_name
+from core.services.user import UserService
+from utilities.clock import FakeClock, SystemClock, get_clock
+
+
+def test_fake_clock_moves_only_when_told(clock):
+    start = clock.now()
+    assert get_clock() is clock
+    assert clock.now() == start
+    assert clock.coarse_now() == start
+
+    clock.advance(timedelta(hours=2))
+    assert clock.now() == start + timedelta(hours=2)
+
+    clock.set(datetime(2030, 1, 1))
+    assert clock.now() == datetime(2030, 1, 1)
+
+
+def test_system_clock_coarse_now_has_second_resolution():
+    system = SystemClock()
+    coarse = system.coarse_now()
+    now = system.now()
+
+    assert coarse.microsecond == 0
+    assert coarse.tzinfo is None
+    assert timedelta(0) <= now - coarse < timedelta(seconds=2)
+    # cached within the second
+    assert system.coarse_now() in (coarse, coarse + timedelta(seconds=1))
+
+
+def test_month_start_and_partition_name():
+    assert month_start(datetime(2025, 11, 17, 13, 5)) == datetime(2025, 11, 1)
+    assert month_start(datetime(2025, 11, 17), 2) == datetime(2026, 1, 1)
+    assert month_start(datetime(2025, 1, 31), -1) == datetime(2024, 12, 1)
+    assert partition_name(datetime(2026, 3, 1)) == "refresh_tokens_p2026_03"
+
+
+def add_tokens(session_factory, rows):
+    async def insert_rows():
+        async with session_factory() as session:
+            await session.execute(insert(RefreshToken), rows)
+            await session.commit()
+    asyncio.run(insert_rows())
+
+
+def remaining_hashes(session_factory) -> set[bytes]:
+    async def select_rows():
+        async with session_factory() as session:
+            return set(await session.scalars(select(RefreshToken.token_hash)))
+    return asyncio.run(select_rows())
+
+
+def test_reaper_deletes_expired_and_revoked_in_batches(clock, session_factory):
+    asyncio.run(create_tables(session_factory, User, RefreshToken))
+    now = clock.now()
+    add_tokens(session_factory, [
+        {"user_id": 1, "token_hash": bytes([number]) * 32, "expires_at": expires_at, "is_revoked": revoked}
+        for number, (expires_at, revoked) in enumerate([
+            (now - timedelta(days=1), False),
+            (now - timedelta(seconds=1), False),
+            (now + timedelta(days=1), True),
+            (now + timedelta(days=1), False),
+            (now + timedelta(days=40), False),
+        ])
+    ])
+
+    reaper = RefreshTokenReaper(session_factory, batch_size=2)
+    assert asyncio.run(reaper.reap_once()) == 3
+    assert remaining_hashes(session_factory) == {bytes([3]) * 32, bytes([4]) * 32}
+
+    # the reaper reads the injected clock, not the import time
+    clock.advance(timedelta(days=2))
+    assert asyncio.run(reaper.reap_once()) == 1
+    assert remaining_hashes(session_factory) == {bytes([4]) * 32}
+
+
+def test_refresh_token_expiry_follows_the_clock(clock, session_factory):
+    asyncio.run(create_tables(session_factory, User, RefreshToken))
+
+    async def scenario():
+        async with session_factory() as session:
+            service = UserService(session, clock=clock)
+            token = await service.create_refresh_token(user_id=1)
+            assert await service.get_valid_refresh_token(token) is not None
+
+            clock.advance(timedelta(days=30))
+            assert await service.get_valid_refresh_token(token) is None
+
+    asyncio.run(scenario())
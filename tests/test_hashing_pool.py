@@ -0,0 +1,60 @@
+import asyncio
+import threading
+
+import pytest
+
+from exceptions import auth
+from utilities.security import HashingPool
+
+
+def test_cancelled_caller_keeps_its_slot_until_the_job_is_done():
+    pool = HashingPool(max_workers=1, max_queue_depth=0)
+    release = threading.Event()
+
+    async def scenario():
+        caller = asyncio.create_task(pool.run(release.wait, 5))
+        await asyncio.sleep(0.05)
+        caller.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await caller
+
+        # the thread is still busy: no room for another job
+        assert pool.metrics.in_flight == 1
+        with pytest.raises(auth.ServiceOverloaded):
+            await pool.run(sum, [1, 2])
+
+        release.set()
+        while pool.metrics.in_flight:
+            await asyncio.sleep(0.01)
+        assert await pool.run(sum, [1, 2]) == 3
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        pool.shutdown()
+
+    stats = pool.stats()
+    assert stats["completed"] == 2
+    assert stats["rejected"] == 1
+    assert stats["failed"] == 0
+
+
+def test_failed_jobs_are_not_counted_as_completed():
+    pool = HashingPool(max_workers=1)
+
+    def broken():
+        raise ValueError("bad hash")
+
+    async def scenario():
+        with pytest.raises(ValueError):
+            await pool.run(broken)
+        assert await pool.run(sum, [1]) == 1
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        pool.shutdown()
+
+    stats = pool.stats()
+    assert (stats["completed"], stats["failed"], stats["in_flight"]) == (1, 1, 0)
+    assert stats["avg_seconds"] == stats["total_seconds"]
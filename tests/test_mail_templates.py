@@ -0,0 +1,47 @@
+from core.config import BASE_DIR
+from core.mailing.base_send_email import MailRecipient
+from core.mailing.templates import MailTemplates
+
+
+TEMPLATES_DIR = BASE_DIR / "core" / "templates"
+VERIFY = "mailing/email-verifying/before_verify.html"
+
+
+def test_every_mail_template_is_compiled_once():
+    templates = MailTemplates(directory=TEMPLATES_DIR)
+    # the bridge pages are not mail templates
+    assert templates.load_all() == 5
+    assert set(templates._compiled) == {
+        "mailing/base.html",
+        VERIFY,
+        "mailing/email-verifying/after_verify.html",
+        "mailing/password/forgot_password.html",
+        "mailing/password/reset_password.html",
+    }
+    assert templates.get(VERIFY) is templates.get(VERIFY)
+
+
+def test_html_and_text_come_from_one_template():
+    templates = MailTemplates(directory=TEMPLATES_DIR)
+    link = "http://localhost:8000/verification-proccess?token=abc&x=<1>"
+    html, text = templates.render(VERIFY, {
+        "user": MailRecipient(email="user@example.com", username="user"),
+        "verification_link": link,
+    })
+
+    assert "<html" in html.lower()
+    assert 'href="http://localhost:8000/verification-proccess?token=abc&amp;x=&lt;1&gt;"' in html
+    # the text block isn't part of the html layout
+    assert "Please follow the link" not in html
+
+    assert text.startswith("Dear user@example.com,")
+    assert link in text
+    assert "<" not in text.replace(link, "")
+    assert text.endswith("\n") and not text.endswith("\n\n")
+
+
+def test_bytecode_cache_is_written(tmp_path):
+    cache_dir = tmp_path / "bytecode"
+    templates = MailTemplates(directory=TEMPLATES_DIR, bytecode_cache_dir=str(cache_dir))
+    templates.load_all()
+    assert any(cache_dir.iterdir())
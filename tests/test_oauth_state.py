@@ -0,0 +1,198 @@
+import asyncio
+import time
+from datetime import timedelta
+from urllib.parse import parse_qs, urlparse
+
+import aiohttp
+import jwt
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from fastapi import Response
+
+from api.auth import nonce_cookie_name, set_nonce_cookie
+from core.config import settings
+from core.oauth.metadata import MetadataCache
+from core.oauth.providers import GithubProvider, OIDCProvider, OauthIdentity
+from core.services.oauth import OauthService
+from exceptions import auth
+from utilities.jwt_token import create_jwt_token
+
+
+def query_param(url: str, name: str) -> str:
+    return parse_qs(urlparse(url).query)[name][0]
+
+
+@pytest.fixture
+def github():
+    return GithubProvider(
+        client_id="client-id",
+        client_secret="client-secret",
+        redirect_uri="http://localhost/api/auth/github/callback",
+    )
+
+
+@pytest.fixture
+def oauth_service():
+    # state handling needs neither the DB nor outbound calls
+    return OauthService(session=None, http=None)
+
+
+def test_state_is_bound_to_the_browser_nonce(oauth_service, github):
+    url, nonce = asyncio.run(oauth_service.authorization_url("github"))
+    state = query_param(url, "state")
+
+    assert oauth_service.check_state(github, state, browser_nonce=nonce) == nonce
+
+    # callback from a browser that didn't start the flow (login CSRF)
+    for browser_nonce in (None, "", "someone-else"):
+        with pytest.raises(auth.OauthError):
+            oauth_service.check_state(github, state, browser_nonce=browser_nonce)
+
+
+def test_state_of_another_provider_is_refused(oauth_service, github):
+    state = create_jwt_token(
+        {"type": "oauth_state", "provider": "google", "nonce": "abc"},
+        timedelta(minutes=5),
+    )
+    with pytest.raises(auth.OauthError):
+        oauth_service.check_state(github, state, browser_nonce="abc")
+
+
+def test_tampered_or_wrong_type_state_is_refused(oauth_service, github):
+    url, nonce = asyncio.run(oauth_service.authorization_url("github"))
+    state = query_param(url, "state")
+    with pytest.raises(auth.OauthError):
+        oauth_service.check_state(github, state[:-2] + "xx", browser_nonce=nonce)
+
+    access_like = create_jwt_token(
+        {"type": "access_token", "provider": "github", "nonce": nonce},
+        timedelta(minutes=5),
+    )
+    with pytest.raises(auth.OauthError):
+        oauth_service.check_state(github, access_like, browser_nonce=nonce)
+
+
+def test_expired_state_is_refused(clock, oauth_service, github):
+    clock.advance(-timedelta(seconds=settings.providers.state_expire + 60))
+    url, nonce = asyncio.run(oauth_service.authorization_url("github"))
+
+    with pytest.raises(auth.OauthError):
+        oauth_service.check_state(github, query_param(url, "state"), browser_nonce=nonce)
+
+
+def test_nonce_cookie_is_short_lived_and_http_only():
+    response = Response()
+    set_nonce_cookie(response, "github", "nonce-value")
+
+    cookie = response.headers["set-cookie"]
+    assert cookie.startswith(f"{nonce_cookie_name('github')}=nonce-value;")
+    assert f"Max-Age={settings.providers.state_expire}" in cookie
+    assert f"Path={settings.api.prefix}{settings.api.auth}" in cookie
+    assert "HttpOnly" in cookie
+    assert "SameSite=lax" in cookie
+
+
+class MockOIDCProvider:
+    """ Discovery, JWKS and token endpoint of a local OpenID provider """
+    def __init__(self, client_id: str):
+        from cryptography.hazmat.primitives.asymmetric import ec
+
+        self.client_id = client_id
+        self.key = ec.generate_private_key(ec.SECP256R1())
+        self.id_token_nonce: str | None = None
+        self.token_requests = 0
+        self.app = web.Application()
+        self.app.router.add_get("/.well-known/openid-configuration", self.discovery)
+        self.app.router.add_get("/jwks", self.jwks)
+        self.app.router.add_post("/token", self.token)
+        self.server = TestServer(self.app)
+
+    @property
+    def issuer(self) -> str:
+        return str(self.server.make_url("")).rstrip("/")
+
+    async def discovery(self, request):
+        return web.json_response({
+            "issuer": self.issuer,
+            "authorization_endpoint": f"{self.issuer}/authorize",
+            "token_endpoint": f"{self.issuer}/token",
+            "jwks_uri": f"{self.issuer}/jwks",
+            "id_token_signing_alg_values_supported": ["ES256"],
+        })
+
+    async def jwks(self, request):
+        jwk = jwt.algorithms.ECAlgorithm.to_jwk(self.key.public_key(), as_dict=True)
+        jwk.update({"kid": "mock-key", "alg": "ES256", "use": "sig"})
+        return web.json_response({"keys": [jwk]})
+
+    async def token(self, request):
+        self.token_requests += 1
+        now = int(time.time())
+        id_token = jwt.encode(
+            {
+                "iss": self.issuer,
+                "aud": self.client_id,
+                "sub": "subject-1",
+                "iat": now,
+                "exp": now + 300,
+                "nonce": self.id_token_nonce,
+                "email": "user@example.com",
+                "email_verified": True,
+            },
+            self.key,
+            algorithm="ES256",
+            headers={"kid": "mock-key"},
+        )
+        return web.json_response({"access_token": "at", "id_token": id_token})
+
+
+def test_oidc_callback_checks_browser_and_id_token_nonce(monkeypatch):
+    pytest.importorskip("cryptography")
+    mock = MockOIDCProvider(client_id="client-id")
+
+    async def scenario():
+        await mock.server.start_server()
+        try:
+            async with aiohttp.ClientSession() as http:
+                provider = OIDCProvider(
+                    name="mock",
+                    discovery_url=f"{mock.issuer}/.well-known/openid-configuration",
+                    client_id="client-id",
+                    client_secret="client-secret",
+                    redirect_uri="http://localhost/callback",
+                    metadata=MetadataCache(),
+                )
+                monkeypatch.setattr(
+                    "core.services.oauth.get_provider", lambda name: provider
+                )
+                service = OauthService(session=None, http=http)
+
+                async def find_or_create_user(identity: OauthIdentity):
+                    return identity
+                monkeypatch.setattr(service, "find_or_create_user", find_or_create_user)
+                monkeypatch.setattr(
+                    service.user_service, "create_access_token", lambda user: user.subject
+                )
+
+                url, nonce = await service.authorization_url("mock")
+                assert query_param(url, "nonce") == nonce
+                state = query_param(url, "state")
+
+                # another browser: refused before the code is exchanged
+                with pytest.raises(auth.OauthError):
+                    await service.authenticate("mock", "code", state, browser_nonce="other")
+                assert mock.token_requests == 0
+
+                # id token minted for another authorization request
+                mock.id_token_nonce = "replayed"
+                with pytest.raises(auth.OauthError):
+                    await service.authenticate("mock", "code", state, browser_nonce=nonce)
+
+                mock.id_token_nonce = nonce
+                result = await service.authenticate("mock", "code", state, browser_nonce=nonce)
+                assert result == {"token": "subject-1", "token_type": "bearer"}
+        finally:
+            await mock.server.close()
+
+    asyncio.run(scenario())
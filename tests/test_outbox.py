@@ -0,0 +1,87 @@
+import asyncio
+from urllib.parse import parse_qs, urlparse
+
+from sqlalchemy import func, select
+
+from conftest import create_tables
+from core.database.models import EmailOutbox
+from core.mailing.base_send_email import MailRecipient
+from core.mailing.outbox import SENDERS, EmailOutboxWorker, enqueue_email
+from utilities.jwt_token import verify_token
+
+
+def queue_verification(session_factory, user_id: int) -> None:
+    async def scenario():
+        async with session_factory() as session:
+            enqueue_email(
+                session,
+                "verification",
+                user=MailRecipient(email="user@example.com", username="user"),
+                user_id=user_id,
+            )
+            await session.commit()
+
+    asyncio.run(scenario())
+
+
+def test_link_token_is_minted_when_the_email_is_sent(monkeypatch, session_factory):
+    asyncio.run(create_tables(session_factory, EmailOutbox))
+    queue_verification(session_factory, user_id=7)
+    links = []
+
+    async def send_verification_email(user, verification_link):
+        links.append(verification_link)
+        if len(links) == 1:
+            raise ConnectionError("smtp down")
+
+    monkeypatch.setitem(SENDERS, "verification", send_verification_email)
+    worker = EmailOutboxWorker(session_factory, backoff_base=0)
+
+    async def scenario():
+        async with session_factory() as session:
+            context = (await session.scalars(select(EmailOutbox.context))).one()
+        # nothing that expires is stored in the row
+        assert context == {"user_id": 7}
+        assert await worker.process_batch() == 1
+        assert await worker.process_batch() == 1
+
+    asyncio.run(scenario())
+
+    assert worker.metrics["retried"] == 1 and worker.metrics["sent"] == 1
+    tokens = [parse_qs(urlparse(link).query)["token"][0] for link in links]
+    payload = verify_token(tokens[1], expected_type="email_verification")
+    assert payload["sub"] == "7"
+
+
+def test_slow_batch_keeps_its_lease(monkeypatch, session_factory):
+    asyncio.run(create_tables(session_factory, EmailOutbox))
+    queue_verification(session_factory, user_id=7)
+    sends = []
+
+    async def send_verification_email(user, verification_link):
+        sends.append(verification_link)
+        # outlives the lease several times over
+        await asyncio.sleep(0.5)
+
+    monkeypatch.setitem(SENDERS, "verification", send_verification_email)
+    slow = EmailOutboxWorker(session_factory, lease=0.15)
+    other = EmailOutboxWorker(session_factory, lease=0.15)
+
+    async def reclaim_while_sending():
+        claimed = []
+        for _ in range(8):
+            await asyncio.sleep(0.05)
+            claimed += await other.claim_batch()
+        return claimed
+
+    async def scenario():
+        processed, claimed = await asyncio.gather(
+            slow.process_batch(), reclaim_while_sending()
+        )
+        assert processed == 1
+        assert claimed == []
+        async with session_factory() as session:
+            assert await session.scalar(select(func.count(EmailOutbox.id))) == 0
+
+    asyncio.run(scenario())
+    assert len(sends) == 1
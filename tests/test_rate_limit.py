@@ -0,0 +1,95 @@
+import asyncio
+
+import pytest
+from starlette.requests import Request
+
+from core.dependency.rate_limit import client_ip
+from core.services.rate_limit import Limit, MemoryBackend, RateLimiter
+from exceptions import auth
+
+
+class FrozenTime:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def frozen_time(monkeypatch):
+    frozen = FrozenTime()
+    monkeypatch.setattr("core.services.rate_limit.time.monotonic", frozen)
+    return frozen
+
+
+def tokens(backend: MemoryBackend, key: str) -> float:
+    return backend.buckets.get(key)[0]
+
+
+def test_refused_hit_takes_no_token_from_any_bucket(frozen_time):
+    backend = MemoryBackend(max_keys=100)
+    ip = Limit(key="login:ip:1.2.3.4", rate=1.0, burst=10)
+    login = Limit(key="login:id:alice", rate=0.1, burst=1)
+
+    assert asyncio.run(backend.hit([ip, login])) == [0.0, 0.0]
+    assert tokens(backend, ip.key) == 9
+
+    # login bucket is empty: the IP bucket must stay untouched
+    for _ in range(5):
+        waits = asyncio.run(backend.hit([ip, login]))
+        assert waits[0] == 0.0
+        assert waits[1] == pytest.approx(10.0)
+    assert tokens(backend, ip.key) == 9
+    assert tokens(backend, login.key) == 0
+
+    frozen_time.now += 10
+    assert asyncio.run(backend.hit([ip, login])) == [0.0, 0.0]
+    assert tokens(backend, ip.key) == 9
+    assert tokens(backend, login.key) == pytest.approx(0)
+
+
+def test_limiter_rejects_with_retry_after(frozen_time):
+    limiter = RateLimiter(backend=MemoryBackend(max_keys=100))
+    limit = Limit(key="register:ip:1.2.3.4", rate=0.5, burst=2)
+
+    asyncio.run(limiter.check(limit))
+    asyncio.run(limiter.check(limit))
+    with pytest.raises(auth.TooManyRequests) as error:
+        asyncio.run(limiter.check(limit))
+    assert error.value.headers == {"Retry-After": "2"}
+    assert limiter.metrics == {"allowed": 2, "rejected": 1}
+
+
+def request_from(peer: str, forwarded_for: str | None = None) -> Request:
+    headers = []
+    if forwarded_for is not None:
+        headers.append((b"x-forwarded-for", forwarded_for.encode()))
+    return Request({
+        "type": "http",
+        "headers": headers,
+        "client": (peer, 12345),
+    })
+
+
+def test_client_ip_ignores_forwarded_for_without_trusted_proxies():
+    request = request_from("10.0.0.1", "6.6.6.6")
+    assert client_ip(request, trusted_proxies=0) == "10.0.0.1"
+
+
+def test_client_ip_takes_the_hop_of_the_nearest_trusted_proxy():
+    # the client sent "6.6.6.6", the proxy appended the real peer
+    request = request_from("10.0.0.1", "6.6.6.6, 203.0.113.7")
+    assert client_ip(request, trusted_proxies=1) == "203.0.113.7"
+
+    # CDN then load balancer: the CDN saw the client
+    request = request_from("10.0.0.1", "6.6.6.6, 203.0.113.7, 198.51.100.2")
+    assert client_ip(request, trusted_proxies=2) == "203.0.113.7"
+
+
+def test_client_ip_with_fewer_hops_than_trusted_proxies():
+    request = request_from("10.0.0.1", "203.0.113.7")
+    assert client_ip(request, trusted_proxies=2) == "203.0.113.7"
+
+    request = request_from("10.0.0.1", " , ")
+    assert client_ip(request, trusted_proxies=1) == "10.0.0.1"
@@ -0,0 +1,56 @@
+import asyncio
+import hashlib
+
+import pytest
+from sqlalchemy import select
+
+from conftest import add_user, create_tables
+from core.database.models import User, RefreshToken
+from core.services.user import UserService
+from exceptions import auth
+from utilities.jwt_token import token_digest
+
+
+def test_only_the_digest_of_a_refresh_token_is_stored(session_factory):
+    asyncio.run(create_tables(session_factory, User, RefreshToken))
+    user_id = asyncio.run(add_user(session_factory))
+
+    async def scenario():
+        async with session_factory() as session:
+            service = UserService(session)
+            token = await service.create_refresh_token(user_id)
+            stored = (await session.scalars(select(RefreshToken.token_hash))).one()
+
+            assert stored == hashlib.sha256(token.encode()).digest()
+            assert len(stored) == 32
+            assert token.encode() not in stored
+
+            found = await service.validate_refresh_token(token)
+            assert found.token_hash == token_digest(token)
+
+    asyncio.run(scenario())
+
+
+def test_rotated_and_revoked_tokens_are_refused(session_factory):
+    asyncio.run(create_tables(session_factory, User, RefreshToken))
+    user_id = asyncio.run(add_user(session_factory))
+
+    async def scenario():
+        async with session_factory() as session:
+            service = UserService(session)
+            token = await service.create_refresh_token(user_id)
+
+            user, rotated = await service.rotate_refresh_token(token)
+            assert user.id == user_id and rotated != token
+            with pytest.raises(auth.InvalidToken):
+                await service.validate_refresh_token(token)
+
+            assert await service.revoke_refresh_token(user_id) == 1
+            with pytest.raises(auth.InvalidToken):
+                await service.validate_refresh_token(rotated)
+
+            # never issued: same answer as a revoked one
+            with pytest.raises(auth.InvalidToken):
+                await service.validate_refresh_token("not-a-token")
+
+    asyncio.run(scenario())
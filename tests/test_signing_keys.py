@@ -0,0 +1,135 @@
+import asyncio
+import json
+from datetime import timedelta
+
+import jwt
+import pytest
+from starlette.requests import Request
+
+from api import well_known
+from conftest import create_tables
+from core.config import settings
+from core.database.models import SigningKey as SigningKeyRow
+from core.services.signing_keys import SigningKeyRotator
+from utilities import jwt_token
+from utilities.jwt_token import VerifiedTokenCache, create_jwt_token, verify_token
+from utilities.key_ring import KeyRing
+
+
+DAY = 24 * 3600
+
+
+@pytest.fixture
+def ring(monkeypatch) -> KeyRing:
+    """ Fresh EdDSA key ring behind token signing and the JWKS endpoint """
+    ring = KeyRing()
+    monkeypatch.setattr(settings.access, "algorithm", "EdDSA")
+    monkeypatch.setattr(jwt_token, "key_ring", ring)
+    monkeypatch.setattr(jwt_token, "verified_tokens", VerifiedTokenCache())
+    monkeypatch.setattr(well_known, "key_ring", ring)
+    return ring
+
+
+def worker(session_factory, ring: KeyRing) -> SigningKeyRotator:
+    return SigningKeyRotator(
+        session_factory=session_factory,
+        ring=ring,
+        algorithm="EdDSA",
+        secret="test-secret",
+        rotate_every=7 * DAY,
+        publish_ahead=3600,
+        retain=2 * DAY,
+    )
+
+
+def published(ring: KeyRing) -> list[str]:
+    return [key["kid"] for key in json.loads(ring.jwks_payload)["keys"]]
+
+
+def signed_with(token: str) -> str:
+    return jwt.get_unverified_header(token)["kid"]
+
+
+def test_new_key_is_published_before_it_signs(clock, session_factory, ring):
+    asyncio.run(create_tables(session_factory, SigningKeyRow))
+    rotator = worker(session_factory, ring)
+
+    # the first key signs right away
+    asyncio.run(rotator.run_once())
+    first = ring.current().kid
+    old_token = create_jwt_token({"sub": 1, "type": "access_token"})
+    assert signed_with(old_token) == first
+    assert published(ring) == [first]
+    etag = ring.jwks_etag
+
+    clock.advance(timedelta(days=7) - timedelta(hours=1))
+    asyncio.run(rotator.run_once())
+    assert len(published(ring)) == 2
+    second = published(ring)[1]
+    assert ring.jwks_etag != etag
+    # published, but not signing yet
+    assert signed_with(create_jwt_token({"sub": 1})) == first
+
+    clock.advance(timedelta(hours=1))
+    asyncio.run(rotator.run_once())
+    assert signed_with(create_jwt_token({"sub": 1})) == second
+    assert verify_token(old_token, "access_token")["sub"] == "1"
+
+    # another worker sees the same keys, and serves the same ETag
+    other = KeyRing()
+    asyncio.run(worker(session_factory, other).run_once())
+    assert other.jwks_etag == ring.jwks_etag
+    assert other.current().kid == second
+
+    # retired: tokens it signed don't verify anymore, cached or not
+    clock.advance(timedelta(days=2))
+    asyncio.run(rotator.run_once())
+    assert published(ring) == [second]
+    assert verify_token(old_token, "access_token") is None
+
+
+def test_etag_does_not_depend_on_row_order(clock, session_factory):
+    asyncio.run(create_tables(session_factory, SigningKeyRow))
+    ring = KeyRing()
+    rotator = worker(session_factory, ring)
+    asyncio.run(rotator.run_once())
+    clock.advance(timedelta(days=7))
+    asyncio.run(rotator.run_once())
+
+    keys = [ring.get(kid) for kid in published(ring)]
+    reversed_ring = KeyRing()
+    reversed_ring.replace(keys[::-1], clock.now())
+    assert reversed_ring.jwks_etag == ring.jwks_etag
+    assert reversed_ring.jwks_payload == ring.jwks_payload
+
+
+def get_jwks(if_none_match: str | None = None):
+    headers = []
+    if if_none_match is not None:
+        headers.append((b"if-none-match", if_none_match.encode()))
+    request = Request({"type": "http", "method": "GET", "headers": headers})
+    return asyncio.run(well_known.jwks(request))
+
+
+def test_jwks_is_served_with_its_etag(clock, session_factory, ring):
+    asyncio.run(create_tables(session_factory, SigningKeyRow))
+    rotator = worker(session_factory, ring)
+    asyncio.run(rotator.run_once())
+
+    response = get_jwks()
+    assert response.status_code == 200
+    assert response.body == ring.jwks_payload
+    etag = response.headers["etag"]
+    assert etag == ring.jwks_etag
+
+    response = get_jwks(if_none_match=etag)
+    assert response.status_code == 304
+    assert response.body == b""
+    assert response.headers["etag"] == etag
+
+    # a published key changes the document and its ETag
+    clock.advance(timedelta(days=7) - timedelta(hours=1))
+    asyncio.run(rotator.run_once())
+    response = get_jwks(if_none_match=etag)
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
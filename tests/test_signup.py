@@ -0,0 +1,88 @@
+import asyncio
+
+import pytest
+from sqlalchemy import func, select
+
+from conftest import add_user, create_tables
+from core.cache import user_filter
+from core.database.models import EmailOutbox, SignupRollup, User, UserStats
+from core.database.schemas.user import UserCreate
+from core.services import user as user_module
+from core.services.user import UserService
+from exceptions import auth
+from utilities.bloom import BloomFilter
+
+
+SIGNUP_TABLES = (User, UserStats, SignupRollup, EmailOutbox)
+
+
+@pytest.fixture
+def hashed(monkeypatch) -> list[str]:
+    """ Passwords hashed by signups, without paying for the real hash """
+    passwords = []
+
+    async def fake_hash(password: str) -> str:
+        passwords.append(password)
+        return "hashed:" + password
+
+    monkeypatch.setattr(user_module, "hash_password_async", fake_hash)
+    return passwords
+
+
+@pytest.fixture
+def empty_filter(monkeypatch):
+    """ Built filter of a worker that hasn't seen any user yet """
+    monkeypatch.setattr(user_filter, "bloom", BloomFilter(capacity=100))
+    monkeypatch.setattr(user_filter, "_pending", None)
+    return user_filter
+
+
+def signup(session_factory, clock, email: str, username: str) -> User:
+    async def scenario():
+        async with session_factory() as session:
+            return await UserService(session, clock=clock).create_user(
+                UserCreate(email=email, username=username, password="Str0ng!pass")
+            )
+
+    return asyncio.run(scenario())
+
+
+def count_users(session_factory) -> int:
+    async def scenario():
+        async with session_factory() as session:
+            return await session.scalar(select(func.count()).select_from(User))
+
+    return asyncio.run(scenario())
+
+
+def test_unique_insert_refuses_duplicates_the_filter_missed(
+    clock, session_factory, empty_filter, hashed
+):
+    asyncio.run(create_tables(session_factory, *SIGNUP_TABLES))
+    # created on another worker, this one's filter doesn't know it
+    asyncio.run(add_user(session_factory, email="taken@example.com", username="taken"))
+    assert not empty_filter.has_email("taken@example.com")
+
+    with pytest.raises(auth.LoginAlreadyExist, match="Email already exist!"):
+        signup(session_factory, clock, "taken@example.com", "other")
+    with pytest.raises(auth.LoginAlreadyExist, match="Username already exist!"):
+        signup(session_factory, clock, "other@example.com", "taken")
+
+    # both went as far as the insert
+    assert len(hashed) == 2
+    assert count_users(session_factory) == 1
+
+
+def test_filter_hit_refuses_before_hashing(clock, session_factory, empty_filter, hashed):
+    asyncio.run(create_tables(session_factory, *SIGNUP_TABLES))
+    user = signup(session_factory, clock, "new@example.com", "new")
+    assert user.hashed_password == "hashed:Str0ng!pass"
+    assert empty_filter.has_username("new")
+
+    with pytest.raises(auth.LoginAlreadyExist, match="Username already exist!"):
+        signup(session_factory, clock, "second@example.com", "new")
+    with pytest.raises(auth.LoginAlreadyExist, match="Email already exist!"):
+        signup(session_factory, clock, "new@example.com", "second")
+
+    assert len(hashed) == 1
+    assert count_users(session_factory) == 1
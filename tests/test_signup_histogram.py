@@ -0,0 +1,78 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from conftest import create_tables
+from core.database.models import SignupRollup
+from core.services import user_stats
+
+
+def record(session_factory, *events) -> None:
+    async def scenario():
+        async with session_factory() as session:
+            for at, signups, verifications in events:
+                await user_stats.record_signup_event(
+                    session, at, signups=signups, verifications=verifications
+                )
+            await session.commit()
+
+    asyncio.run(scenario())
+
+
+def histogram(session_factory, since: datetime, granularity: str) -> list[tuple]:
+    async def scenario():
+        async with session_factory() as session:
+            rows = await user_stats.get_signup_histogram(session, since, granularity)
+        return [
+            (datetime.fromisoformat(str(row["bucket"])), row["signups"], row["verifications"])
+            for row in rows
+        ]
+
+    return asyncio.run(scenario())
+
+
+def test_events_are_summed_into_hourly_buckets(session_factory):
+    asyncio.run(create_tables(session_factory, SignupRollup))
+    day = datetime(2026, 10, 17)
+    record(
+        session_factory,
+        (day + timedelta(hours=9, minutes=1), 1, 0),
+        (day + timedelta(hours=9, minutes=59, seconds=59), 1, 0),
+        (day + timedelta(hours=9, minutes=30), 0, 1),
+        (day + timedelta(hours=23, minutes=5), 1, 0),
+        (day + timedelta(days=1, minutes=1), 1, 1),
+    )
+
+    async def buckets():
+        async with session_factory() as session:
+            rows = await session.execute(
+                SignupRollup.__table__.select().order_by(SignupRollup.bucket)
+            )
+            return [(row.bucket, row.signups, row.verifications) for row in rows]
+
+    # one row per hour, not per event
+    assert asyncio.run(buckets()) == [
+        (day + timedelta(hours=9), 2, 1),
+        (day + timedelta(hours=23), 1, 0),
+        (day + timedelta(days=1), 1, 1),
+    ]
+
+    assert histogram(session_factory, day, "hour") == [
+        (day + timedelta(hours=9), 2, 1),
+        (day + timedelta(hours=23), 1, 0),
+        (day + timedelta(days=1), 1, 1),
+    ]
+    assert histogram(session_factory, day, "day") == [
+        (day, 3, 1),
+        (day + timedelta(days=1), 1, 1),
+    ]
+    assert histogram(session_factory, day + timedelta(hours=10), "day") == [
+        (day, 1, 0),
+        (day + timedelta(days=1), 1, 1),
+    ]
+
+
+def test_unknown_granularity_is_refused(session_factory):
+    with pytest.raises(ValueError):
+        histogram(session_factory, datetime(2026, 10, 17), "week")
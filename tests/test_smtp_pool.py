@@ -0,0 +1,114 @@
+import asyncio
+from email.message import EmailMessage
+
+from core.mailing.smtp_pool import SMTPPool
+
+
+class MockSMTPServer:
+    """ Just enough SMTP to deliver messages, counting connections """
+    def __init__(self):
+        self.connections = 0
+        self.messages: list[bytes] = []
+        # drop the next connection that starts a transaction
+        self.drop_on_mail = False
+        self.server: asyncio.Server | None = None
+
+    @property
+    def port(self) -> int:
+        return self.server.sockets[0].getsockname()[1]
+
+    async def start(self) -> None:
+        self.server = await asyncio.start_server(self.session, "127.0.0.1", 0)
+
+    async def stop(self) -> None:
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def session(self, reader, writer) -> None:
+        self.connections += 1
+        writer.write(b"220 mock ESMTP\r\n")
+        try:
+            while line := await reader.readline():
+                command = line.decode().strip().upper()
+                if command.startswith("MAIL") and self.drop_on_mail:
+                    self.drop_on_mail = False
+                    break
+                if command == "DATA":
+                    writer.write(b"354 end with .\r\n")
+                    await writer.drain()
+                    data = await reader.readuntil(b"\r\n.\r\n")
+                    self.messages.append(data)
+                    writer.write(b"250 queued\r\n")
+                elif command == "QUIT":
+                    writer.write(b"221 bye\r\n")
+                    break
+                else:
+                    writer.write(b"250 ok\r\n")
+                await writer.drain()
+        finally:
+            writer.close()
+
+
+def message(number: int) -> EmailMessage:
+    email = EmailMessage()
+    email["From"] = "admin@site.com"
+    email["To"] = f"user{number}@example.com"
+    email["Subject"] = f"message {number}"
+    email.set_content("hello")
+    return email
+
+
+def run_with_server(scenario) -> MockSMTPServer:
+    server = MockSMTPServer()
+
+    async def main():
+        await server.start()
+        try:
+            await scenario(server)
+        finally:
+            await server.stop()
+
+    asyncio.run(main())
+    return server
+
+
+def test_sends_reuse_pooled_connections():
+    async def scenario(server):
+        pool = SMTPPool("127.0.0.1", server.port, size=2)
+        for number in range(5):
+            await pool.send(message(number))
+        assert server.connections == 1
+
+        # never more connections than the pool size
+        await asyncio.gather(*(pool.send(message(number)) for number in range(10)))
+        assert server.connections <= 2
+        await pool.close()
+
+    server = run_with_server(scenario)
+    assert len(server.messages) == 15
+
+
+def test_connection_dropped_mid_send_is_replaced_and_retried():
+    async def scenario(server):
+        pool = SMTPPool("127.0.0.1", server.port, size=1)
+        await pool.send(message(0))
+        server.drop_on_mail = True
+        await pool.send(message(1))
+        await pool.close()
+
+    server = run_with_server(scenario)
+    assert server.connections == 2
+    assert len(server.messages) == 2
+
+
+def test_idle_connections_are_reopened():
+    async def scenario(server):
+        pool = SMTPPool("127.0.0.1", server.port, size=1, idle_timeout=0)
+        await pool.send(message(0))
+        await asyncio.sleep(0.01)
+        await pool.send(message(1))
+        await pool.close()
+
+    server = run_with_server(scenario)
+    assert server.connections == 2
+    assert len(server.messages) == 2
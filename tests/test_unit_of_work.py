@@ -0,0 +1,126 @@
+import asyncio
+
+import pytest
+from sqlalchemy import func, select
+
+from conftest import add_user, create_tables
+from core.database import UnitOfWork
+from core.database.models import RefreshToken, User
+from core.services.user import UserService
+from exceptions import auth
+
+
+def count_commits(session) -> list[int]:
+    commits = []
+    commit = session.commit
+
+    async def counted():
+        commits.append(1)
+        await commit()
+
+    session.commit = counted
+    return commits
+
+
+def count_users(session_factory) -> int:
+    async def scenario():
+        async with session_factory() as session:
+            return await session.scalar(select(func.count()).select_from(User))
+
+    return asyncio.run(scenario())
+
+
+def new_user(username: str) -> User:
+    return User(
+        email=f"{username}@example.com",
+        username=username,
+        hashed_password="x",
+        is_active=True,
+        is_verified=True,
+        is_superuser=False,
+    )
+
+
+def test_nested_commits_wait_for_the_outermost_block(session_factory):
+    asyncio.run(create_tables(session_factory, User))
+    called = []
+
+    async def scenario():
+        async with session_factory() as session:
+            uow = UnitOfWork(session)
+            commits = count_commits(session)
+            async with uow:
+                session.add(new_user("first"))
+                uow.after_commit(lambda: called.append("first"))
+                await uow.commit()
+                async with uow:
+                    session.add(new_user("second"))
+                    uow.after_commit(lambda: called.append("second"))
+                    await uow.commit()
+                assert commits == [] and called == []
+            assert commits == [1]
+
+            # outside a block commit() commits right away
+            session.add(new_user("third"))
+            uow.after_commit(lambda: called.append("third"))
+            await uow.commit()
+            assert commits == [1, 1]
+
+    asyncio.run(scenario())
+    assert called == ["first", "second", "third"]
+    assert count_users(session_factory) == 3
+
+
+def test_error_rolls_back_and_drops_callbacks(session_factory):
+    asyncio.run(create_tables(session_factory, User))
+    called = []
+
+    async def scenario():
+        async with session_factory() as session:
+            uow = UnitOfWork(session)
+            with pytest.raises(RuntimeError):
+                async with uow:
+                    session.add(new_user("first"))
+                    uow.after_commit(lambda: called.append("first"))
+                    async with uow:
+                        await uow.commit()
+                    raise RuntimeError
+
+            # the next transaction doesn't run the dropped callback
+            uow.after_commit(lambda: called.append("second"))
+            await uow.commit()
+
+    asyncio.run(scenario())
+    assert called == ["second"]
+    assert count_users(session_factory) == 0
+
+
+def test_failed_rotation_keeps_the_old_refresh_token(session_factory):
+    asyncio.run(create_tables(session_factory, User, RefreshToken))
+    user_id = asyncio.run(add_user(session_factory))
+
+    async def scenario():
+        async with session_factory() as session:
+            service = UserService(session)
+            token = await service.create_refresh_token(user_id)
+            # the revocation and the new token are one commit
+            commits = count_commits(session)
+            await service.rotate_refresh_token(token)
+            assert commits == [1]
+
+        async with session_factory() as session:
+            service = UserService(session)
+            token = await service.create_refresh_token(user_id)
+
+            async def deleted_meanwhile(user_id):
+                return None
+
+            service.get_user_by_id = deleted_meanwhile
+
+            with pytest.raises(auth.UserNotFound):
+                await service.rotate_refresh_token(token)
+            # revoking the used token was rolled back with the rest
+            stored = await service.validate_refresh_token(token)
+            assert not stored.is_revoked
+
+    asyncio.run(scenario())
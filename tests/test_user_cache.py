@@ -0,0 +1,99 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import update
+
+from conftest import add_user, create_tables
+from core.cache.user_cache import UserCache, UserSnapshot
+from core.database.models import User
+from core.dependency.user import get_current_user
+from utilities.cache import TTLCache
+
+
+def test_revocations_are_not_evicted_by_size():
+    cache = UserCache(max_size=2, ttl=60)
+    for user_id in range(100):
+        cache.revoke_tokens(user_id, token_version=1)
+
+    # far more revocations than cached users: none of them forgotten
+    assert all(cache.is_token_revoked(user_id, 0) for user_id in range(100))
+    assert not cache.is_token_revoked(0, 1)
+    assert len(cache) == 0
+
+
+def test_unbounded_cache_purges_expired_entries(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("utilities.cache.time.monotonic", lambda: now[0])
+    cache = TTLCache(max_size=None, ttl=10)
+    for key in range(5):
+        cache.set(key, key)
+
+    now[0] += 11
+    cache.set("new", 1)
+    assert len(cache) == 1
+    assert cache.get("new") == 1
+
+
+class NoSession:
+    """ Session of a request served from the cache """
+    async def execute(self, *args, **kwargs):
+        raise AssertionError("the database was queried")
+
+
+def test_current_user_is_served_from_the_cache(monkeypatch, session_factory):
+    cache = UserCache(max_size=10, ttl=60)
+    monkeypatch.setattr("core.dependency.user.user_cache", cache)
+    asyncio.run(create_tables(session_factory, User))
+    user_id = asyncio.run(add_user(session_factory, token_version=2))
+
+    async def scenario():
+        async with session_factory() as session:
+            snapshot = await get_current_user({"sub": user_id, "ver": 2}, session)
+        assert snapshot == UserSnapshot(
+            id=user_id,
+            email="user@example.com",
+            username="user",
+            is_active=True,
+            is_verified=True,
+            is_superuser=False,
+            token_version=2,
+        )
+
+        assert await get_current_user({"sub": user_id, "ver": 2}, NoSession()) is snapshot
+
+        # a token issued before the last revocation
+        with pytest.raises(HTTPException) as error:
+            await get_current_user({"sub": user_id, "ver": 1}, NoSession())
+        assert error.value.status_code == 401
+
+    asyncio.run(scenario())
+
+
+def test_invalidated_user_is_loaded_again(monkeypatch, session_factory):
+    cache = UserCache(max_size=10, ttl=60)
+    monkeypatch.setattr("core.dependency.user.user_cache", cache)
+    asyncio.run(create_tables(session_factory, User))
+    user_id = asyncio.run(add_user(session_factory))
+
+    async def scenario():
+        async with session_factory() as session:
+            await get_current_user({"sub": user_id, "ver": 0}, session)
+            await session.execute(
+                update(User).where(User.id == user_id).values(is_active=False)
+            )
+            await session.commit()
+
+        # stale until invalidated by the write path
+        assert (await get_current_user({"sub": user_id, "ver": 0}, NoSession())).is_active
+        cache.invalidate(user_id)
+        async with session_factory() as session:
+            snapshot = await get_current_user({"sub": user_id, "ver": 0}, session)
+        assert not snapshot.is_active
+
+        # disabled cache: every request reads the database
+        cache.enabled = False
+        with pytest.raises(AssertionError):
+            await get_current_user({"sub": user_id, "ver": 0}, NoSession())
+
+    asyncio.run(scenario())
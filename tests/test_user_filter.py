@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+from sqlalchemy import insert
+
+from conftest import create_tables
+from core.cache import user_filter
+from core.database.models import User
+from core.services.oauth import OauthService
+from core.services.user import UserService
+from utilities.bloom import BloomFilter
+from utilities.security import hash_password
+
+
+@pytest.fixture
+def stale_filter(monkeypatch):
+    """ Built filter of a worker that hasn't loaded the newest users yet """
+    monkeypatch.setattr(user_filter, "bloom", BloomFilter(capacity=100))
+    monkeypatch.setattr(user_filter, "_pending", None)
+    user_filter.add_user("old@example.com", "old")
+    return user_filter
+
+
+def add_user_on_another_worker(session_factory) -> None:
+    async def scenario():
+        async with session_factory() as session:
+            await session.execute(insert(User).values(
+                email="new@example.com",
+                username="new",
+                hashed_password=hash_password("correct horse battery"),
+                is_active=True,
+                is_verified=True,
+                is_superuser=False,
+            ))
+            await session.commit()
+
+    asyncio.run(scenario())
+
+
+def test_filter_miss_does_not_reject_login_or_existence(stale_filter, session_factory):
+    asyncio.run(create_tables(session_factory, User))
+    add_user_on_another_worker(session_factory)
+    assert not stale_filter.has_username("new")
+
+    async def scenario():
+        async with session_factory() as session:
+            service = UserService(session)
+            user = await service.authenticate("new", "correct horse battery")
+            assert user.username == "new"
+            user = await service.authenticate("new@example.com", "correct horse battery")
+            assert user.username == "new"
+
+            oauth_service = OauthService(session=session, http=None)
+            assert await oauth_service.is_username_exist("new")
+            assert not await oauth_service.is_username_exist("nobody")
+
+    asyncio.run(scenario())
+
+
+def test_availability_trusts_the_filter(stale_filter, session_factory):
+    asyncio.run(create_tables(session_factory, User))
+    add_user_on_another_worker(session_factory)
+
+    async def scenario():
+        async with session_factory() as session:
+            service = UserService(session)
+            # a hint until the next refresh, signup still hits the unique index
+            assert await service.check_availability(username="new") == {"username": True}
+            assert await service.check_availability(
+                email="old@example.com", username="nobody"
+            ) == {"email": True, "username": True}
+
+    asyncio.run(scenario())
@@ -0,0 +1,92 @@
+import asyncio
+
+from sqlalchemy import update
+
+from conftest import add_user, create_tables
+from core.database.models import EmailOutbox, SignupRollup, User, UserStats
+from core.database.schemas.user import UserCreate
+from core.mailing.links import verification_link
+from core.services import user_stats
+from core.services.admin import AdminService
+from core.services.user import UserService
+
+
+SIGNUP_TABLES = (User, UserStats, SignupRollup, EmailOutbox)
+
+
+def counters(session_factory) -> tuple[int, int, int]:
+    async def scenario():
+        async with session_factory() as session:
+            row = await user_stats.get_user_stats(session)
+            return row.total_users, row.active_users, row.verified_users
+
+    return asyncio.run(scenario())
+
+
+def reconcile(session_factory) -> None:
+    async def scenario():
+        async with session_factory() as session:
+            await user_stats.reconcile_user_stats(session)
+
+    asyncio.run(scenario())
+
+
+def test_counters_follow_signup_verification_and_admin_actions(clock, session_factory):
+    asyncio.run(create_tables(session_factory, *SIGNUP_TABLES))
+    # creates the single row on an empty table
+    reconcile(session_factory)
+    assert counters(session_factory) == (0, 0, 0)
+
+    async def signup() -> int:
+        async with session_factory() as session:
+            user = await UserService(session, clock=clock).create_user(
+                UserCreate(email="new@example.com", username="new", password="Str0ng!pass")
+            )
+            return user.id
+
+    user_id = asyncio.run(signup())
+    assert counters(session_factory) == (1, 1, 0)
+
+    token = verification_link(user_id).split("token=")[1]
+
+    async def verify():
+        async with session_factory() as session:
+            await UserService(session, clock=clock).verify_email_token(token)
+
+    # a second click on the link changes nothing
+    asyncio.run(verify())
+    asyncio.run(verify())
+    assert counters(session_factory) == (1, 1, 1)
+
+    async def admin(action: str):
+        async with session_factory() as session:
+            await getattr(AdminService(session, clock=clock), action)(user_id)
+
+    asyncio.run(admin("deactivate_user"))
+    asyncio.run(admin("deactivate_user"))
+    assert counters(session_factory) == (1, 0, 1)
+    asyncio.run(admin("reactivate_user"))
+    asyncio.run(admin("reactivate_user"))
+    assert counters(session_factory) == (1, 1, 1)
+
+
+def test_reconcile_repairs_drift(session_factory):
+    asyncio.run(create_tables(session_factory, *SIGNUP_TABLES))
+    reconcile(session_factory)
+
+    async def outside_the_app():
+        await add_user(session_factory, email="a@example.com", username="a")
+        await add_user(
+            session_factory, email="b@example.com", username="b", is_verified=False
+        )
+        async with session_factory() as session:
+            await session.execute(
+                update(User).where(User.username == "a").values(is_active=False)
+            )
+            await session.commit()
+
+    asyncio.run(outside_the_app())
+    assert counters(session_factory) == (0, 0, 0)
+
+    reconcile(session_factory)
+    assert counters(session_factory) == (2, 1, 1)
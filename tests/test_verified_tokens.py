@@ -0,0 +1,102 @@
+import time
+from datetime import timedelta
+
+import pytest
+
+from core.config import settings
+from utilities import jwt_token
+from utilities.clock import get_clock
+from utilities.jwt_token import VerifiedTokenCache, create_jwt_token, token_digest, verify_token
+from utilities.key_ring import KeyRing, SigningKey, generate_key_pair, public_jwk
+
+
+@pytest.fixture
+def cache(monkeypatch) -> VerifiedTokenCache:
+    cache = VerifiedTokenCache(max_size=10)
+    monkeypatch.setattr(jwt_token, "verified_tokens", cache)
+    return cache
+
+
+@pytest.fixture
+def decoded(monkeypatch) -> list[str]:
+    """ Tokens whose signature was checked """
+    tokens = []
+    decode_token = jwt_token.decode_token
+
+    def counted(token, kid):
+        tokens.append(token)
+        return decode_token(token, kid)
+
+    monkeypatch.setattr(jwt_token, "decode_token", counted)
+    return tokens
+
+
+def test_hit_skips_the_signature_check(cache, decoded):
+    token = create_jwt_token({"sub": 1, "type": "access_token"})
+
+    payload = verify_token(token, "access_token")
+    assert payload["sub"] == "1"
+    # callers get a copy, the cached payload stays intact
+    payload["sub"] = "2"
+    assert verify_token(token, "access_token")["sub"] == "1"
+    assert decoded == [token]
+
+    # the type is checked on hits too
+    assert verify_token(token, "password_reset") is None
+    assert verify_token("not-a-token") is None
+    assert cache.get(token_digest("not-a-token")) is None
+
+
+def test_revocation_checks_apply_to_hits(cache, decoded):
+    token = create_jwt_token({"sub": 1, "type": "access_token"})
+    assert verify_token(token, "access_token") is not None
+
+    revoked_users = set()
+    cache.add_revocation_check(lambda payload: payload["sub"] in revoked_users)
+    revoked_users.add("1")
+    assert verify_token(token, "access_token") is None
+    assert cache.revoked == 1
+    assert decoded == [token]
+
+
+def test_entry_lives_until_the_token_expires(cache):
+    cache.put_payload(b"expired", None, {"exp": time.time() - 1})
+    assert cache.get_payload(b"expired") is None
+
+    token = create_jwt_token({"sub": 1}, expires_delta=timedelta(minutes=5))
+    verify_token(token)
+    assert 290 < cache._data[token_digest(token)][0] - time.monotonic() <= 300
+
+
+def test_entry_is_dropped_with_its_signing_key(monkeypatch, cache, decoded):
+    ring = KeyRing()
+    kid, private_key = generate_key_pair("EdDSA")
+    key = SigningKey(
+        kid=kid,
+        algorithm="EdDSA",
+        private_key=private_key,
+        public_key=private_key.public_key(),
+        public_jwk=public_jwk(kid, "EdDSA", private_key.public_key()),
+        active_from=get_clock().now(),
+    )
+    ring.replace([key], key.active_from)
+    monkeypatch.setattr(settings.access, "algorithm", "EdDSA")
+    monkeypatch.setattr(jwt_token, "key_ring", ring)
+
+    token = create_jwt_token({"sub": 1, "type": "access_token"})
+    assert verify_token(token, "access_token") is not None
+    assert len(cache) == 1
+
+    ring.replace([], key.active_from)
+    assert verify_token(token, "access_token") is None
+    assert len(cache) == 0
+    assert decoded == [token, token]
+
+
+def test_disabled_cache_checks_every_time(cache, decoded):
+    cache.enabled = False
+    token = create_jwt_token({"sub": 1})
+    verify_token(token)
+    verify_token(token)
+    assert decoded == [token, token]
+    assert len(cache) == 0